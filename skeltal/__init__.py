@@ -9,3 +9,12 @@ class TraceLogger(logging.getLoggerClass()):
 logging.TRACE = logging.DEBUG - 5
 logging.addLevelName(logging.TRACE, "TRACE")
 logging.setLoggerClass(TraceLogger)
+
+
+LOG_FORMAT = "%(asctime)s.%(msecs)03d » %(levelname)s » %(message)s"
+LOG_DATE_FORMAT = "%H:%M:%S"
+
+
+def setup_logging(level):
+    """Log to stderr at `level` in the format of the command line."""
+    logging.basicConfig(level=level, format=LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
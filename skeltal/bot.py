@@ -1,17 +1,120 @@
+import asyncio
+import logging
 import time
+from skeltal import exporter, profiler
 from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound
+from skeltal.protocol.aio import AsyncClientConnection
 from skeltal.protocol.connection import ClientConnection
+from skeltal.protocol.state import State
+from skeltal.world.entity import Entities
+from skeltal.world.map import World
+
+LOGGER = logging.getLogger(__name__)
+
+ENGINES = {
+    "thread": ClientConnection,
+    "asyncio": AsyncClientConnection,
+}
+
+
+def track(registry, world, entities):
+    """Subscribe world and entities to the messages which change them."""
+
+    def change_dimension(message):
+        if world.set_dimension(message.dimension):
+            entities.clear()
+
+    subscribe = registry.subscribe
+    subscribe(clientbound.Play.JoinGame, change_dimension)
+    subscribe(clientbound.Play.Respawn, change_dimension)
+    subscribe(clientbound.Play.ChunkData, world.load_chunk)
+    subscribe(clientbound.Play.UnloadChunk, world.unload_chunk)
+    subscribe(clientbound.Play.BlockChange, world.block_change)
+    subscribe(clientbound.Play.MultiBlockChange, world.multi_block_change)
+    for message_type in entities.message_types:
+        subscribe(message_type, entities.handle)
 
 
 class Bot:
-    def __init__(self, address, port):
+    """Client connection, with the world and entities tracked from its
+    messages unless `world` is false.
+
+    With `stats`, received packets are measured and a summary of them is
+    logged every `stats` seconds.
+    """
+
+    def __init__(
+        self,
+        address,
+        port,
+        engine="thread",
+        ignore=(),
+        ignore_unsubscribed=False,
+        world=True,
+        stats=None,
+        **options,
+    ):
+        self.engine = engine
+        self.stats = stats
         self.registry = EventsRegistry()
-        self.client = ClientConnection(address, port, self.registry)
+        if stats:
+            options["metrics"] = True
+        self.client = ENGINES[engine](address, port, self.registry, **options)
+        self.client.ignore(State.PLAY, *ignore)
+
+        self.world = self.entities = None
+        if world:
+            self.world = World()
+            self.entities = Entities()
+            track(self.registry, self.world, self.entities)
+        if ignore_unsubscribed:
+            self.client.ignore_unsubscribed()
+        exporter.register(self)
 
     def run_forever(self):
+        if self.engine == "asyncio":
+            asyncio.run(self._run_async())
+            return
+
         self.client.start()
+        deadline = time.monotonic() + (self.stats or 0)
         while self.client.is_connected:
-            time.sleep(1)
+            time.sleep(min(1, self.stats or 1))
+            if self.stats and time.monotonic() >= deadline:
+                deadline += self.stats
+                self.report()
+
+    def profile(self, duration=10.0, path="skeltal-profile", mode="sample"):
+        """Profile the bot's connection for `duration` seconds, in the
+        background. Returns the :class:`~skeltal.profiler.Profiler`.
+        """
+        return profiler.profile([self], duration, path, mode)
+
+    def report(self):
+        """Log a summary of the packets received so far."""
+        if self.client.metrics is not None:
+            LOGGER.info("Packets: %s", self.client.metrics.summary())
 
     def shutdown(self):
         self.client.stop()
+        self.report()
+        for subscriber in self.registry.queued():
+            LOGGER.info("Subscriber %s: %s", subscriber.name, subscriber.stats)
+
+    async def _run_async(self):
+        exporter.watch_loop()
+        if not self.stats:
+            await self.client.run_forever()
+            return
+
+        async def report():
+            while True:
+                await asyncio.sleep(self.stats)
+                self.report()
+
+        reporter = asyncio.create_task(report())
+        try:
+            await self.client.run_forever()
+        finally:
+            reporter.cancel()
@@ -1,7 +1,20 @@
 import argparse
+import asyncio
 import logging
 import re
-from skeltal.bot import Bot
+import sys
+import time
+from skeltal import exporter, profiler, setup_logging
+from skeltal.bot import Bot, ENGINES, track
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound
+from skeltal.protocol.capture import CaptureReader
+from skeltal.protocol.recorder import dump_on_signal
+from skeltal.protocol.replay import ReplayConnection, replay as replay_capture
+from skeltal.server import MIX, Server, Traffic
+from skeltal.swarm import Swarm, Supervisor
+from skeltal.world.entity import Entities
+from skeltal.world.map import World
 
 LOGO = """
    .x+=:.         ..                       ..      s                      ..
@@ -21,6 +34,7 @@ x88:  `)8b.   888E`"88*"  :888'8888.   888R     8888    .@88 "8888"   888R
 LOGGER = logging.getLogger(__name__)
 LEVELS = [logging.INFO, logging.DEBUG, logging.TRACE]
 ADDRESS = "localhost:25565"
+METRICS_ADDRESS = "localhost:9404"
 
 
 def address_type(value):
@@ -42,20 +56,172 @@ def address_type(value):
         ) from exc
 
 
+def packet_types(value):
+    try:
+        return [clientbound.Play[name] for name in value.split(",") if name]
+    except KeyError as exc:
+        raise argparse.ArgumentTypeError(f"Unknown packet type: {exc}") from exc
+
+
+def traffic_mix(value):
+    try:
+        pairs = (item.split("=") for item in value.split(",") if item)
+        mix = {kind: float(weight) for kind, weight in pairs}
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(
+            "Mix should be kind=weight pairs, e.g. move=90,chat=9,chunk=1"
+        ) from exc
+    unknown = set(mix) - set(MIX)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown traffic: {', '.join(unknown)}")
+    return mix
+
+
+def add_prometheus_argument(parser):
+    parser.add_argument(
+        "--prometheus",
+        type=address_type,
+        nargs="?",
+        const=address_type(METRICS_ADDRESS),
+        metavar="HOST:PORT",
+        help=f"serve metrics for Prometheus, by default on {METRICS_ADDRESS}",
+    )
+
+
+def add_profile_arguments(parser):
+    parser.add_argument(
+        "--profile",
+        type=float,
+        nargs="?",
+        const=10.0,
+        metavar="SECONDS",
+        help="profile bots for 10s or SECONDS on SIGUSR2",
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=profiler.MODES,
+        default="sample",
+        help="sample stacks, or profile every call with cProfile",
+    )
+    parser.add_argument(
+        "--profile-output",
+        default="skeltal-profile",
+        metavar="PREFIX",
+        help="prefix of profile output files",
+    )
+
+
+def setup_profile(args):
+    if args.profile:
+        profiler.profile_on_signal(
+            duration=args.profile, path=args.profile_output, mode=args.profile_mode
+        )
+
+
+def configure_logging(verbose):
+    setup_logging(LEVELS[min(verbose, len(LEVELS) - 1)])
+
+
 def run():
+    if sys.argv[1:2] == ["swarm"]:
+        swarm(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["replay"]:
+        replay(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser("skeltal")
     parser.add_argument("address", nargs="?", type=address_type, default=ADDRESS)
     parser.add_argument("-v", "--verbose", action="count", default=0)
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="thread")
+    parser.add_argument(
+        "--flush-window",
+        type=float,
+        default=0.0,
+        help="milliseconds to coalesce outgoing packets for",
+    )
+    parser.add_argument(
+        "--offload",
+        type=int,
+        default=-1,
+        help="bytes above which frames are (de)compressed on a thread pool",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        choices=range(-1, 10),
+        default=-1,
+        metavar="{-1..9}",
+        help="zlib level for outgoing frames, -1 for the default",
+    )
+    parser.add_argument(
+        "--ignore",
+        type=packet_types,
+        default=[],
+        help="comma separated play packets to drop, e.g. ChunkData,MapData",
+    )
+    parser.add_argument(
+        "--ignore-unsubscribed",
+        action="store_true",
+        help="drop play packets no one subscribed to",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="FILE",
+        help="append raw frames sent and received to a capture file",
+    )
+    parser.add_argument(
+        "--stats",
+        type=float,
+        nargs="?",
+        const=10.0,
+        metavar="SECONDS",
+        help="measure received packets by type, and log them every 10s or SECONDS",
+    )
+    parser.add_argument(
+        "--flight-recorder",
+        metavar="FILE",
+        help="keep recent packets in memory, and append them to FILE on "
+        "disconnect, parse errors and SIGUSR1",
+    )
+    parser.add_argument(
+        "--flight-recorder-size",
+        type=int,
+        default=4096,
+        metavar="N",
+        help="packets kept by the flight recorder, by default 4096",
+    )
+    add_prometheus_argument(parser)
+    add_profile_arguments(parser)
     args = parser.parse_args()
 
-    level = LEVELS[min(args.verbose, len(LEVELS) - 1)]
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s.%(msecs)03d » %(levelname)s » %(message)s",
-        datefmt="%H:%M:%S",
-    )
+    configure_logging(args.verbose)
+    if args.prometheus:
+        exporter.serve(*args.prometheus)
+    setup_profile(args)
+    recorder = {}
+    if args.flight_recorder:
+        recorder = dict(
+            recorder=args.flight_recorder_size, recorder_path=args.flight_recorder
+        )
+        dump_on_signal()
 
-    bot = Bot(address=args.address[0], port=args.address[1])
+    bot = Bot(
+        address=args.address[0],
+        port=args.address[1],
+        engine=args.engine,
+        flush_window=args.flush_window,
+        ignore=args.ignore,
+        ignore_unsubscribed=args.ignore_unsubscribed,
+        offload=args.offload,
+        compression_level=args.compression_level,
+        capture=args.capture,
+        stats=args.stats,
+        **recorder,
+    )
 
     try:
         print(LOGO, flush=True)
@@ -64,3 +230,144 @@ def run():
         logging.warning("User interrupt")
     finally:
         bot.shutdown()
+
+
+def swarm(argv):
+    parser = argparse.ArgumentParser("skeltal swarm")
+    parser.add_argument("address", nargs="?", type=address_type, default=ADDRESS)
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    parser.add_argument("-n", "--count", type=int, default=100, help="number of bots")
+    parser.add_argument(
+        "-r", "--ramp", type=float, default=10.0, help="connections per second"
+    )
+    parser.add_argument(
+        "-i", "--interval", type=float, default=10.0, help="seconds between reports"
+    )
+    parser.add_argument("-p", "--prefix", default="skel", help="username prefix")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes, 0 for one per CPU core",
+    )
+    add_prometheus_argument(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.prometheus and args.workers != 1:
+        parser.error("--prometheus only works with a single worker")
+    if args.profile and args.workers != 1:
+        parser.error("--profile only works with a single worker")
+
+    configure_logging(args.verbose)
+    if args.prometheus:
+        exporter.serve(*args.prometheus)
+    setup_profile(args)
+
+    kwargs = dict(
+        address=args.address[0],
+        port=args.address[1],
+        count=args.count,
+        ramp=args.ramp,
+        prefix=args.prefix,
+        interval=args.interval,
+    )
+
+    try:
+        print(LOGO, flush=True)
+        if args.workers == 1:
+            asyncio.run(Swarm(**kwargs).run())
+        else:
+            Supervisor(workers=args.workers, **kwargs).run()
+    except KeyboardInterrupt:
+        logging.warning("User interrupt")
+
+
+def replay(argv):
+    parser = argparse.ArgumentParser("skeltal replay")
+    parser.add_argument("capture", help="capture file to replay")
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    parser.add_argument(
+        "--realtime", action="store_true", help="replay with the captured timing"
+    )
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="speed up realtime replay by factor"
+    )
+    args = parser.parse_args(argv)
+
+    configure_logging(args.verbose)
+
+    registry = EventsRegistry()
+    world, entities = World(), Entities()
+    track(registry, world, entities)
+    connection = ReplayConnection(registry)
+
+    with CaptureReader(args.capture) as reader:
+        start = time.perf_counter()
+        frames = replay_capture(reader, connection, args.realtime, args.speed)
+        elapsed = time.perf_counter() - start
+
+    LOGGER.info(
+        "Replayed %d frames in %.2fs (%.0f frames/s): %d columns, %d entities",
+        frames,
+        elapsed,
+        frames / elapsed if elapsed else 0.0,
+        len(world),
+        len(entities),
+    )
+
+
+def serve(argv):
+    parser = argparse.ArgumentParser("skeltal serve")
+    parser.add_argument("address", nargs="?", type=address_type, default=ADDRESS)
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    parser.add_argument(
+        "-r", "--rate", type=float, default=100.0, help="packets per second per bot"
+    )
+    parser.add_argument(
+        "-m",
+        "--mix",
+        type=traffic_mix,
+        default=MIX,
+        help="weights of packet kinds, default: "
+        + ",".join(f"{kind}={weight}" for kind, weight in MIX.items()),
+    )
+    parser.add_argument(
+        "--entities", type=int, default=100, help="number of mobs moving around"
+    )
+    parser.add_argument(
+        "--sections", type=int, default=4, help="sections per chunk column"
+    )
+    parser.add_argument(
+        "--chat-size", type=int, default=64, help="characters per chat message"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=int,
+        default=256,
+        help="compression threshold, -1 to disable compression",
+    )
+    parser.add_argument(
+        "--keepalive", type=float, default=5.0, help="seconds between keepalives"
+    )
+    parser.add_argument(
+        "-i", "--interval", type=float, default=10.0, help="seconds between reports"
+    )
+    args = parser.parse_args(argv)
+
+    configure_logging(args.verbose)
+
+    traffic = Traffic(
+        rate=args.rate,
+        mix=args.mix,
+        entities=args.entities,
+        sections=args.sections,
+        chat_size=args.chat_size,
+        threshold=args.threshold,
+    )
+    server = Server(args.address[0], args.address[1], traffic, keepalive=args.keepalive)
+
+    try:
+        asyncio.run(server.run(args.interval))
+    except KeyboardInterrupt:
+        logging.warning("User interrupt")
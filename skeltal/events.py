@@ -1,24 +1,338 @@
+"""Dispatch of received messages to subscribers.
+
+Subscribers are kept in a table keyed by message type, so publishing a
+message only looks at the subscribers of its type, and wildcard
+subscribers of all types. A subscriber may have a predicate, called with
+the message, to filter messages before its callback runs.
+
+Subscribers are called on the connection's thread, before it handles
+the next packet. Their errors are logged and counted in
+:attr:`EventsRegistry.errors`, without affecting the connection. Slow
+subscribers should be wrapped in a :class:`ThreadSubscriber` or
+:class:`AsyncSubscriber`, which queue messages and run the callback on
+a thread pool or an event loop. Their queues are bounded, and what
+happens when one is full is up to its :class:`Overflow` policy.
+"""
+import asyncio
+import enum
+import inspect
 import logging
-from skeltal.protocol import clientbound
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 LOGGER = logging.getLogger(__name__)
 
+# Subscribe to messages of all types
+ANY = None
+
+_EXECUTOR = None
+
+
+def executor():
+    """Thread pool shared by all thread subscribers."""
+    global _EXECUTOR  # pylint: disable=global-statement
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(thread_name_prefix="skeltal-events")
+    return _EXECUTOR
+
+
+def _message_type(message):
+    return message._type
+
+
+class Overflow(enum.Enum):
+    """What a full subscriber queue does with another message."""
+
+    # Wait for room, stalling the connection
+    BLOCK = "block"
+    # Drop the oldest queued message
+    DROP_OLDEST = "drop-oldest"
+    # Keep only the latest message per key, dropping the oldest if full
+    COALESCE_LATEST = "coalesce-latest"
+
+
+class SubscriberStats:
+    """Counters of a queued subscriber."""
+
+    __slots__ = (
+        "depth",
+        "max_depth",
+        "delivered",
+        "dropped",
+        "coalesced",
+        "blocked",
+        "errors",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v}" for k, v in self.as_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class QueuedSubscriber:
+    """Callback run from a bounded queue instead of by the publisher.
+
+    Subscribe an instance in place of the callback. Messages are queued
+    in order, up to `maxsize`, and the callback gets them one at a time.
+    With :attr:`Overflow.COALESCE_LATEST`, a queued message is replaced
+    by a newer message with the same ``key(message)``, by default its
+    type. Subclasses run :meth:`_drain` somewhere else.
+    """
+
+    def __init__(self, callback, maxsize=1024, overflow=Overflow.DROP_OLDEST, key=None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.callback = callback
+        self.name = getattr(callback, "__qualname__", repr(callback))
+        self.maxsize = maxsize
+        self.overflow = Overflow(overflow)
+        self.key = key or _message_type
+        self.stats = SubscriberStats()
+
+        # Coalescing queues are dicts by key, which keep insertion order
+        coalesce = self.overflow is Overflow.COALESCE_LATEST
+        self._items = {} if coalesce else deque()
+        self._lock = threading.Condition()
+        self._scheduled = False
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name}, {self.overflow.value})"
+
+    def __call__(self, message):
+        # Keep undecoded payloads valid after the receive buffer is reused
+        release = getattr(message, "release", None)
+        if release is not None:
+            release()
+
+        stats, items = self.stats, self._items
+        with self._lock:
+            if self.overflow is Overflow.COALESCE_LATEST:
+                key = self.key(message)
+                if key in items:
+                    items[key] = message
+                    stats.coalesced += 1
+                    return
+                if len(items) >= self.maxsize:
+                    del items[next(iter(items))]
+                    stats.dropped += 1
+                items[key] = message
+            else:
+                if len(items) >= self.maxsize:
+                    if self.overflow is Overflow.BLOCK:
+                        stats.blocked += 1
+                        self._lock.wait_for(lambda: len(items) < self.maxsize)
+                    else:
+                        items.popleft()
+                        stats.dropped += 1
+                items.append(message)
+
+            stats.depth = len(items)
+            stats.max_depth = max(stats.max_depth, stats.depth)
+            schedule = not self._scheduled
+            self._scheduled = True
+
+        if schedule:
+            self._schedule()
+
+    def _schedule(self):
+        raise NotImplementedError
+
+    def _next(self):
+        """Next queued message, or None once the queue is empty."""
+        with self._lock:
+            items = self._items
+            if not items:
+                self._scheduled = False
+                return None
+            if isinstance(items, dict):
+                message = items.pop(next(iter(items)))
+            else:
+                message = items.popleft()
+            self.stats.depth = len(items)
+            self._lock.notify()
+            return message
+
+    def _drain(self):
+        while True:
+            message = self._next()
+            if message is None:
+                return
+            try:
+                self.callback(message)
+            except Exception:  # pylint: disable=broad-except
+                self.stats.errors += 1
+                LOGGER.exception("Subscriber %s failed", self.name)
+            self.stats.delivered += 1
+
+
+class ThreadSubscriber(QueuedSubscriber):
+    """Queued subscriber called on a thread pool.
+
+    Messages are still delivered in order, by at most one thread at a
+    time per subscriber.
+    """
+
+    def __init__(self, callback, *args, pool=None, **kwargs):
+        super().__init__(callback, *args, **kwargs)
+        self._pool = pool
+
+    def _schedule(self):
+        (self._pool or executor()).submit(self._drain)
+
+
+class AsyncSubscriber(QueuedSubscriber):
+    """Queued subscriber called in a task on an event loop.
+
+    The callback may be a coroutine function, in which case the next
+    message is delivered once the previous one was awaited. The loop is
+    the one running when the first message is queued, unless given.
+    Blocking could deadlock the loop, so :attr:`Overflow.BLOCK` isn't
+    supported.
+    """
+
+    def __init__(self, callback, *args, loop=None, **kwargs):
+        super().__init__(callback, *args, **kwargs)
+        if self.overflow is Overflow.BLOCK:
+            raise ValueError("AsyncSubscriber can't block")
+        self._loop = loop
+        self._task = None
+
+    def _schedule(self):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is None:
+            if running is None:
+                self._scheduled = False
+                raise RuntimeError("AsyncSubscriber needs a running event loop")
+            self._loop = running
+
+        if running is self._loop:
+            self._start()
+        else:
+            self._loop.call_soon_threadsafe(self._start)
+
+    def _start(self):
+        self._task = self._loop.create_task(self._drain_async())
+
+    async def _drain_async(self):
+        while True:
+            message = self._next()
+            if message is None:
+                return
+            try:
+                result = self.callback(message)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:  # pylint: disable=broad-except
+                self.stats.errors += 1
+                LOGGER.exception("Subscriber %s failed", self.name)
+            self.stats.delivered += 1
+
 
 class EventsRegistry:
     def __init__(self):
-        self._seen = set()
+        # Tuples, replaced on changes, so callbacks can (un)subscribe
+        self._subscribers = {}
+        self._wildcard = ()
+        self._watchers = []
+        #: Errors raised by subscribers or their predicates
+        self.errors = 0
+
+    def __repr__(self):
+        return f"EventsRegistry({len(self._subscribers)} types)"
+
+    @property
+    def subscribed_types(self):
+        """Message types with subscribers, not counting wildcards."""
+        return frozenset(self._subscribers)
+
+    @property
+    def has_wildcard(self):
+        """Whether some subscriber wants messages of all types."""
+        return bool(self._wildcard)
+
+    def wants(self, message_type):
+        """Whether messages of a type have subscribers."""
+        return bool(self._wildcard) or message_type in self._subscribers
 
     def publish(self, message):
-        if message._type not in self._seen:
-            self._seen.add(message._type)
-
-        if message._type is clientbound.Play.JoinGame:
-            LOGGER.info(
-                "Joined game:\n%s",
-                "\n".join(
-                    f"{k}: {v}" for k, v in message.items() if not k.startswith("_")
-                ),
+        subscribers = self._subscribers.get(message._type)
+        if subscribers is not None:
+            for callback, predicate in subscribers:
+                try:
+                    if predicate is None or predicate(message):
+                        callback(message)
+                except Exception:  # pylint: disable=broad-except
+                    self._failed(callback)
+
+        for callback, predicate in self._wildcard:
+            try:
+                if predicate is None or predicate(message):
+                    callback(message)
+            except Exception:  # pylint: disable=broad-except
+                self._failed(callback)
+
+    def _failed(self, callback):
+        self.errors += 1
+        name = getattr(callback, "__qualname__", repr(callback))
+        LOGGER.exception("Subscriber %s failed", name)
+
+    def subscribe(self, event, callback, predicate=None):
+        """Call ``callback(message)`` for messages of type `event`.
+
+        With `event` :data:`ANY`, the callback gets messages of all types.
+        If given, ``predicate(message)`` has to be true for the callback
+        to be called. Returns the callback.
+        """
+        if event is ANY:
+            self._wildcard += ((callback, predicate),)
+        else:
+            subscribers = self._subscribers.get(event, ())
+            self._subscribers[event] = subscribers + ((callback, predicate),)
+        self._changed()
+        return callback
+
+    def unsubscribe(self, event, callback):
+        """Stop calling callback for messages of type `event`."""
+        if event is ANY:
+            self._wildcard = tuple(
+                entry for entry in self._wildcard if entry[0] != callback
             )
+        else:
+            subscribers = tuple(
+                entry
+                for entry in self._subscribers.get(event, ())
+                if entry[0] != callback
+            )
+            if subscribers:
+                self._subscribers[event] = subscribers
+            else:
+                self._subscribers.pop(event, None)
+        self._changed()
+
+    def queued(self):
+        """Queued subscribers, each once, for reporting their stats."""
+        subscribers = {}
+        for entries in (*self._subscribers.values(), self._wildcard):
+            for callback, _ in entries:
+                if isinstance(callback, QueuedSubscriber):
+                    subscribers[id(callback)] = callback
+        return list(subscribers.values())
+
+    def watch(self, callback):
+        """Call ``callback()`` when subscriptions change."""
+        self._watchers.append(callback)
 
-    def subscribe(self, event, callback):
-        pass
+    def _changed(self):
+        for callback in self._watchers:
+            callback()
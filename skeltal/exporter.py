@@ -0,0 +1,320 @@
+"""Prometheus metrics of all bots in the process, served over HTTP.
+
+Bots register themselves on creation, and are forgotten once garbage
+collected. :func:`serve` starts an HTTP server on a thread, which
+renders the counters of all bots in the Prometheus text format on each
+scrape of ``/metrics``, summed over the bots:
+
+- bots by connection state
+- packets and bytes received and sent, keepalives
+- keepalive latency, from receiving one to sending the response
+- packets waiting to be sent, and queued in subscribers
+- bytes of compressed frames received, and inflated from them
+- lag of the event loops bots run on
+- packets by type, for bots measuring them with ``stats``
+
+Counters are read without locking, so a scrape may see them mid-update.
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from skeltal.protocol.metrics import Histogram, PacketMetrics
+
+LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets exported, from 2 ** 10 ns (1 us) to 2 ** 35 ns (34 s)
+EXPORTED_BUCKETS = range(10, 36)
+
+BOTS = weakref.WeakSet()
+
+_EXPORTER = None
+
+
+def register(bot):
+    """Include a bot in the metrics."""
+    BOTS.add(bot)
+
+
+def watch_loop(loop=None, interval=0.5):
+    """Measure lag of an event loop, by default the running one.
+
+    Does nothing unless metrics are served.
+    """
+    if _EXPORTER is not None:
+        _EXPORTER.watch_loop(loop or asyncio.get_running_loop(), interval)
+
+
+def serve(address="localhost", port=9404):
+    """Serve metrics of all bots, return the :class:`Exporter`."""
+    global _EXPORTER  # pylint: disable=global-statement
+    if _EXPORTER is None:
+        _EXPORTER = Exporter(address, port)
+        _EXPORTER.start()
+    return _EXPORTER
+
+
+def stop():
+    global _EXPORTER  # pylint: disable=global-statement
+    if _EXPORTER is not None:
+        _EXPORTER.stop()
+        _EXPORTER = None
+
+
+class LoopLag:
+    """Lag of an event loop, as lateness of a callback it runs regularly."""
+
+    def __init__(self, loop, interval=0.5):
+        self.loop = loop
+        self.interval = interval
+        self.lag = Histogram()
+        self._handle = None
+        self._expected = 0.0
+        loop.call_soon_threadsafe(self._schedule)
+
+    def __repr__(self):
+        return f"LoopLag({self.lag!r})"
+
+    @property
+    def running(self):
+        return not self.loop.is_closed()
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+
+    def _schedule(self):
+        self._expected = self.loop.time() + self.interval
+        self._handle = self.loop.call_at(self._expected, self._probe)
+
+    def _probe(self):
+        lag = max(0.0, self.loop.time() - self._expected)
+        self.lag.record(int(lag * 1e9))
+        self._schedule()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    exporter = None
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.exporter.collect().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        LOGGER.debug("%s: %s", self.address_string(), format % args)
+
+
+class Exporter:
+    """HTTP server of metrics of the registered bots."""
+
+    def __init__(self, address="localhost", port=9404):
+        self.address = address
+        self.port = port
+        self.loops = []
+        self._server = None
+        self._thread = None
+
+    def __repr__(self):
+        return f"Exporter({self.address}:{self.port})"
+
+    def start(self):
+        """Start serving, resolving `port` if it was 0."""
+        handler = type("Handler", (_Handler,), {"exporter": self})
+        self._server = ThreadingHTTPServer((self.address, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="skeltal-exporter", daemon=True
+        )
+        self._thread.start()
+        LOGGER.info("Serving metrics on http://%s:%d/metrics", self.address, self.port)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for probe in self.loops:
+            probe.cancel()
+
+    def watch_loop(self, loop, interval=0.5):
+        if not any(probe.loop is loop for probe in self.loops):
+            self.loops.append(LoopLag(loop, interval))
+
+    def collect(self, bots=None):
+        """Metrics of `bots`, by default all registered, in the text format."""
+        lines = []
+        bots = list(BOTS if bots is None else bots)
+
+        def metric(name, kind, help_, samples):
+            lines.append(f"# HELP skeltal_{name} {help_}")
+            lines.append(f"# TYPE skeltal_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"skeltal_{name}{labels} {value}")
+
+        def histogram(name, help_, histogram):
+            samples, seen = [], 0
+            for idx, count in enumerate(histogram.buckets):
+                seen += count
+                if idx in EXPORTED_BUCKETS:
+                    samples.append((f'_bucket{{le="{(1 << idx) / 1e9!r}"}}', seen))
+            samples.append(('_bucket{le="+Inf"}', seen))
+            samples.append(("_sum", histogram.total / 1e9))
+            samples.append(("_count", seen))
+            lines.append(f"# HELP skeltal_{name} {help_}")
+            lines.append(f"# TYPE skeltal_{name} histogram")
+            for suffix, value in samples:
+                lines.append(f"skeltal_{name}{suffix} {value}")
+
+        states = {}
+        counters = {}
+        latency, packets = Histogram(), PacketMetrics()
+        outbound = subscribers = dropped = compressed = inflated = 0
+        last_keepalive = None
+        for bot in bots:
+            client = bot.client
+            if not client.is_connected:
+                state = "disconnected"
+            elif client.current_state is None:
+                state = "connecting"
+            else:
+                state = client.current_state.name.lower()
+            states[state] = states.get(state, 0) + 1
+
+            for name, value in client.stats.as_dict().items():
+                counters[name] = counters.get(name, 0) + value
+            latency += client.keepalive_latency
+            if client.last_keepalive is not None:
+                last_keepalive = max(last_keepalive or 0, client.last_keepalive)
+            if client.metrics is not None:
+                packets += client.metrics
+            outbound += client.outbound_depth
+            rx_compressed, rx_inflated = client.compression_rx
+            compressed += rx_compressed
+            inflated += rx_inflated
+            for subscriber in bot.registry.queued():
+                subscribers += subscriber.stats.depth
+                dropped += subscriber.stats.dropped
+
+        metric(
+            "bots",
+            "gauge",
+            "Bots by connection state.",
+            [
+                (f'{{state="{state}"}}', count)
+                for state, count in sorted(states.items())
+            ],
+        )
+        for name, help_ in (
+            ("packets_rx", "Packets received."),
+            ("packets_tx", "Packets sent."),
+            ("bytes_rx", "Bytes received."),
+            ("bytes_tx", "Bytes sent."),
+            ("packets_ignored", "Packets received and dropped undecoded."),
+            ("send_calls", "Writes to sockets."),
+            ("keepalives", "Keepalives answered."),
+        ):
+            metric(f"{name}_total", "counter", help_, [("", counters.get(name, 0))])
+        histogram(
+            "keepalive_latency_seconds",
+            "Time from receiving a keepalive to sending the response.",
+            latency,
+        )
+        if last_keepalive is not None:
+            metric(
+                "keepalive_age_seconds",
+                "gauge",
+                "Time since any bot last received a keepalive.",
+                [("", round(time.monotonic() - last_keepalive, 3))],
+            )
+        metric(
+            "outbound_queue_packets",
+            "gauge",
+            "Packets waiting to be sent.",
+            [("", outbound)],
+        )
+        metric(
+            "subscriber_queue_messages",
+            "gauge",
+            "Messages queued in queued subscribers.",
+            [("", subscribers)],
+        )
+        metric(
+            "subscriber_dropped_total",
+            "counter",
+            "Messages dropped by full subscriber queues.",
+            [("", dropped)],
+        )
+        metric(
+            "compressed_bytes_rx_total",
+            "counter",
+            "Bytes of compressed frames received.",
+            [("", compressed)],
+        )
+        metric(
+            "inflated_bytes_rx_total",
+            "counter",
+            "Bytes inflated from compressed frames received.",
+            [("", inflated)],
+        )
+        metric(
+            "compression_ratio",
+            "gauge",
+            "Inflated per compressed bytes received.",
+            [("", round(inflated / compressed, 3) if compressed else 0.0)],
+        )
+
+        self.loops = [probe for probe in self.loops if probe.running]
+        lag = Histogram()
+        for probe in self.loops:
+            lag += probe.lag
+        histogram("event_loop_lag_seconds", "Lateness of event loop callbacks.", lag)
+
+        if packets.types:
+            types = sorted(packets.types.values(), key=lambda m: str(m.type))
+            for name, help_, value in (
+                ("type_packets_rx_total", "Packets received", lambda m: m.count),
+                (
+                    "type_wire_bytes_rx_total",
+                    "Bytes on the wire",
+                    lambda m: m.wire_bytes,
+                ),
+                (
+                    "type_data_bytes_rx_total",
+                    "Bytes decompressed",
+                    lambda m: m.data_bytes,
+                ),
+                (
+                    "type_parse_seconds_total",
+                    "Time parsing",
+                    lambda m: m.parse.total / 1e9,
+                ),
+                (
+                    "type_handle_seconds_total",
+                    "Time handling",
+                    lambda m: m.handle.total / 1e9,
+                ),
+            ):
+                metric(
+                    name,
+                    "counter",
+                    f"{help_}, by packet type.",
+                    [
+                        (f'{{type="{getattr(m.type, "name", m.type)}"}}', value(m))
+                        for m in types
+                    ],
+                )
+
+        lines.append("")
+        return "\n".join(lines)
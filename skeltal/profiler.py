@@ -0,0 +1,283 @@
+"""On-demand profiling of the threads bots run on.
+
+A :class:`Profiler` runs for a bounded duration over the threads of the
+connections it's given, either sampling their stacks every few
+milliseconds with ``sys._current_frames()``, or with ``cProfile``
+enabled on them. It then writes a report of the time spent by subsystem
+(framing, decompression, parsing, handlers, events, the rest of the
+connection, idle) and the top functions, and either the sampled stacks
+in the collapsed format of flamegraph tools, or the ``cProfile`` stats.
+
+:func:`profile` profiles all bots of the process, :func:`profile_on_signal`
+does so when the process gets ``SIGUSR2``.
+"""
+import cProfile
+import io
+import logging
+import pstats
+import signal
+import sys
+import threading
+import time
+from skeltal import exporter
+
+LOGGER = logging.getLogger(__name__)
+
+MODES = ("sample", "cprofile")
+
+# (subsystem, path fragment, function name fragment): the innermost frame
+# of a sample, or a profiled function, goes to the first one it matches.
+# C functions profiled have "~" as path.
+SUBSYSTEMS = (
+    ("decompression", "skeltal/protocol/framing.py", "inflate"),
+    ("decompression", "~", "decompress"),
+    ("framing", "skeltal/protocol/framing.py", None),
+    ("framing", "skeltal/protocol/varint.py", None),
+    ("parsing", "skeltal/protocol/codecs.py", None),
+    ("parsing", "skeltal/protocol/types.py", None),
+    ("parsing", "construct/", None),
+    ("handlers", "skeltal/protocol/handlers.py", None),
+    ("events", "skeltal/events.py", None),
+    ("events", "skeltal/world/", None),
+    ("idle", "selectors.py", None),
+    ("idle", "~", "select"),
+    ("idle", "~", "poll"),
+    # Blocked in select.select(), which samples don't show
+    ("idle", "skeltal/protocol/connection.py", "_connection_loop"),
+    ("connection", "skeltal/protocol/connection.py", None),
+    ("connection", "skeltal/protocol/aio.py", None),
+)
+
+_ACTIVE = None
+
+
+def subsystem(path, function):
+    """Subsystem of a function defined in the file at `path`."""
+    path = path.replace("\\", "/")
+    for name, fragment, function_fragment in SUBSYSTEMS:
+        if fragment in path and (
+            function_fragment is None or function_fragment in function
+        ):
+            return name
+    return "other"
+
+
+def profile(bots=None, duration=10.0, path="skeltal-profile", mode="sample"):
+    """Profile `bots`, by default all registered, for `duration` seconds.
+
+    Returns the :class:`Profiler`, already running. Only one runs at a
+    time: while it does, returns it again.
+    """
+    global _ACTIVE  # pylint: disable=global-statement
+    if _ACTIVE is not None and _ACTIVE.running:
+        LOGGER.warning("Already profiling, until %s is written", _ACTIVE.path)
+        return _ACTIVE
+
+    _ACTIVE = Profiler(duration, path, mode)
+    for bot in list(exporter.BOTS if bots is None else bots):
+        _ACTIVE.attach(bot.client)
+    _ACTIVE.start()
+    return _ACTIVE
+
+
+def profile_on_signal(signum=getattr(signal, "SIGUSR2", None), **options):
+    """Profile all bots when the process gets `signum`, see :func:`profile`.
+
+    Returns False if the platform has no such signal.
+    """
+    if signum is None:
+        return False
+    signal.signal(signum, lambda _signum, _frame: profile(**options))
+    return True
+
+
+class Profiler:
+    """Profile of connection threads for `duration` seconds.
+
+    Writes the report to `path` with a timestamp and ``.txt`` appended,
+    and the collapsed stacks sampled every `interval` seconds, or the
+    ``cProfile`` stats, next to it with ``.collapsed`` or ``.prof``.
+    """
+
+    def __init__(
+        self, duration=10.0, path="skeltal-profile", mode="sample", interval=0.005
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.duration = duration
+        self.mode = mode
+        self.interval = interval
+        self.path = f"{path}-{time.strftime('%Y%m%d-%H%M%S')}"
+        #: Paths written once done
+        self.paths = []
+        #: Collapsed stacks and their number of samples
+        self.stacks = {}
+        #: Samples, or seconds with cProfile, by subsystem
+        self.subsystems = {}
+        self.samples = 0
+        #: Stats of the cProfile session
+        self.stats = None
+
+        self._threads = {}
+        self._profiles = {}
+        self._disabled = threading.Semaphore(0)
+        self._thread = threading.Thread(
+            target=self._run, name="skeltal-profiler", daemon=True
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def __repr__(self):
+        return f"Profiler({self.mode}, {self.duration}s, {self.path})"
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def attach(self, connection):
+        """Profile the thread or event loop `connection` runs on."""
+        if not connection.is_running:
+            return
+        # pylint: disable=protected-access
+        connection._call_soon_threadsafe(
+            lambda: self._attached(connection._call_soon_threadsafe)
+        )
+
+    def start(self):
+        LOGGER.info("Profiling for %.1fs (%s)", self.duration, self.mode)
+        self._thread.start()
+
+    def stop(self):
+        """Stop early, still writing the output."""
+        self._stop.set()
+
+    def join(self, timeout=None):
+        """Wait for the output to be written, return its paths."""
+        self._thread.join(timeout)
+        return self.paths
+
+    def _attached(self, call_soon_threadsafe):
+        ident = threading.get_ident()
+        with self._lock:
+            if ident in self._threads or self._stop.is_set():
+                return
+            self._threads[ident] = call_soon_threadsafe
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as err:
+                # Profiling is process wide from Python 3.12 on
+                LOGGER.debug("Not profiling %s: %s", threading.current_thread(), err)
+                return
+            self._profiles[ident] = profiler
+
+    def _detach(self, ident):
+        self._profiles[ident].disable()
+        self._disabled.release()
+
+    def _run(self):
+        deadline = time.monotonic() + self.duration
+        try:
+            if self.mode == "sample":
+                while not self._stop.wait(self.interval):
+                    if time.monotonic() >= deadline:
+                        break
+                    self._sample()
+            else:
+                self._stop.wait(self.duration)
+        finally:
+            self._stop.set()
+        if self.mode == "cprofile":
+            self._collect_cprofile()
+        self._write()
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()  # pylint: disable=protected-access
+        for ident in list(self._threads):
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            self.samples += 1
+            # Samples go to the subsystem of the innermost frame in one
+            name = None
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                module = frame.f_globals.get("__name__", "?")
+                stack.append(f"{module}.{code.co_name}")
+                if name is None:
+                    name = subsystem(code.co_filename, code.co_name)
+                    name = None if name == "other" else name
+                frame = frame.f_back
+            name = name or "other"
+            self.subsystems[name] = self.subsystems.get(name, 0) + 1
+            stack.append(names.get(ident, str(ident)))
+            collapsed = ";".join(reversed(stack))
+            self.stacks[collapsed] = self.stacks.get(collapsed, 0) + 1
+
+    def _collect_cprofile(self):
+        with self._lock:
+            threads = [(ident, self._threads[ident]) for ident in self._profiles]
+        for ident, call_soon_threadsafe in threads:
+            call_soon_threadsafe(lambda ident=ident: self._detach(ident))
+        for _ in threads:
+            # Connections closed meanwhile never disable theirs
+            if not self._disabled.acquire(timeout=1.0):
+                break
+
+        if not self._profiles:
+            return
+        self.stats = pstats.Stats(*self._profiles.values())
+        for (path, _line, function), entry in self.stats.stats.items():
+            name = subsystem(path, function)
+            self.subsystems[name] = self.subsystems.get(name, 0.0) + entry[2]
+
+    def _write(self):
+        unit, digits = ("samples", 0) if self.mode == "sample" else ("seconds", 4)
+        total = sum(self.subsystems.values())
+        busy = total - self.subsystems.get("idle", 0)
+        lines = [
+            f"# skeltal profile ({self.mode}) of {len(self._threads)} thread(s) "
+            f"for {self.duration:.1f}s, at {time.strftime('%Y-%m-%d %H:%M:%S')}",
+            "",
+            f"{'subsystem':<16} {unit:>10} {'total':>8} {'busy':>8}",
+        ]
+        for name, value in sorted(self.subsystems.items(), key=lambda i: -i[1]):
+            lines.append(
+                f"{name:<16} {value:>10.{digits}f} {_percent(value, total):>8} "
+                f"{'' if name == 'idle' else _percent(value, busy):>8}"
+            )
+
+        if self.mode == "sample":
+            functions = {}
+            for stack, count in self.stacks.items():
+                function = stack.rsplit(";", 1)[-1]
+                functions[function] = functions.get(function, 0) + count
+            top = sorted(functions.items(), key=lambda item: -item[1])[:30]
+            lines += ["", f"Top functions by samples of {self.samples}:"]
+            for function, count in top:
+                percent = _percent(count, self.samples)
+                lines.append(f"{count:>8} {percent:>8} {function}")
+            with open(f"{self.path}.collapsed", "w", encoding="utf-8") as fd:
+                fd.writelines(
+                    f"{stack} {count}\n" for stack, count in sorted(self.stacks.items())
+                )
+            self.paths.append(f"{self.path}.collapsed")
+        elif self.stats is not None:
+            stream = io.StringIO()
+            self.stats.stream = stream
+            self.stats.sort_stats("cumulative").print_stats(30)
+            lines += ["", stream.getvalue()]
+            self.stats.dump_stats(f"{self.path}.prof")
+            self.paths.append(f"{self.path}.prof")
+
+        with open(f"{self.path}.txt", "w", encoding="utf-8") as fd:
+            fd.write("\n".join(lines) + "\n")
+        self.paths.insert(0, f"{self.path}.txt")
+        LOGGER.info("Wrote profile to %s", ", ".join(self.paths))
+
+
+def _percent(value, total):
+    return f"{value / total * 100:.1f}%" if total else "-"
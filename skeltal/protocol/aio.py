@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import threading
+
+from skeltal.protocol.connection import BaseConnection
+from skeltal.protocol.state import State
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AsyncClientConnection(BaseConnection, asyncio.BufferedProtocol):
+    """Connection engine running as a protocol on an asyncio event loop.
+
+    Any number of connections can share a single event loop. Incoming
+    data is received straight into the frame buffer, and outgoing
+    packets are written to the transport once per loop iteration.
+    """
+
+    def __init__(self, address, port, registry, **options):
+        super().__init__(address, port, registry, **options)
+
+        self._loop = None
+        self._loop_thread = None
+        self._transport = None
+        self._closed = None
+        self._flush_handle = None
+
+    @property
+    def is_connected(self):
+        return self._transport is not None and not self._closed.done()
+
+    @property
+    def is_running(self):
+        return self._transport is not None and not self._transport.is_closing()
+
+    async def start(self):
+        assert not self.is_connected, "Client already connected"
+
+        LOGGER.info("Connecting to %s:%d", self.address, self.port)
+        loop = self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._closed = loop.create_future()
+        await loop.create_connection(lambda: self, self.address, self.port)
+
+        self.state(State.HANDSHAKING)
+
+    def stop(self):
+        if self.is_running:
+            self._flush()
+            self._transport.close()
+
+    async def wait_closed(self):
+        await asyncio.shield(self._closed)
+
+    async def run_forever(self):
+        try:
+            await self.start()
+            await self.wait_closed()
+        finally:
+            self.stop()
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        if exc is not None:
+            LOGGER.error("Connection lost: %s", exc)
+        self.stop_capture()
+        self.dump_recorder(f"connection lost: {exc}" if exc else "disconnected")
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+    def eof_received(self):
+        LOGGER.info("Connection closed by server")
+
+    def get_buffer(self, sizehint):
+        return self._buffer.get_buffer(max(sizehint, 2048))
+
+    def buffer_updated(self, nbytes):
+        self._buffer.commit(nbytes)
+        self.stats.bytes_rx += nbytes
+        if not self._receive_frames():
+            self.stop()
+
+    def _write(self, packet_id, data):
+        # Thread subscribers dispatch off the event loop
+        if threading.get_ident() == self._loop_thread:
+            super()._write(packet_id, data)
+        else:
+            self._call_soon_threadsafe(
+                lambda: BaseConnection._write(self, packet_id, data)
+            )
+
+    def _schedule_flush(self):
+        loop = asyncio.get_running_loop()
+        if self._flush_window > 0:
+            self._flush_handle = loop.call_later(self._flush_window, self._flush)
+        else:
+            self._flush_handle = loop.call_soon(self._flush)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        super()._flush()
+
+    def _send_bytes(self, data):
+        if not self._transport.is_closing():
+            self._transport.write(data)
+
+    def _call_soon_threadsafe(self, callback):
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(callback)
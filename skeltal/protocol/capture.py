@@ -0,0 +1,129 @@
+"""Capture of raw protocol frames to a file.
+
+A capture is a binary log of frames exactly as sent over the socket,
+including the length prefix, each with a small header::
+
+    direction  u8   RX (0) or TX (1)
+    state      u8   connection state, 255 before the handshake
+    threshold  i32  compression threshold, -1 if disabled
+    timestamp  f64  seconds since the epoch
+    length     u32  size of the frame
+
+in little endian, after an 8 byte file header. Captures are read by
+memory mapping the file, so frames are replayed without copying them
+out of it first, see :mod:`skeltal.protocol.replay`.
+"""
+import logging
+import mmap
+import struct
+import time
+from skeltal.protocol.state import State
+
+LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"SKLTCAP\x01"
+RX = 0
+TX = 1
+NO_STATE = 255
+
+_HEADER = struct.Struct("<BBidI")
+
+
+class Record:
+    """Frame of a capture."""
+
+    __slots__ = ("direction", "state", "threshold", "timestamp", "frame")
+
+    def __init__(self, direction, state, threshold, timestamp, frame):
+        self.direction = direction
+        self.state = state
+        self.threshold = threshold
+        self.timestamp = timestamp
+        self.frame = frame
+
+    def __repr__(self):
+        direction = "RX" if self.direction == RX else "TX"
+        return f"Record({direction}, {self.state!r}, {len(self.frame)} bytes)"
+
+
+class CaptureWriter:
+    """Appends frames to a capture file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self._file = open(path, "ab")  # pylint: disable=consider-using-with
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def write(self, direction, state, threshold, frame, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        state = NO_STATE if state is None else int(state)
+        header = _HEADER.pack(direction, state, threshold, timestamp, len(frame))
+        self._file.write(header)
+        self._file.write(frame)
+        self.frames += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            LOGGER.info("Captured %d frames to %s", self.frames, self.path)
+
+
+class CaptureReader:
+    """Memory mapped capture file, iterating over its records.
+
+    Frames of the records are memoryviews into the mapping, only valid
+    until the reader is closed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fd:
+            self._mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if self._view[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a capture file: {path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        view, unpack, size = self._view, _HEADER.unpack_from, _HEADER.size
+        offset, end = len(MAGIC), len(view)
+        while offset + size <= end:
+            direction, state, threshold, timestamp, length = unpack(view, offset)
+            offset += size
+            if offset + length > end:
+                LOGGER.warning("Capture %s ends with a partial frame", self.path)
+                return
+            state = None if state == NO_STATE else State(state)
+            frame = view[offset : offset + length]
+            offset += length
+            yield Record(direction, state, threshold, timestamp, frame)
+
+    def close(self):
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Frames of records are still referenced, and keep it mapped
+            pass
@@ -1,5 +1,6 @@
 from enum import IntEnum
 from construct import (
+    Array,
     Int8sb,
     Int8ub,
     Int16sb,
@@ -20,7 +21,7 @@ from construct import (
     this,
     len_,
 )
-from skeltal.protocol.types import VarInt, VarString
+from skeltal.protocol.types import Angle, Position, VarInt, VarString
 
 
 def parse_stream(threshold, stream):
@@ -197,17 +198,55 @@ LoginPluginRequest = Struct(
 
 # Play
 
-SpawnObject = Struct()
+SpawnObject = Struct(
+    "entity_id" / VarInt,
+    "uuid" / Bytes(16),
+    "type" / Int8sb,
+    "x" / Float64b,
+    "y" / Float64b,
+    "z" / Float64b,
+    "pitch" / Angle,
+    "yaw" / Angle,
+    "data" / Int32sb,
+    "velocity_x" / Int16sb,
+    "velocity_y" / Int16sb,
+    "velocity_z" / Int16sb,
+)
 
 SpawnExperienceOrb = Struct()
 
 SpawnGlobalEntity = Struct()
 
-SpawnMob = Struct()
+SpawnMob = Struct(
+    "entity_id" / VarInt,
+    "uuid" / Bytes(16),
+    "type" / VarInt,
+    "x" / Float64b,
+    "y" / Float64b,
+    "z" / Float64b,
+    "yaw" / Angle,
+    "pitch" / Angle,
+    "head_pitch" / Angle,
+    "velocity_x" / Int16sb,
+    "velocity_y" / Int16sb,
+    "velocity_z" / Int16sb,
+    # Entity metadata, not parsed
+    "metadata" / GreedyBytes,
+)
 
 SpawnPainting = Struct()
 
-SpawnPlayer = Struct()
+SpawnPlayer = Struct(
+    "entity_id" / VarInt,
+    "uuid" / Bytes(16),
+    "x" / Float64b,
+    "y" / Float64b,
+    "z" / Float64b,
+    "yaw" / Angle,
+    "pitch" / Angle,
+    # Entity metadata, not parsed
+    "metadata" / GreedyBytes,
+)
 
 Animation = Struct()
 
@@ -219,15 +258,29 @@ UpdateBlockEntity = Struct()
 
 BlockAction = Struct()
 
-BlockChange = Struct()
+BlockChange = Struct("location" / Position, "block_id" / VarInt)
 
 BossBar = Struct()
 
 ServerDifficulty = Struct()
 
-ChatMessage = Struct()
-
-MultiBlockChange = Struct()
+ChatMessage = Struct("json_data" / VarString, "position" / Int8sb)
+
+MultiBlockChange = Struct(
+    "chunk_x" / Int32sb,
+    "chunk_z" / Int32sb,
+    "count" / Rebuild(VarInt, len_(this.records)),
+    "records"
+    / Array(
+        this.count,
+        Struct(
+            # Block coordinates relative to the chunk, as x << 4 | z
+            "horizontal" / Int8ub,
+            "y" / Int8ub,
+            "block_id" / VarInt,
+        ),
+    ),
+)
 
 TabComplete = Struct()
 
@@ -259,13 +312,23 @@ NBTQueryResponse = Struct()
 
 Explosion = Struct()
 
-UnloadChunk = Struct()
+UnloadChunk = Struct("x" / Int32sb, "z" / Int32sb)
 
 ChangeGameState = Struct()
 
 KeepAlive = Struct("id" / Int64sb)
 
-ChunkData = Struct()
+ChunkData = Struct(
+    "x" / Int32sb,
+    "z" / Int32sb,
+    "full_chunk" / Flag,
+    "bit_mask" / VarInt,
+    "size" / Rebuild(VarInt, len_(this.data)),
+    "data" / Bytes(this.size),
+    # NBT compounds of block entities, not parsed
+    "block_entity_count" / VarInt,
+    "block_entities" / GreedyBytes,
+)
 
 Effect = Struct()
 
@@ -285,11 +348,28 @@ MapData = Struct()
 
 Entity = Struct()
 
-EntityRelativeMove = Struct()
+EntityRelativeMove = Struct(
+    "entity_id" / VarInt,
+    # Change in position as (current * 32 - previous * 32) * 128
+    "delta_x" / Int16sb,
+    "delta_y" / Int16sb,
+    "delta_z" / Int16sb,
+    "on_ground" / Flag,
+)
 
-EntityLookAndRelativeMove = Struct()
+EntityLookAndRelativeMove = Struct(
+    "entity_id" / VarInt,
+    "delta_x" / Int16sb,
+    "delta_y" / Int16sb,
+    "delta_z" / Int16sb,
+    "yaw" / Angle,
+    "pitch" / Angle,
+    "on_ground" / Flag,
+)
 
-EntityLook = Struct()
+EntityLook = Struct(
+    "entity_id" / VarInt, "yaw" / Angle, "pitch" / Angle, "on_ground" / Flag
+)
 
 VehicleMove = Struct()
 
@@ -311,13 +391,21 @@ UseBed = Struct()
 
 UnlockRecipes = Struct()
 
-DestroyEntities = Struct()
+DestroyEntities = Struct(
+    "count" / Rebuild(VarInt, len_(this.entity_ids)),
+    "entity_ids" / Array(this.count, VarInt),
+)
 
 RemoveEntityEffect = Struct()
 
 ResourcePackSend = Struct()
 
-Respawn = Struct()
+Respawn = Struct(
+    "dimension" / Enum(Int32sb, Nether=-1, Overworld=0, End=1),
+    "difficulty" / Enum(Int8ub, Peaceful=0, Easy=1, Normal=2, Hard=3),
+    "game_mode" / Enum(Int8ub, Survival=0, Creative=1, Adventure=2, Spectator=3),
+    "level_type" / VarString,
+)
 
 EntityHeadLook = Struct()
 
@@ -335,7 +423,13 @@ EntityMetadata = Struct()
 
 AttachEntity = Struct()
 
-EntityVelocity = Struct()
+EntityVelocity = Struct(
+    # Velocity in units of 1/8000 blocks per tick
+    "entity_id" / VarInt,
+    "velocity_x" / Int16sb,
+    "velocity_y" / Int16sb,
+    "velocity_z" / Int16sb,
+)
 
 EntityEquipment = Struct()
 
@@ -365,7 +459,15 @@ PlayerListHeaderAndFooter = Struct()
 
 CollectItem = Struct()
 
-EntityTeleport = Struct()
+EntityTeleport = Struct(
+    "entity_id" / VarInt,
+    "x" / Float64b,
+    "y" / Float64b,
+    "z" / Float64b,
+    "yaw" / Angle,
+    "pitch" / Angle,
+    "on_ground" / Flag,
+)
 
 Advancements = Struct()
 
@@ -0,0 +1,166 @@
+import logging
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.state import State
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Codec:
+    """Parser and builder for a single packet type.
+
+    The packet struct is compiled with construct on first use. Pieces
+    construct cannot compile, such as the custom VarInt, are linked into
+    the compiled code as is, and structs which fail to compile or to run
+    compiled fall back to the interpreted struct.
+    """
+
+    __slots__ = ("type", "struct", "_compiled")
+
+    def __init__(self, message_type, struct):
+        self.type = message_type
+        self.struct = struct
+        self._compiled = None
+
+    def __repr__(self):
+        return f"Codec({self.type!r})"
+
+    @property
+    def compiled(self):
+        if self._compiled is None:
+            self._compile()
+        return self._compiled is not self.struct
+
+    def parse(self, data):
+        compiled = self._compiled or self._compile()
+        if compiled is self.struct:
+            return compiled.parse(data)
+
+        try:
+            return compiled.parse(data)
+        except Exception:  # pylint: disable=broad-except
+            message = self.struct.parse(data)
+            self._fallback("parse")
+            return message
+
+    def build(self, message):
+        compiled = self._compiled or self._compile()
+        if compiled is self.struct:
+            return compiled.build(message)
+
+        try:
+            return compiled.build(message)
+        except Exception:  # pylint: disable=broad-except
+            data = self.struct.build(message)
+            self._fallback("build")
+            return data
+
+    def message(self, data):
+        """Wrap raw payload as a lazily parsed message."""
+        return LazyMessage(self, data)
+
+    def _compile(self):
+        try:
+            self._compiled = self.struct.compile()
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.debug("Using interpreted struct for %s: %s", self.type, exc)
+            self._compiled = self.struct
+        return self._compiled
+
+    def _fallback(self, action):
+        LOGGER.debug("Compiled %s failed for %s, using interpreted", action, self.type)
+        self._compiled = self.struct
+
+
+class LazyMessage:
+    """Packet which is parsed only when its fields are first accessed.
+
+    Holds the packet type and the raw payload, which may be a memoryview
+    into the connection's receive buffer. Call :meth:`release` before
+    the buffer is reused to keep an undecoded message valid.
+    """
+
+    __slots__ = ("_type", "_codec", "_data", "_fields")
+
+    def __init__(self, codec, data):
+        self._type = codec.type
+        self._codec = codec
+        self._data = data
+        self._fields = None
+
+    def __repr__(self):
+        state = "decoded" if self.is_decoded else f"{len(self._data)} bytes"
+        return f"LazyMessage({self._type!r}, {state})"
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        # Item access is much faster than attributes of construct Containers
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, key):
+        return self.fields[key]
+
+    @property
+    def is_decoded(self):
+        return self._fields is not None
+
+    @property
+    def payload(self):
+        """Raw payload of the packet, None once decoded."""
+        return self._data
+
+    @property
+    def fields(self):
+        """Parsed fields of the packet as a construct Container.
+
+        Safe to call from several threads: the payload is read before
+        checking again for fields, which are stored before it's cleared.
+        """
+        fields = self._fields
+        if fields is None:
+            data = self._data
+            fields = self._fields
+            if fields is None:
+                fields = self._fields = self._codec.parse(data)
+                self._data = None
+        return fields
+
+    def items(self):
+        return self.fields.items()
+
+    def release(self):
+        """Copy undecoded payload out of a reusable buffer."""
+        data = self._data
+        if isinstance(data, memoryview) and isinstance(data.obj, bytearray):
+            self._data = data.tobytes()
+
+
+def _registry(module):
+    types = {
+        State.HANDSHAKING: module.Handshaking,
+        State.STATUS: module.Status,
+        State.LOGIN: module.Login,
+        State.PLAY: module.Play,
+    }
+
+    registry = {}
+    for state, enum in types.items():
+        for message_type in enum:
+            struct = getattr(module, message_type.name)
+            registry[(state, message_type.value)] = Codec(message_type, struct)
+
+    return registry
+
+
+CLIENTBOUND = _registry(clientbound)
+SERVERBOUND = _registry(serverbound)
+
+
+def compile_all():
+    """Compile all codecs up front, return amount of compiled codecs."""
+    return sum(
+        codec.compiled for codec in (*CLIENTBOUND.values(), *SERVERBOUND.values())
+    )
@@ -1,43 +1,155 @@
 import logging
 import select
 import socket
+import sys
 import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from construct import StreamError
 
 from skeltal.protocol import clientbound, serverbound
-from skeltal.protocol.handlers import HANDLERS
-from skeltal.protocol.queue import SelectQueue
+from skeltal.protocol.capture import RX, TX, CaptureWriter
+from skeltal.protocol.codecs import CLIENTBOUND, SERVERBOUND, LazyMessage
+from skeltal.protocol.framing import DeferredFrame, FrameBuffer
+from skeltal.protocol.handlers import HANDLED, HANDLERS
+from skeltal.protocol.metrics import Histogram, PacketMetrics
+from skeltal.protocol.queue import WakeupQueue
+from skeltal.protocol.recorder import IGNORED, FlightRecorder
 from skeltal.protocol.state import State
+from skeltal.protocol.stats import ConnectionStats
 
 LOGGER = logging.getLogger(__name__)
 
-
-class ClientConnection:
-    SENTINEL = object()
-
-    def __init__(self, address, port, registry):
+_EXECUTOR = None
+
+
+def executor():
+    """Thread pool shared by all connections for large frames.
+
+    zlib releases the GIL, so large frames are inflated and deflated in
+    parallel with the connection threads and event loops.
+    """
+    global _EXECUTOR  # pylint: disable=global-statement
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(thread_name_prefix="skeltal-zlib")
+    return _EXECUTOR
+
+
+class BaseConnection:
+    """Protocol state shared by all connection engines.
+
+    Subclasses provide the transport by implementing `is_connected`,
+    `is_running`, `stop()`, `_schedule_flush()`, `_send_bytes()` and
+    `_call_soon_threadsafe()`.
+
+    Incoming packet types registered with :meth:`ignore` are dropped
+    without being decompressed or decoded. With
+    :meth:`ignore_unsubscribed`, so are PLAY packets without subscribers
+    in the registry.
+
+    Outgoing packets are coalesced and flushed with a single write. With
+    a non-zero `flush_window` (in milliseconds) the flush is delayed
+    for up to that long after the first pending packet, Nagle-style.
+
+    Compressed frames larger than `offload` bytes are inflated and
+    deflated on a shared thread pool instead of inline, so they don't
+    stall other connections on the same thread. Packets are still
+    handled and sent in order. Outgoing frames are compressed with zlib
+    `compression_level`.
+
+    Raw frames sent and received are appended to the file at `capture`,
+    if given, see :meth:`capture`. With `metrics`, received packets are
+    measured by type, see :meth:`enable_metrics`. With `recorder`, the
+    last `recorder` packets are kept to be dumped to `recorder_path`, see
+    :meth:`record`.
+    """
+
+    def __init__(
+        self,
+        address,
+        port,
+        registry,
+        username="testuser",
+        flush_window=0.0,
+        offload=-1,
+        compression_level=zlib.Z_DEFAULT_COMPRESSION,
+        capture=None,
+        metrics=False,
+        recorder=0,
+        recorder_path="skeltal-flight.log",
+    ):
         self.address = str(address)
         self.port = int(port)
         self.registry = registry
+        self.username = username
+        self.stats = ConnectionStats()
 
-        self._thread = threading.Thread(target=self._connection_loop)
         self._state = None
         self._handler = None
         self._compression = -1
-        self._stop = False
+        self._buffer = FrameBuffer()
+        self._ignored = {}
+        self._ignore = frozenset()
+        self._ignore_unsubscribed = False
 
-        self._queue = SelectQueue()
-        self._socket = None
-        self._stream = None
+        self._flush_window = flush_window / 1000.0
+        self._pending = []
+        self._pending_since = 0.0
+
+        self._offload = offload
+        self._compression_level = compression_level
+        self._inflating = None
+        self._deflating = deque()
+
+        self._capture = None
+        if capture is not None:
+            self.capture(capture)
+
+        self.metrics = None
+        self._frame_size = 0
+        self._timed = {}
+
+        #: Nanoseconds from receiving a keepalive to sending the response
+        self.keepalive_latency = Histogram()
+        self.last_keepalive = None
+        self._keepalive_at = 0
+
+        self.recorder = None
+        if recorder:
+            self.record(recorder, recorder_path)
+
+        if metrics:
+            self.enable_metrics()
 
     @property
     def is_connected(self):
-        return self._thread.is_alive()
+        raise NotImplementedError
+
+    @property
+    def is_running(self):
+        """True until the connection has been asked to stop."""
+        raise NotImplementedError
+
+    @property
+    def current_state(self):
+        return self._state
 
     @property
     def compression(self):
         return self._compression
 
+    @property
+    def compression_rx(self):
+        """Bytes of compressed frames received, and of them inflated."""
+        return self._buffer.compressed_bytes, self._buffer.inflated_bytes
+
+    @property
+    def outbound_depth(self):
+        """Packets waiting to be sent."""
+        return len(self._pending) + len(self._deflating)
+
     @compression.setter
     def compression(self, value):
         self._compression = value
@@ -55,21 +167,339 @@ class ClientConnection:
             LOGGER.debug("Client state '%s'", value)
 
         self._state = value
+        self._ignore = self._ignored_types(value)
+        self._timed = {}
         self._handler = HANDLERS[value](self)
         self._handler.send(None)  # Prime generator
 
+    def stop(self):
+        raise NotImplementedError
+
+    def ignore(self, state, *message_types):
+        """Drop incoming messages of given clientbound types in a state.
+
+        Handlers never see ignored messages, so don't ignore types the
+        protocol relies on, such as KeepAlive.
+        """
+        ignored = self._ignored.get(state, frozenset())
+        ignored |= {int(message_type) for message_type in message_types}
+        self._ignored[state] = ignored
+        if state is self._state:
+            self._ignore = self._ignored_types(state)
+
+    def ignore_unsubscribed(self):
+        """Drop incoming PLAY messages of types without subscribers.
+
+        Messages the protocol handlers rely on are still received. The
+        ignored types follow later changes to the subscriptions.
+        """
+        self._ignore_unsubscribed = True
+        self.registry.watch(self._subscriptions_changed)
+        self._subscriptions_changed()
+
+    def capture(self, path):
+        """Append frames sent and received from now on to a capture file.
+
+        Frames are captured as on the wire, with the connection state
+        and compression threshold, to be replayed with
+        :mod:`skeltal.protocol.replay`.
+        """
+        self.stop_capture()
+        self._capture = CaptureWriter(path)
+        self._buffer.capture = self._captured
+        LOGGER.info("Capturing frames to %s", path)
+
+    def stop_capture(self):
+        if self._capture is not None:
+            self._capture.close()
+            self._capture = None
+            if self.metrics is None:
+                self._buffer.capture = None
+
+    def enable_metrics(self):
+        """Measure received packets by type from now on.
+
+        Counts packets and their bytes, and times parsing and handling
+        them, in :attr:`metrics`. Packets are received the usual way
+        again once disabled. Returns the metrics.
+        """
+        if self.metrics is None:
+            self.metrics = PacketMetrics()
+            self._timed = {}
+            self._buffer.capture = self._captured
+            self._instrument()
+        return self.metrics
+
+    def disable_metrics(self):
+        if self.metrics is not None:
+            self.metrics = None
+            if self._capture is None:
+                self._buffer.capture = None
+            self._instrument()
+
+    def record(self, size=4096, path="skeltal-flight.log"):
+        """Keep the last `size` packets sent and received in a recorder.
+
+        The recorder is dumped to `path` when the connection fails to
+        parse a frame and when it's closed. Returns the recorder.
+        """
+        name = f"{self.username}@{self.address}:{self.port}"
+        self.recorder = FlightRecorder(size, path, name)
+        self._instrument()
+        return self.recorder
+
+    def dump_recorder(self, reason):
+        """Dump packets recorded since the last dump, if recording."""
+        if self.recorder is not None and self.recorder.undumped:
+            self.recorder.dump(reason)
+
+    def _instrument(self):
+        # Receive through the slower path only when something measures it
+        if self.metrics is not None or self.recorder is not None:
+            self.receive = self._receive_measured
+        else:
+            self.__dict__.pop("receive", None)
+
+    def _captured(self, frame):
+        # Called with every frame split, when capturing or measuring
+        self._frame_size = len(frame)
+        if self._capture is not None:
+            self._capture.write(RX, self._state, self._compression, frame)
+
+    def _ignored_types(self, state):
+        ignored = self._ignored.get(state, frozenset())
+        if (
+            state is State.PLAY
+            and self._ignore_unsubscribed
+            and not self.registry.has_wildcard
+        ):
+            wanted = self.registry.subscribed_types | HANDLED
+            ignored |= {
+                int(message_type)
+                for message_type in clientbound.Play
+                if message_type not in wanted
+            }
+        return ignored
+
+    def _subscriptions_changed(self):
+        # May be called from other threads, replacing the set is atomic
+        if self._state is not None:
+            self._ignore = self._ignored_types(self._state)
+
+    def keepalive_received(self):
+        """Time the response to a keepalive, sent before the next flush."""
+        self.last_keepalive = time.monotonic()
+        self._keepalive_at = time.perf_counter_ns()
+
+    def dispatch(self, message):
+        if not self.is_connected:
+            raise RuntimeError("Client not connected")
+
+        packet_id = message._type.value
+        data = SERVERBOUND[(self._state, packet_id)].build(message)
+        if self.recorder is not None:
+            self.recorder.record(TX, self._state, packet_id, len(data))
+
+        self._write(packet_id, data)
+
+    def receive(self, packet_id, data):
+        message = CLIENTBOUND[(self._state, packet_id)].message(data)
+        refs = sys.getrefcount(message)
+        self._handler.send(message)
+        # The handler holds on to the last message, anything else retaining
+        # it needs the payload out of the receive buffer
+        if sys.getrefcount(message) > refs + 1:
+            message.release()
+
+    def _receive_measured(self, packet_id, data):
+        metrics = self.metrics
+        if metrics is not None:
+            timed = self._timed.get(packet_id)
+            if timed is None:
+                codec = CLIENTBOUND[(self._state, packet_id)]
+                timed = self._timed[packet_id] = metrics.codec(codec)
+            metrics = timed.metrics
+            metrics.wire_bytes += self._frame_size
+            metrics.data_bytes += len(data)
+            message = LazyMessage(timed, data)
+        else:
+            message = CLIENTBOUND[(self._state, packet_id)].message(data)
+
+        recorder = self.recorder
+        if recorder is not None:
+            # Recorded before handling, to precede packets sent in response
+            event = recorder.record(RX, self._state, packet_id, len(data))
+        refs = sys.getrefcount(message)
+        start = time.perf_counter_ns()
+        self._handler.send(message)
+        elapsed = time.perf_counter_ns() - start
+        if metrics is not None:
+            # Histogram.record() inlined
+            histogram = metrics.handle
+            histogram.buckets[elapsed.bit_length()] += 1
+            histogram.total += elapsed
+        if recorder is not None:
+            recorder.finish(event, elapsed)
+        if sys.getrefcount(message) > refs + 1:
+            message.release()
+
+    def _receive_frames(self):
+        """Handle all complete frames in the receive buffer.
+
+        Stops at a frame being inflated on the thread pool until it's
+        done. Returns False if the connection should be closed.
+        """
+        try:
+            # Compression threshold may change between frames
+            while self.is_running:
+                if self._inflating is not None:
+                    if not self._inflating.done():
+                        break
+                    frame = self._inflating.result()
+                    self._inflating = None
+                else:
+                    frame = self._buffer.next_frame(
+                        self._compression, self._ignore, self._offload
+                    )
+                    if frame is None:
+                        break
+                    self.stats.packets_rx += 1
+                    if isinstance(frame, DeferredFrame):
+                        self._inflating = executor().submit(frame.inflate)
+                        self._inflating.add_done_callback(self._inflated)
+                        continue
+
+                if frame[1] is None:
+                    self.stats.packets_ignored += 1
+                    self.stats.inflate_avoided = self._buffer.inflate_avoided
+                    if self.recorder is not None:
+                        self.recorder.record(IGNORED, self._state, frame[0], 0)
+                    continue
+                self.receive(*frame)
+        except StreamError as err:
+            LOGGER.error("Failed to parse incoming message: %s", err)
+            self.dump_recorder(f"StreamError: {err}")
+            return False
+
+        return True
+
+    def _inflated(self, _future):
+        # Called on the thread pool
+        self._call_soon_threadsafe(self._resume)
+
+    def _resume(self):
+        if not self._receive_frames():
+            self.stop()
+
+    def _build(self, packet_id, data):
+        return serverbound.build(
+            self._compression, packet_id, data, self._compression_level
+        )
+
+    def _write(self, packet_id, data):
+        if self._compression >= 0 and 0 <= self._offload < len(data):
+            future = executor().submit(
+                serverbound.build,
+                self._compression,
+                packet_id,
+                data,
+                self._compression_level,
+            )
+            self._deflating.append(future)
+            future.add_done_callback(self._deflated)
+        elif self._deflating:
+            # Keep order behind packets still being compressed
+            self._deflating.append(self._build(packet_id, data))
+        else:
+            self._enqueue(self._build(packet_id, data))
+
+    def _deflated(self, _future):
+        # Called on the thread pool
+        self._call_soon_threadsafe(self._drain_deflated)
+
+    def _drain_deflated(self):
+        deflating = self._deflating
+        while deflating:
+            packet = deflating[0]
+            if not isinstance(packet, bytes):
+                if not packet.done():
+                    break
+                packet = packet.result()
+            deflating.popleft()
+            self._enqueue(packet)
+
+    def _enqueue(self, packet):
+        if self._capture is not None:
+            self._capture.write(TX, self._state, self._compression, packet)
+        self.stats.packets_tx += 1
+        self.stats.bytes_tx += len(packet)
+        self._pending.append(packet)
+        if len(self._pending) == 1:
+            self._pending_since = time.monotonic()
+            self._schedule_flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+
+        if len(self._pending) == 1:
+            data = self._pending[0]
+        else:
+            data = b"".join(self._pending)
+
+        self._pending.clear()
+        self.stats.send_calls += 1
+        self._send_bytes(data)
+
+        if self._keepalive_at:
+            self.keepalive_latency.record(time.perf_counter_ns() - self._keepalive_at)
+            self._keepalive_at = 0
+
+    def _schedule_flush(self):
+        raise NotImplementedError
+
+    def _send_bytes(self, data):
+        raise NotImplementedError
+
+    def _call_soon_threadsafe(self, callback):
+        """Run callback on the connection's thread or event loop."""
+        raise NotImplementedError
+
+
+class ClientConnection(BaseConnection):
+    """Connection engine running in a dedicated thread."""
+
+    SENTINEL = object()
+
+    def __init__(self, address, port, registry, **options):
+        super().__init__(address, port, registry, **options)
+
+        self._thread = threading.Thread(target=self._connection_loop)
+        self._stop = False
+
+        self._queue = WakeupQueue()
+        self._socket = None
+
+    @property
+    def is_connected(self):
+        return self._thread.is_alive()
+
+    @property
+    def is_running(self):
+        return not self._stop
+
+    @property
+    def outbound_depth(self):
+        return super().outbound_depth + len(self._queue)
+
     def start(self):
         assert not self.is_connected, "Client already connected"
 
         LOGGER.info("Connecting to %s:%d", self.address, self.port)
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.connect((self.address, self.port))
-
-        self._stream = self._socket.makefile(mode="b")
         self._thread.start()
 
-        self.state(State.HANDSHAKING)
-
     def stop(self):
         if not self._stop:
             self._stop = True
@@ -84,74 +514,81 @@ class ClientConnection:
                 self._thread.join(timeout=10)
 
         finally:
-            if self._stream:
-                self._stream.close()
             if self._socket:
                 self._socket.close()
             self._queue.close()
+            self.stop_capture()
 
-    def dispatch(self, message):
-        if not self.is_connected:
-            raise RuntimeError("Client not connected")
-
-        types = {
-            State.HANDSHAKING: serverbound.Handshaking,
-            State.STATUS: serverbound.Status,
-            State.LOGIN: serverbound.Login,
-            State.PLAY: serverbound.Play,
-        }[self._state]
-
-        LOGGER.trace("TX: %s", message._type)
-
-        packet_id = message._type.value
-        builder = getattr(serverbound, message._type.name)
-        data = builder.build(message)
+    def _write(self, packet_id, data):
+        if threading.current_thread() is self._thread:
+            super()._write(packet_id, data)
+        else:
+            self._queue.put((packet_id, data))
 
-        self._queue.put((packet_id, data))
+    def _schedule_flush(self):
+        # Pending packets are flushed by the connection loop
+        pass
 
-    def receive(self, packet_id, data):
-        types = {
-            State.HANDSHAKING: clientbound.Handshaking,
-            State.STATUS: clientbound.Status,
-            State.LOGIN: clientbound.Login,
-            State.PLAY: clientbound.Play,
-        }[self._state]
+    def _send_bytes(self, data):
+        self._socket.sendall(data)
 
-        message_type = types(packet_id)
-        LOGGER.trace("RX: %s", message_type)
+    def _call_soon_threadsafe(self, callback):
+        if not self._stop:
+            self._queue.put(callback)
 
-        parser = getattr(clientbound, message_type.name)
-        message = parser.parse(data)
-        message._type = message_type
+    def _flush_timeout(self):
+        """Time until pending packets should be flushed, None if nothing pending."""
+        if not self._pending:
+            return None
 
-        self._handler.send(message)
+        elapsed = time.monotonic() - self._pending_since
+        return max(0.0, self._flush_window - elapsed)
 
     def _connection_loop(self):
+        # Run protocol handlers only on the connection thread
+        self.state(State.HANDSHAKING)
+
         while True:
-            rlist, _, _ = select.select([self._socket, self._queue], [], [])
+            rlist, _, _ = select.select(
+                [self._socket, self._queue], [], [], self._flush_timeout()
+            )
             if self._stop:
+                self._flush_quietly()
+                self.dump_recorder("disconnected")
+                self.stop_capture()
                 break
 
             for sock in rlist:
                 if sock is self._socket:
                     self._recv()
                 elif sock is self._queue:
-                    self._send()
+                    self._drain()
                 else:
                     raise RuntimeError(f"Unexpected readable socket: {sock}")
 
+            if self._flush_timeout() == 0.0:
+                self._flush()
+
     def _recv(self):
-        try:
-            packet_id, data = clientbound.parse_stream(self._compression, self._stream)
-            self.receive(packet_id, data)
-        except StreamError as err:
-            LOGGER.error("Failed to parse incoming message: %s", err)
+        nbytes = self._buffer.recv_into(self._socket)
+        self.stats.bytes_rx += nbytes
+        if not nbytes:
+            LOGGER.info("Connection closed by server")
+            self._stop = True
+        elif not self._receive_frames():
             self._stop = True
 
-    def _send(self):
-        packet_id, data = self._queue.get()
+    def _flush_quietly(self):
         try:
-            packet = serverbound.build(self._compression, packet_id, data)
-            self._socket.sendall(packet)
-        finally:
-            self._queue.task_done()
+            self._flush()
+        except OSError as err:
+            LOGGER.debug("Failed to flush pending packets: %s", err)
+
+    def _drain(self):
+        for item in self._queue.drain():
+            if item is self.SENTINEL:
+                continue
+            if callable(item):
+                item()
+            else:
+                super()._write(*item)
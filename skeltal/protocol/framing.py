@@ -0,0 +1,230 @@
+import zlib
+from construct import StreamError
+from skeltal.protocol import varint
+
+
+# Smaller compressed frames are cheaper to inflate whole than to peek at
+PEEK_SIZE = 1024
+
+# Largest frame the protocol allows, as the length prefix is at most 3 bytes
+MAX_FRAME_LENGTH = 2**21 - 1
+# Largest packet a compressed frame may inflate to, as vanilla servers check
+MAX_DATA_LENGTH = 2**23
+
+
+def inflate(data, data_length):
+    """Decompress frame data and check it has the announced length.
+
+    Inflates at most one byte more than announced, so that a small frame
+    can't inflate to a huge one.
+    """
+    if data_length > MAX_DATA_LENGTH:
+        raise StreamError(f"Data length {data_length} exceeds {MAX_DATA_LENGTH}")
+    inflater = zlib.decompressobj()
+    frame = inflater.decompress(data, data_length + 1)
+    if len(frame) != data_length or not inflater.eof:
+        raise StreamError(f"Frame doesn't decompress to {data_length} bytes")
+    return frame
+
+
+def _peek(data):
+    """Inflate only the packet ID of compressed frame data.
+
+    Returns the packet ID and the amount of bytes inflated for it.
+    """
+    head = zlib.decompressobj().decompress(data, varint.MAX_SIZE)
+    packet_id, _ = varint.decode(head)
+    return packet_id, len(head)
+
+
+class DeferredFrame:
+    """Compressed frame split from a buffer but not inflated yet.
+
+    Holds a copy of the compressed data, so it stays valid after the
+    buffer is reused and can be inflated on another thread.
+    """
+
+    __slots__ = ("data", "data_length", "ignore")
+
+    def __init__(self, data, data_length, ignore=()):
+        self.data = data
+        self.data_length = data_length
+        self.ignore = ignore
+
+    def __len__(self):
+        return self.data_length
+
+    def inflate(self):
+        """Return tuple of packet ID and payload, as from next_frame()."""
+        try:
+            frame = memoryview(inflate(self.data, self.data_length))
+            packet_id, offset = varint.decode(frame)
+        except (IndexError, ValueError, zlib.error) as exc:
+            raise StreamError(f"Malformed frame: {exc}") from exc
+
+        if packet_id in self.ignore:
+            return packet_id, None
+
+        return packet_id, frame[offset:]
+
+
+class FrameBuffer:
+    """Receive buffer which splits incoming bytes into protocol frames.
+
+    Data is received straight into a preallocated bytearray and every
+    complete frame is sliced out of it as a memoryview, so a burst of
+    packets is split without copying. Only trailing partial frames are
+    kept buffered between receives.
+
+    Frames returned by :meth:`next_frame` reference the internal buffer
+    and are only valid until more data is written into it.
+    """
+
+    def __init__(self, size=8192):
+        self._size = size
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._wanted = 0
+
+        #: Bytes of ignored frames which were not decompressed
+        self.inflate_avoided = 0
+        #: Bytes of compressed frames split, and their size inflated
+        self.compressed_bytes = 0
+        self.inflated_bytes = 0
+        #: Called with every frame split, including its length prefix
+        self.capture = None
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        return len(self._buffer)
+
+    def recv_into(self, sock):
+        """Receive available data from socket, return amount of bytes read."""
+        nbytes = sock.recv_into(self.get_buffer())
+        self.commit(nbytes)
+        return nbytes
+
+    def get_buffer(self, size=2048):
+        """Return writable view of free space for at least `size` bytes."""
+        self._reserve(max(self._wanted, size))
+        return self._view[self._end :]
+
+    def commit(self, nbytes):
+        """Mark `nbytes` written into the view from get_buffer() as received."""
+        self._end += nbytes
+
+    def feed(self, data):
+        """Append data to buffer, e.g. when not reading from a socket."""
+        size = len(data)
+        self._reserve(max(self._wanted, size))
+        self._view[self._end : self._end + size] = data
+        self._end += size
+
+    def next_frame(self, threshold, ignore=(), defer=-1):
+        """Split next complete frame from buffer.
+
+        Returns tuple of packet ID and payload, or None if the buffer
+        does not contain a complete frame. The frame layout depends on
+        the current compression threshold, as in
+        :data:`clientbound.UncompressedMessage` and
+        :data:`clientbound.CompressedMessage`.
+
+        Frames with a packet ID in `ignore` are returned with None as
+        payload. Large compressed frames are inflated only as far as the
+        packet ID when ignored, and the skipped bytes are added to
+        :attr:`inflate_avoided`.
+
+        Compressed frames which inflate to more than `defer` bytes are
+        returned as a :class:`DeferredFrame` instead, to be inflated by
+        the caller, e.g. on another thread. Negative `defer` disables it.
+        """
+        frame = self._split()
+        if frame is None:
+            return None
+
+        try:
+            offset = 0
+            if threshold >= 0:
+                data_length, offset = varint.decode(frame)
+                if data_length > 0:
+                    data = frame[offset:]
+                    if ignore and data_length > PEEK_SIZE:
+                        packet_id, inflated = _peek(data)
+                        if packet_id in ignore:
+                            self.inflate_avoided += data_length - inflated
+                            return packet_id, None
+
+                    self.compressed_bytes += len(data)
+                    self.inflated_bytes += data_length
+                    if 0 <= defer < data_length:
+                        return DeferredFrame(bytes(data), data_length, ignore)
+
+                    frame = memoryview(inflate(data, data_length))
+                    offset = 0
+
+            packet_id, offset = varint.decode(frame, offset)
+        except (IndexError, ValueError, zlib.error) as exc:
+            raise StreamError(f"Malformed frame: {exc}") from exc
+
+        if packet_id in ignore:
+            return packet_id, None
+
+        return packet_id, frame[offset:]
+
+    def _split(self):
+        start = self._start
+        try:
+            # Bounded to received bytes, past them are stale ones
+            length, offset = varint.decode(self._view[: self._end], start)
+        except IndexError:
+            return None
+        except ValueError as exc:
+            raise StreamError(f"Malformed frame length: {exc}") from exc
+
+        if length < 0 or length > MAX_FRAME_LENGTH:
+            raise StreamError(f"Frame length {length} out of range")
+        if length > self._end - offset:
+            self._wanted = offset - start + length
+            return None
+
+        self._start = end = offset + length
+        self._wanted = 0
+        if end == self._end:
+            self._start = self._end = 0
+
+        if self.capture is not None:
+            self.capture(self._view[start:end])
+        return self._view[offset:end]
+
+    def _reserve(self, size):
+        """Ensure at least `size` bytes are free after buffered data."""
+        if len(self._buffer) - self._end >= size:
+            return
+
+        if self._start == self._end and len(self._buffer) >= 8 * self._size >= size:
+            # Release memory grown for a past large frame
+            self._buffer = bytearray(self._size)
+            self._view = memoryview(self._buffer)
+            self._start = self._end = 0
+            return
+
+        pending = self._end - self._start
+        capacity = len(self._buffer)
+        if capacity - pending >= size:
+            # Move partial frame to the front of the buffer
+            self._view[:pending] = bytes(self._view[self._start : self._end])
+        else:
+            while capacity - pending < size:
+                capacity *= 2
+
+            buffer = bytearray(capacity)
+            buffer[:pending] = self._view[self._start : self._end]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+
+        self._start, self._end = 0, pending
@@ -5,6 +5,11 @@ from skeltal.protocol.state import State
 
 LOGGER = logging.getLogger(__name__)
 
+# Messages the protocol handles itself, received even if not subscribed to
+HANDLED = frozenset(
+    (clientbound.Play.Disconnect, clientbound.Play.KeepAlive, clientbound.Play.JoinGame)
+)
+
 
 def handshaking(connection):
     handshake = Container(
@@ -24,7 +29,7 @@ def status(connection):
 
 
 def login(connection):
-    login = Container(_type=serverbound.Login.LoginStart, name="testuser")
+    login = Container(_type=serverbound.Login.LoginStart, name=connection.username)
     connection.dispatch(login)
 
     while True:
@@ -47,9 +52,19 @@ def play(connection):
 
         if message._type == clientbound.Play.KeepAlive:
             LOGGER.debug("Heartbeat (id: %s)", message.id)
+            connection.stats.keepalives += 1
+            connection.keepalive_received()
             response = Container(_type=serverbound.Play.KeepAlive, id=message.id)
             connection.dispatch(response)
 
+        if message._type == clientbound.Play.JoinGame:
+            LOGGER.info(
+                "Joined game:\n%s",
+                "\n".join(
+                    f"{k}: {v}" for k, v in message.items() if not k.startswith("_")
+                ),
+            )
+
         connection.registry.publish(message)
 
 
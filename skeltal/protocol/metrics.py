@@ -0,0 +1,209 @@
+"""Per packet type metrics of received packets.
+
+For each clientbound packet type, counts packets, their bytes on the
+wire and decompressed, and keeps histograms of the time spent parsing
+them and handling them. Handling includes the subscribers and parsing,
+if the fields were accessed while handling.
+
+Histograms have power of two buckets of nanoseconds, so recording a
+value is an increment of a list item.
+"""
+import time
+
+BUCKETS = 64
+
+
+class Histogram:
+    """Counts of values in power of two buckets.
+
+    Bucket ``i`` counts values below ``2 ** i`` and at least
+    ``2 ** (i - 1)``, bucket 0 counts zeros. Values are only known to
+    within their bucket, except for their total.
+    """
+
+    __slots__ = ("buckets", "total")
+
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.total = 0
+
+    def __repr__(self):
+        return (
+            f"Histogram(count={self.count}, mean={self.mean:.0f}, "
+            f"p50={self.percentile(50)}, p99={self.percentile(99)})"
+        )
+
+    def __iadd__(self, other):
+        for idx, count in enumerate(other.buckets):
+            self.buckets[idx] += count
+        self.total += other.total
+        return self
+
+    @property
+    def count(self):
+        return sum(self.buckets)
+
+    @property
+    def mean(self):
+        count = self.count
+        return self.total / count if count else 0.0
+
+    @property
+    def max(self):
+        """Upper bound of the largest value."""
+        for idx in range(BUCKETS - 1, -1, -1):
+            if self.buckets[idx]:
+                return (1 << idx) - 1
+        return 0
+
+    def record(self, value):
+        # Inlined where it's hot, keep in sync
+        self.buckets[value.bit_length()] += 1
+        self.total += value
+
+    def percentile(self, percent):
+        """Upper bound of the bucket the percentile falls in."""
+        count = self.count
+        if not count:
+            return 0
+        rank = count * percent / 100
+        seen = 0
+        for idx, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return (1 << idx) - 1
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class TypeMetrics:
+    """Metrics of received packets of a single type."""
+
+    __slots__ = ("type", "wire_bytes", "data_bytes", "parse", "handle")
+
+    def __init__(self, message_type):
+        self.type = message_type
+        self.wire_bytes = 0
+        self.data_bytes = 0
+        self.parse = Histogram()
+        self.handle = Histogram()
+
+    def __repr__(self):
+        return f"TypeMetrics({self.type!r}, count={self.count})"
+
+    @property
+    def count(self):
+        return self.handle.count
+
+    def __iadd__(self, other):
+        self.wire_bytes += other.wire_bytes
+        self.data_bytes += other.data_bytes
+        self.parse += other.parse
+        self.handle += other.handle
+        return self
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "wire_bytes": self.wire_bytes,
+            "data_bytes": self.data_bytes,
+            "parse_ns": self.parse.as_dict(),
+            "handle_ns": self.handle.as_dict(),
+        }
+
+
+class TimedCodec:
+    """Codec recording the time its messages take to parse."""
+
+    __slots__ = ("type", "codec", "metrics", "_parse")
+
+    def __init__(self, codec, metrics):
+        self.type = codec.type
+        self.codec = codec
+        self.metrics = metrics
+        self._parse = metrics.parse
+
+    def parse(self, data):
+        start = time.perf_counter_ns()
+        fields = self.codec.parse(data)
+        elapsed = time.perf_counter_ns() - start
+        histogram = self._parse
+        histogram.buckets[elapsed.bit_length()] += 1
+        histogram.total += elapsed
+        return fields
+
+
+class PacketMetrics:
+    """Metrics of received packets by type, see
+    :meth:`skeltal.protocol.connection.BaseConnection.enable_metrics`.
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.since = time.monotonic()
+        self._codecs = {}
+
+    def __repr__(self):
+        return f"PacketMetrics({len(self.types)} types)"
+
+    def __iadd__(self, other):
+        # Copied, as the other metrics may be updated on another thread
+        for message_type, metrics in list(other.types.items()):
+            merged = self.get(message_type)
+            merged += metrics
+        self.since = min(self.since, other.since)
+        return self
+
+    def get(self, message_type):
+        """Metrics of a packet type, created if it wasn't received yet."""
+        metrics = self.types.get(message_type)
+        if metrics is None:
+            metrics = self.types[message_type] = TypeMetrics(message_type)
+        return metrics
+
+    def codec(self, codec):
+        """Timed wrapper of a codec, and metrics of its type."""
+        timed = self._codecs.get(codec)
+        if timed is None:
+            timed = self._codecs[codec] = TimedCodec(codec, self.get(codec.type))
+        return timed
+
+    def reset(self):
+        self.types.clear()
+        self._codecs.clear()
+        self.since = time.monotonic()
+
+    def as_dict(self):
+        return {
+            getattr(message_type, "name", str(message_type)): metrics.as_dict()
+            for message_type, metrics in self.types.items()
+        }
+
+    def summary(self, top=5):
+        """One line of the packet types which took the most time."""
+        elapsed = time.monotonic() - self.since
+        count = sum(metrics.handle.count for metrics in self.types.values())
+        size = sum(metrics.wire_bytes for metrics in self.types.values())
+        heaviest = sorted(
+            self.types.values(), key=lambda metrics: metrics.handle.total, reverse=True
+        )
+        parts = [
+            f"{count} packets, {size / 1024:.1f} KiB in {elapsed:.1f}s",
+            *(
+                f"{getattr(m.type, 'name', m.type)} {m.count}x "
+                f"{m.wire_bytes / 1024:.1f}/{m.data_bytes / 1024:.1f} KiB "
+                f"parse {m.parse.total / 1e6:.1f} ms "
+                f"handle {m.handle.total / 1e6:.1f} ms "
+                f"p99 {m.handle.percentile(99) / 1e3:.0f} us"
+                for m in heaviest[:top]
+            ),
+        ]
+        return " | ".join(parts)
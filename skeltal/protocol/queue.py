@@ -1,22 +1,29 @@
 import os
 import queue
 import socket
+import threading
+from collections import deque
+
+
+def socketpair():
+    if os.name == "posix":
+        return socket.socketpair()
+
+    # Emulate socketpair() syscall on Windows
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    put_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    put_socket.connect(server.getsockname())
+    get_socket, _ = server.accept()
+    server.close()
+    return put_socket, get_socket
 
 
 class SelectQueue(queue.Queue):
     def __init__(self):
         super().__init__()
-        if os.name == "posix":
-            self._put_socket, self._get_socket = socket.socketpair()
-        else:
-            # Emulate socketpair() syscall on Windows
-            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server.bind(("127.0.0.1", 0))
-            server.listen(1)
-            self._put_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._put_socket.connect(server.getsockname())
-            self._get_socket, _ = server.accept()
-            server.close()
+        self._put_socket, self._get_socket = socketpair()
 
     def fileno(self):
         return self._get_socket.fileno()
@@ -32,3 +39,69 @@ class SelectQueue(queue.Queue):
     def get(self):
         self._get_socket.recv(1)
         return super().get()
+
+
+class WakeupQueue:
+    """Selectable queue which is drained in batches.
+
+    The file descriptor becomes readable only when the queue goes from
+    empty to non-empty, and :meth:`drain` returns all queued items at
+    once. Uses an eventfd where available, and a socketpair otherwise.
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._lock = threading.Lock()
+
+        if hasattr(os, "eventfd"):
+            self._eventfd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._put_socket = self._get_socket = None
+        else:
+            self._eventfd = None
+            self._put_socket, self._get_socket = socketpair()
+            self._get_socket.setblocking(False)
+
+    def __len__(self):
+        return len(self._items)
+
+    def fileno(self):
+        if self._eventfd is not None:
+            return self._eventfd
+        return self._get_socket.fileno()
+
+    def close(self):
+        if self._eventfd is not None:
+            os.close(self._eventfd)
+            self._eventfd = None
+        else:
+            self._put_socket.close()
+            self._get_socket.close()
+
+    def put(self, item):
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) == 1:
+                self._signal()
+
+    def drain(self):
+        """Remove and return all queued items."""
+        with self._lock:
+            self._clear()
+            items = list(self._items)
+            self._items.clear()
+        return items
+
+    def _signal(self):
+        if self._eventfd is not None:
+            os.eventfd_write(self._eventfd, 1)
+        else:
+            self._put_socket.send(b"\x00")
+
+    def _clear(self):
+        try:
+            if self._eventfd is not None:
+                os.eventfd_read(self._eventfd)
+            else:
+                self._get_socket.recv(4096)
+        except BlockingIOError:
+            pass
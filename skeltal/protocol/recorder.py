@@ -0,0 +1,150 @@
+"""Flight recorder of the recent packets of a connection.
+
+Keeps the last events of packets sent and received in a ring of arrays:
+when, which direction, the connection state, the packet ID, payload size
+and how long handling it took. Recording an event is a few array writes,
+cheap enough to leave on, and names are only looked up when the events
+are dumped to a file, e.g. after the connection failed.
+
+Recorders of all connections are dumped on ``SIGUSR1`` once
+:func:`dump_on_signal` was called.
+"""
+import logging
+import signal
+import time
+import weakref
+from array import array
+from skeltal.protocol.capture import TX
+from skeltal.protocol.codecs import CLIENTBOUND, SERVERBOUND
+from skeltal.protocol.state import State
+
+LOGGER = logging.getLogger(__name__)
+
+# Received but dropped undecoded, next to RX and TX
+IGNORED = 2
+
+DIRECTIONS = ("RX", "TX", "RX-")
+NO_STATE = 255
+
+RECORDERS = weakref.WeakSet()
+
+
+def dump_on_signal(signum=getattr(signal, "SIGUSR1", None)):
+    """Dump all recorders to their files when the process gets `signum`.
+
+    Returns False if the platform has no such signal.
+    """
+    if signum is None:
+        return False
+
+    def dump(_signum, _frame):
+        for recorder in list(RECORDERS):
+            recorder.dump(f"signal {signal.Signals(_signum).name}")
+
+    signal.signal(signum, dump)
+    return True
+
+
+class FlightRecorder:
+    """Ring buffer of the last `size` packet events of a connection.
+
+    Dumps are appended to the file at `path`, headed by the connection's
+    `name` and the reason for the dump.
+    """
+
+    def __init__(self, size=4096, path="skeltal-flight.log", name="connection"):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.path = path
+        self.name = name
+        #: Events recorded so far, including those overwritten
+        self.count = 0
+        self._dumped = 0
+        self._index = 0
+
+        self._times = array("d", bytes(8 * size))
+        self._directions = array("B", bytes(size))
+        self._states = array("B", bytes(size))
+        self._ids = array("H", bytes(2 * size))
+        self._sizes = array("L", bytes(array("L").itemsize * size))
+        self._durations = array("Q", bytes(8 * size))
+        RECORDERS.add(self)
+
+    def __repr__(self):
+        return f"FlightRecorder({self.name}, {len(self)}/{self.size} events)"
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    @property
+    def undumped(self):
+        """Whether events were recorded since the last dump."""
+        return self.count > self._dumped
+
+    def record(self, direction, state, packet_id, size, duration=0):
+        """Record an event, `duration` in nanoseconds. Returns its index, to
+        set the duration once known with :meth:`finish`.
+        """
+        idx = self._index
+        self._times[idx] = time.time()
+        self._directions[idx] = direction
+        self._states[idx] = NO_STATE if state is None else state
+        self._ids[idx] = packet_id
+        self._sizes[idx] = size
+        self._durations[idx] = duration
+        self._index = 0 if idx + 1 == self.size else idx + 1
+        self.count += 1
+        return idx
+
+    def finish(self, index, duration):
+        """Set the duration of the event recorded at `index`."""
+        self._durations[index] = duration
+
+    def events(self):
+        """Yield recorded events, oldest first, as tuples of
+        ``(time, direction, state, packet type, size, duration)``.
+        """
+        start = self._index if self.count > self.size else 0
+        for offset in range(len(self)):
+            idx = (start + offset) % self.size
+            direction, state = self._directions[idx], self._states[idx]
+            state = None if state == NO_STATE else State(state)
+            yield (
+                self._times[idx],
+                direction,
+                state,
+                _packet_type(direction, state, self._ids[idx]),
+                self._sizes[idx],
+                self._durations[idx],
+            )
+
+    def dump(self, reason=""):
+        """Append recorded events to the file, return its path."""
+        lines = [
+            f"# {self.name}: {reason or 'dump'} at {_timestamp(time.time())}, "
+            f"last {len(self)} of {self.count} events"
+        ]
+        for when, direction, state, packet_type, size, duration in self.events():
+            lines.append(
+                f"{_timestamp(when)} {DIRECTIONS[direction]:<3} "
+                f"{state.name if state is not None else '-':<11} {packet_type:<28} "
+                f"{size:>8} B {duration / 1e3:>10.1f} us"
+            )
+        with open(self.path, "a", encoding="utf-8") as fd:
+            fd.write("\n".join(lines) + "\n\n")
+        self._dumped = self.count
+        LOGGER.info("Dumped %d packet events to %s", len(self), self.path)
+        return self.path
+
+
+def _packet_type(direction, state, packet_id):
+    codecs = SERVERBOUND if direction == TX else CLIENTBOUND
+    codec = codecs.get((state, packet_id))
+    if codec is None:
+        return f"0x{packet_id:02X}"
+    return codec.type.name
+
+
+def _timestamp(when):
+    return time.strftime("%H:%M:%S", time.localtime(when)) + f"{when % 1:.6f}"[1:]
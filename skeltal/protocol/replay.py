@@ -0,0 +1,66 @@
+"""Replay of captured frames through a connection without a server.
+
+Received frames of a capture are fed through the same frame splitting,
+inflating and handling as on a live connection, so captured traffic can
+be reproduced offline, e.g. for deterministic benchmarks of parsing and
+of tracking the world.
+"""
+import time
+from skeltal.protocol.capture import RX
+from skeltal.protocol.connection import BaseConnection
+
+
+class ReplayConnection(BaseConnection):
+    """Connection without a transport, fed with captured frames.
+
+    Packets the handlers send in response are built and counted, then
+    discarded.
+    """
+
+    is_connected = True
+    is_running = True
+
+    def __init__(self, registry, **options):
+        super().__init__("replay", 0, registry, **options)
+
+    def stop(self):
+        pass
+
+    def feed(self, frame):
+        """Receive a whole frame, return False if it failed to parse."""
+        self._buffer.feed(frame)
+        return self._receive_frames()
+
+    def _schedule_flush(self):
+        self._pending.clear()
+
+
+def replay(records, connection, realtime=False, speed=1.0):
+    """Feed received frames of a capture to a :class:`ReplayConnection`.
+
+    Frames are fed as fast as possible, or with their captured timing
+    scaled by `speed` if `realtime`. The connection follows the state
+    and compression threshold of the capture. Returns the amount of
+    frames fed.
+    """
+    fed = 0
+    started = first = None
+    for record in records:
+        if record.direction != RX:
+            continue
+
+        if realtime:
+            if first is None:
+                started, first = time.monotonic(), record.timestamp
+            delay = (record.timestamp - first) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        if record.state not in (None, connection.current_state):
+            connection.state(record.state)
+        if record.threshold != connection.compression:
+            connection.compression = record.threshold
+        if not connection.feed(record.frame):
+            break
+        fed += 1
+    return fed
@@ -1,33 +1,38 @@
+import zlib
 from enum import IntEnum
 from construct import (
     Bytes,
     Const,
-    Container,
     FixedSized,
     GreedyBytes,
     IfThenElse,
-    Long,
+    Int64sb,
     Rebuild,
     Short,
     Struct,
     this,
     len_,
 )
+from skeltal.protocol import varint
 from skeltal.protocol.types import VarInt, VarString, Compressed
 
 
-def build(threshold, packet_id, data):
-    fields = Container(packet_id=packet_id, data=data)
+def build(threshold, packet_id, data, level=zlib.Z_DEFAULT_COMPRESSION):
+    """Build frame for packet, same as the message containers below.
+
+    Compressed frames are deflated with zlib compression `level`.
+    """
+    packet_id = varint.encode(packet_id)
     if threshold >= 0:
-        size = VarInt.size(packet_id) + len(data)
+        size = len(packet_id) + len(data)
         if size >= threshold:
-            data = CompressedData.build(fields)
-            fields = Container(data_length=size, data=data)
-            return AboveThresholdMessage.build(fields)
+            payload = varint.encode(size) + zlib.compress(packet_id + data, level)
         else:
-            return BelowThresholdMessage.build(fields)
+            payload = b"\x00" + packet_id + data
     else:
-        return UncompressedMessage.build(fields)
+        payload = packet_id + data
+
+    return varint.encode(len(payload)) + payload
 
 
 class Handshaking(IntEnum):
@@ -112,7 +117,7 @@ BelowThresholdMessage = Struct(
     "packet_length"
     / Rebuild(
         VarInt,
-        VarInt.size(this.data_length) + VarInt.size(this.packet_id) + len_(this.data),
+        VarInt.size(0) + VarInt.size(this.packet_id) + len_(this.data),
     ),
     "data_length" / Const(0, VarInt),
     "packet_id" / VarInt,
@@ -184,7 +189,7 @@ QueryEntityNBT = Struct()
 
 UseEntity = Struct()
 
-KeepAlive = Struct("id" / Long)
+KeepAlive = Struct("id" / Int64sb)
 
 Player = Struct()
 
@@ -0,0 +1,33 @@
+class ConnectionStats:
+    """Counters of traffic over a single connection."""
+
+    __slots__ = (
+        "packets_rx",
+        "packets_tx",
+        "bytes_rx",
+        "bytes_tx",
+        "send_calls",
+        "keepalives",
+        "packets_ignored",
+        "inflate_avoided",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def __iadd__(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v}" for k, v in self.as_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+    @property
+    def packets_per_send(self):
+        return self.packets_tx / self.send_calls if self.send_calls else 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
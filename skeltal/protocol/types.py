@@ -1,81 +1,106 @@
-from itertools import count
-from construct.core import stream_read, stream_write, singleton
+from construct.core import stream_write, singleton
 from construct.core import Compressed as _Compressed
-from construct import Construct, PascalString, int2byte, byte2int
+from construct import (
+    Adapter,
+    Construct,
+    Container,
+    Int8ub,
+    Int64ub,
+    PascalString,
+    StreamError,
+)
+from construct.expr import FuncPath
+from skeltal.protocol import varint
 
 
 class Compressed(_Compressed):
     def _sizeof(self, context, path):
-        print(list(context.items()))
         return 1
 
 
 @singleton
 class VarInt(Construct):
-    """Minecraft-specific 32bit signed VarInt type."""
+    """Minecraft-specific 32bit signed VarInt type.
 
-    BITS = 32
-    MAX_SIZE = 5
+    Thin construct wrapper around the fast-path codec in
+    :mod:`skeltal.protocol.varint`.
+    """
+
+    BITS = varint.BITS
+    MAX_SIZE = varint.MAX_SIZE
 
     @classmethod
     def size(cls, value):
         """Calculate bytesize of integer as VarInt."""
-        if value == 0:
-            return 1
-
-        if value < 0:
-            value += 2 ** cls.BITS
-
-        idx = 0
-        while value:
-            value >>= 7
-            idx += 1
+        if callable(value):
+            return FuncPath(varint.size, value)
 
-        return idx
+        return varint.size(value)
 
     def _parse(self, stream, context, path):
-        result = 0
-
-        for idx in count():
-            read = byte2int(stream_read(stream, 1, path))
-            value = read & 0b01111111
-            result |= value << (7 * idx)
-
-            if not read & 0b10000000:
+        read = stream.read(1)
+        if not read:
+            raise StreamError("stream read less than expected", path)
+        if read[0] < 0x80:
+            return read[0]
+
+        result = read[0] & 0x7F
+        shift = 7
+        while True:
+            read = stream.read(1)
+            if not read:
+                raise StreamError("stream read less than expected", path)
+            result |= (read[0] & 0x7F) << shift
+            if read[0] < 0x80:
                 break
-            if idx >= self.MAX_SIZE:
+            shift += 7
+            if shift >= 7 * self.MAX_SIZE:
                 raise ValueError("VarInt larger than expected")
 
         # Convert from unsigned to signed
         if result & (1 << (self.BITS - 1)):
-            result -= 2 ** self.BITS
+            result -= 1 << self.BITS
 
         return result
 
     def _build(self, obj, stream, context, path):
-        value = obj
-
-        # Convert from signed to unsigned
-        if value < 0:
-            value += 2 ** self.BITS
-
-        for idx in count():
-            temp = value & 0b01111111
-            value >>= 7
-            if value:
-                temp |= 0b10000000
-            stream_write(stream, int2byte(temp), 1, path)
-
-            if not value:
-                break
-            if idx >= self.MAX_SIZE:
-                raise ValueError("VarInt larger than expected")
-
+        data = varint.encode(obj)
+        stream_write(stream, data, len(data), path)
         return obj
 
     def _sizeof(self, context, path):
-        print(context, path)
         return 20
 
 
 VarString = PascalString(VarInt, "utf8")
+
+
+def _signed(value, bits):
+    if value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
+
+
+# Rotation in steps of 1/256 of a full turn
+Angle = Int8ub
+
+
+class PositionAdapter(Adapter):
+    """Block position packed into a long, as 26 bits of x, 12 of y, 26 of z."""
+
+    def _decode(self, obj, context, path):
+        return Container(
+            x=_signed(obj >> 38, 26),
+            y=_signed((obj >> 26) & 0xFFF, 12),
+            z=_signed(obj & 0x3FFFFFF, 26),
+        )
+
+    def _encode(self, obj, context, path):
+        return (
+            ((obj["x"] & 0x3FFFFFF) << 38)
+            | ((obj["y"] & 0xFFF) << 26)
+            | (obj["z"] & 0x3FFFFFF)
+        )
+
+
+Position = PositionAdapter(Int64ub)
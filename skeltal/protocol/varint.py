@@ -0,0 +1,112 @@
+"""Fast-path codec for Minecraft 32bit signed VarInts.
+
+Operates directly on bytes-like objects (bytes, bytearray, memoryview)
+at a given offset, without going through construct's stream machinery.
+"""
+
+BITS = 32
+MAX_SIZE = 5
+
+_SIGN = 1 << (BITS - 1)
+_RANGE = 1 << BITS
+
+
+def size(value):
+    """Calculate bytesize of integer as VarInt."""
+    if value < 0:
+        return MAX_SIZE
+
+    idx = 1
+    while value > 0x7F:
+        value >>= 7
+        idx += 1
+
+    return idx
+
+
+def encode(value):
+    """Encode integer as VarInt bytes."""
+    if 0 <= value < 0x80:
+        return bytes((value,))
+
+    # Convert from signed to unsigned
+    if value < 0:
+        value += _RANGE
+
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+    if len(out) > MAX_SIZE:
+        raise ValueError("VarInt larger than expected")
+
+    return bytes(out)
+
+
+def decode(buffer, offset=0):
+    """Decode VarInt from buffer at offset.
+
+    Returns tuple of decoded value and offset after the VarInt.
+    Raises IndexError if the buffer ends before the VarInt does.
+    """
+    read = buffer[offset]
+    if read < 0x80:
+        return read, offset + 1
+
+    result = read & 0x7F
+    shift = 7
+    while True:
+        offset += 1
+        read = buffer[offset]
+        result |= (read & 0x7F) << shift
+        if read < 0x80:
+            break
+        shift += 7
+        if shift >= 7 * MAX_SIZE:
+            raise ValueError("VarInt larger than expected")
+
+    # Convert from unsigned to signed
+    if result & _SIGN:
+        result -= _RANGE
+
+    return result, offset + 1
+
+
+def decode_many(buffer, count, offset=0):
+    """Decode consecutive array of VarInts from buffer at offset.
+
+    Returns tuple of decoded values and offset after the last VarInt.
+    """
+    values = [0] * count
+    for idx in range(count):
+        read = buffer[offset]
+        offset += 1
+        if read < 0x80:
+            values[idx] = read
+            continue
+
+        result = read & 0x7F
+        shift = 7
+        while True:
+            read = buffer[offset]
+            offset += 1
+            result |= (read & 0x7F) << shift
+            if read < 0x80:
+                break
+            shift += 7
+            if shift >= 7 * MAX_SIZE:
+                raise ValueError("VarInt larger than expected")
+
+        if result & _SIGN:
+            result -= _RANGE
+
+        values[idx] = result
+
+    return values, offset
+
+
+def encode_many(values):
+    """Encode iterable of integers as consecutive VarInts."""
+    return b"".join(encode(value) for value in values)
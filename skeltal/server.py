@@ -0,0 +1,467 @@
+"""Stand-in server for load testing bots on a single machine.
+
+Speaks just enough of protocol 404 for clients to play: the handshake,
+login with SetCompression and LoginSuccess, JoinGame, and keepalives.
+Playing clients are sent a stream of synthetic traffic, a mix of entity
+moves, chunk data and chat messages at a fixed packet rate.
+
+The traffic is built once, as a long run of frames, and each client is
+sent consecutive slices of it from a cursor of its own. Serving a client
+costs little more than the socket writes, so that the bots under test
+rather than the server are the bottleneck.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+import uuid
+from array import array
+from collections import deque
+from construct import Container, StreamError
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.codecs import SERVERBOUND
+from skeltal.protocol.framing import FrameBuffer
+from skeltal.protocol.state import State
+from skeltal.protocol.stats import ConnectionStats
+from skeltal.swarm import raise_file_limit
+from skeltal.world.map import SECTION_VOLUME, Column, Section
+
+LOGGER = logging.getLogger(__name__)
+
+Play = clientbound.Play
+
+# Relative weights of the kinds of packets in the traffic
+MIX = {"move": 90, "chat": 9, "chunk": 1}
+
+# Chunk columns are sent around the origin, in a square this wide
+CHUNK_SPAN = 8
+
+# Blocks the sections of chunks are randomly filled with
+BLOCKS = (1, 2, 9, 10, 33, 34, 1341, 3970)
+
+
+def offline_uuid(username):
+    """UUID of a player on a server in offline mode."""
+    digest = hashlib.md5(f"OfflinePlayer:{username}".encode()).digest()
+    return str(uuid.UUID(bytes=digest, version=3))
+
+
+class Traffic:
+    """Synthetic play traffic as a ring of prebuilt frames.
+
+    `rate` is packets per second sent to each client, with kinds picked
+    by the weights in `mix`: ``move`` for EntityRelativeMove of one of
+    `entities` mobs, ``chat`` for ChatMessage of `chat_size` characters
+    and ``chunk`` for ChunkData of `sections` sections. Frames are built
+    for compression `threshold`, -1 to disable it.
+    """
+
+    def __init__(
+        self,
+        rate=100.0,
+        mix=None,
+        entities=100,
+        sections=4,
+        chat_size=64,
+        threshold=256,
+        length=4096,
+        seed=404,
+    ):
+        self.rate = rate
+        self.mix = dict(MIX if mix is None else mix)
+        self.entities = entities
+        self.sections = sections
+        self.chat_size = chat_size
+        self.threshold = threshold
+        self.length = length
+        self.seed = seed
+
+        unknown = set(self.mix) - set(MIX)
+        if unknown:
+            raise ValueError(f"Unknown kinds of traffic: {', '.join(sorted(unknown))}")
+        if not any(self.mix.values()):
+            raise ValueError("Traffic mix has no weights")
+
+        self._rng = random.Random(seed)
+        self.stream, self.offsets = self._build()
+
+    def __repr__(self):
+        return f"Traffic({self.rate:g}/s, {self.length} frames)"
+
+    def frame(self, message_type, **fields):
+        struct = getattr(clientbound, message_type.name)
+        data = struct.build(Container(fields))
+        return serverbound.build(self.threshold, message_type, data)
+
+    def spawn(self):
+        """Frames spawning the mobs which the traffic moves."""
+        rng = random.Random(self.seed)
+        span = CHUNK_SPAN * 16
+        return b"".join(
+            self.frame(
+                Play.SpawnMob,
+                entity_id=entity_id,
+                uuid=rng.getrandbits(128).to_bytes(16, "big"),
+                type=95,
+                x=rng.uniform(-span / 2, span / 2),
+                y=70.0,
+                z=rng.uniform(-span / 2, span / 2),
+                yaw=0,
+                pitch=0,
+                head_pitch=0,
+                velocity_x=0,
+                velocity_y=0,
+                velocity_z=0,
+                metadata=b"\xff",
+            )
+            for entity_id in range(self.entities)
+        )
+
+    def take(self, cursor, count):
+        """Return `count` frames from `cursor` on, and the next cursor."""
+        offsets, end = self.offsets, cursor + count
+        if end <= self.length:
+            return self.stream[offsets[cursor] : offsets[end]], end % self.length
+        # A late tick at a high rate may wrap around more than once
+        wraps, end = divmod(end, self.length)
+        data = (
+            self.stream[offsets[cursor] :]
+            + self.stream * (wraps - 1)
+            + self.stream[: offsets[end]]
+        )
+        return data, end
+
+    def _build(self):
+        rng = self._rng
+        kinds = [kind for kind, weight in self.mix.items() if weight > 0]
+        weights = [self.mix[kind] for kind in kinds]
+        build = {"move": self._move, "chat": self._chat, "chunk": self._chunk}
+
+        frames = [build[kind]() for kind in rng.choices(kinds, weights, k=self.length)]
+        offsets = array("Q", [0])
+        for frame in frames:
+            offsets.append(offsets[-1] + len(frame))
+        return b"".join(frames), offsets
+
+    def _move(self):
+        rng = self._rng
+        if not self.entities:
+            return self._chat()
+        return self.frame(
+            Play.EntityRelativeMove,
+            entity_id=rng.randrange(self.entities),
+            delta_x=rng.randrange(-4096, 4096),
+            delta_y=0,
+            delta_z=rng.randrange(-4096, 4096),
+            on_ground=True,
+        )
+
+    def _chat(self):
+        rng = self._rng
+        text = "".join(rng.choices("abcdefghijklmnopqrstuvwxyz ", k=self.chat_size))
+        return self.frame(
+            Play.ChatMessage, json_data=json.dumps({"text": text}), position=0
+        )
+
+    def _chunk(self):
+        rng = self._rng
+        column = Column(
+            rng.randrange(CHUNK_SPAN) - CHUNK_SPAN // 2,
+            rng.randrange(CHUNK_SPAN) - CHUNK_SPAN // 2,
+        )
+        palette = rng.sample(BLOCKS, 4)
+        for idx in range(self.sections):
+            states = rng.choices(palette, k=SECTION_VOLUME)
+            column.sections[idx] = Section.from_states(states)
+        return self.frame(
+            Play.ChunkData,
+            x=column.x,
+            z=column.z,
+            full_chunk=True,
+            bit_mask=column.bit_mask,
+            data=column.dump(),
+            block_entity_count=0,
+            block_entities=b"",
+        )
+
+
+class ServerConnection(asyncio.BufferedProtocol):
+    """Connection of a client to the stand-in server."""
+
+    def __init__(self, server):
+        self.server = server
+        self.username = None
+        self.state = State.HANDSHAKING
+        self.threshold = -1
+        self.stats = ConnectionStats()
+
+        self.cursor = 0
+        self.credit = 0.0
+        self.paused = False
+
+        self._buffer = FrameBuffer()
+        self._transport = None
+        self._keepalive = None
+
+    def __repr__(self):
+        return f"ServerConnection({self.username}, {self.state})"
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self.server.clients.add(self)
+
+    def connection_lost(self, exc):
+        self.server.disconnected(self)
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+
+    def get_buffer(self, sizehint):
+        return self._buffer.get_buffer(max(sizehint, 2048))
+
+    def buffer_updated(self, nbytes):
+        self._buffer.commit(nbytes)
+        self.stats.bytes_rx += nbytes
+        try:
+            while self._transport is not None:
+                frame = self._buffer.next_frame(self.threshold)
+                if frame is None:
+                    break
+                self.stats.packets_rx += 1
+                self.receive(*frame)
+        except (StreamError, KeyError, ValueError) as exc:
+            LOGGER.warning("Malformed packet from %s: %s", self.username, exc)
+            self.close()
+
+    def receive(self, packet_id, data):
+        if self.state is State.PLAY:
+            if packet_id == serverbound.Play.KeepAlive:
+                message = SERVERBOUND[(self.state, packet_id)].parse(data)
+                self.keepalive_received(message.id)
+            return
+
+        message = SERVERBOUND[(self.state, packet_id)].parse(data)
+        if self.state is State.HANDSHAKING:
+            if message.next_state != State.LOGIN:
+                LOGGER.debug("Only logging in is supported, closing")
+                self.close()
+                return
+            self.state = State.LOGIN
+        elif self.state is State.LOGIN:
+            self.login(message.name)
+
+    def login(self, username):
+        server, traffic = self.server, self.server.traffic
+        self.username = username
+        if traffic.threshold >= 0:
+            data = clientbound.SetCompression.build(
+                Container(threshold=traffic.threshold)
+            )
+            self.send(serverbound.build(-1, clientbound.Login.SetCompression, data))
+            self.threshold = traffic.threshold
+
+        uuid_ = offline_uuid(username)
+        self.send(
+            traffic.frame(clientbound.Login.LoginSuccess, uuid=uuid_, username=username)
+        )
+        self.send(
+            traffic.frame(
+                Play.JoinGame,
+                entity_id=server.entity_id(),
+                game_mode="Survival",
+                dimension="Overworld",
+                difficulty="Normal",
+                max_players=255,
+                level_type="default",
+                reduced_debug_info=False,
+            )
+        )
+        self.send(server.spawn, traffic.entities)
+        self.cursor = random.randrange(traffic.length)
+        self.state = State.PLAY
+        server.playing.add(self)
+        LOGGER.debug("%s joined the game", username)
+
+    def send(self, data, packets=1):
+        self.stats.packets_tx += packets
+        self.stats.bytes_tx += len(data)
+        self.stats.send_calls += 1
+        self._transport.write(data)
+
+    def send_keepalive(self, keepalive_id):
+        if self._keepalive is not None:
+            # Previous keepalive still unanswered, don't count it twice
+            return
+        self._keepalive = (keepalive_id, time.perf_counter())
+        self.send(self.server.traffic.frame(Play.KeepAlive, id=keepalive_id))
+
+    def keepalive_received(self, keepalive_id):
+        if self._keepalive is None or self._keepalive[0] != keepalive_id:
+            return
+        self.stats.keepalives += 1
+        self.server.rtts.append(time.perf_counter() - self._keepalive[1])
+        self._keepalive = None
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+
+class Server:
+    """Stand-in server for any number of clients on an event loop.
+
+    Playing clients are sent `traffic` every `tick` seconds, and a
+    keepalive every `keepalive` seconds. Clients which don't read their
+    traffic fast enough are skipped until the transport's write buffer
+    drains, and the packets they missed are counted as skipped.
+    """
+
+    def __init__(
+        self, address="localhost", port=25565, traffic=None, tick=0.05, keepalive=5.0
+    ):
+        self.address = address
+        self.port = port
+        self.traffic = traffic or Traffic()
+        self.tick = tick
+        self.keepalive = keepalive
+
+        self.clients = set()
+        self.playing = set()
+        self.rtts = deque(maxlen=1000)
+        self.skipped = 0
+        # Traffic of disconnected clients
+        self.stats = ConnectionStats()
+
+        self.spawn = self.traffic.spawn()
+        self._entity_ids = self.traffic.entities
+        self._server = None
+        self._ticker = None
+
+    def __repr__(self):
+        return f"Server({self.address}:{self.port}, {len(self.clients)} clients)"
+
+    async def start(self):
+        """Start listening, resolving `port` if it was 0."""
+        raise_file_limit()
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(
+            lambda: ServerConnection(self), self.address, self.port, backlog=1024
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ticker = asyncio.create_task(self._tick_loop())
+        LOGGER.info("Serving %r on %s:%d", self.traffic, self.address, self.port)
+
+    async def run(self, interval=10.0):
+        """Serve until cancelled, logging health every `interval` seconds."""
+        await self.start()
+        try:
+            sample = self._counters()
+            while True:
+                await asyncio.sleep(interval)
+                sample = self.report(sample)
+        finally:
+            self.close()
+            await self.wait_closed()
+
+    def close(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if self._server is not None:
+            self._server.close()
+        for client in list(self.clients):
+            client.close()
+
+    async def wait_closed(self):
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    def entity_id(self):
+        """Entity ID for a new player, after the IDs of the mobs."""
+        self._entity_ids += 1
+        return self._entity_ids
+
+    def disconnected(self, client):
+        self.clients.discard(client)
+        self.playing.discard(client)
+        self.stats += client.stats
+        LOGGER.debug("%s disconnected", client.username)
+
+    def health(self):
+        """Client counts and traffic counters of all clients so far."""
+        stats = ConnectionStats()
+        stats += self.stats
+        for client in self.clients:
+            stats += client.stats
+
+        rtts = sorted(self.rtts)
+        health = {
+            "clients": len(self.clients),
+            "playing": len(self.playing),
+            "skipped": self.skipped,
+            "rtt_median_ms": rtts[len(rtts) // 2] * 1e3 if rtts else None,
+        }
+        health.update(stats.as_dict())
+        return health
+
+    def report(self, sample):
+        """Log health and rates since `sample`, return the next sample."""
+        health = self.health()
+        counters = self._counters()
+        elapsed, packets, size = (now - then for now, then in zip(counters, sample))
+        LOGGER.info(
+            "Server: %d clients, %d playing | %.0f packets/s | %.1f MB/s | "
+            "RTT %s | %d skipped",
+            health["clients"],
+            health["playing"],
+            packets / elapsed if elapsed else 0.0,
+            size / elapsed / 1e6 if elapsed else 0.0,
+            "n/a"
+            if health["rtt_median_ms"] is None
+            else f"{health['rtt_median_ms']:.1f} ms",
+            health["skipped"],
+        )
+        return counters
+
+    def _counters(self):
+        packets = self.stats.packets_tx
+        size = self.stats.bytes_tx
+        for client in self.clients:
+            packets += client.stats.packets_tx
+            size += client.stats.bytes_tx
+        return time.monotonic(), packets, size
+
+    async def _tick_loop(self):
+        loop = asyncio.get_running_loop()
+        traffic = self.traffic
+        last = next_keepalive = loop.time()
+        keepalive_id = 0
+
+        while True:
+            await asyncio.sleep(self.tick)
+            # Rate is kept over time even if ticks run late under load
+            now = loop.time()
+            credit = traffic.rate * (now - last)
+            last = now
+
+            keepalive = now >= next_keepalive
+            if keepalive:
+                next_keepalive = now + self.keepalive
+                keepalive_id += 1
+
+            for client in list(self.playing):
+                if keepalive:
+                    client.send_keepalive(keepalive_id)
+                client.credit += credit
+                count = int(client.credit)
+                client.credit -= count
+                if client.paused:
+                    self.skipped += count
+                elif count:
+                    data, client.cursor = traffic.take(client.cursor, count)
+                    client.send(data, count)
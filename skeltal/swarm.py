@@ -0,0 +1,454 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from skeltal import exporter, setup_logging
+from skeltal.bot import Bot
+from skeltal.protocol.state import State
+from skeltal.protocol.stats import ConnectionStats
+
+LOGGER = logging.getLogger(__name__)
+
+
+def memory_usage():
+    """Resident memory of the current process in bytes, or None if unknown."""
+    try:
+        with open("/proc/self/statm") as fd:
+            return int(fd.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    if resource is not None:
+        # Peak instead of current usage, in kilobytes
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    return None
+
+
+def raise_file_limit():
+    """Raise soft limit of open file descriptors to the hard limit."""
+    if resource is None:
+        return
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        LOGGER.debug("Raised open file limit: %d -> %d", soft, hard)
+
+
+def usernames(prefix, indices):
+    # Minecraft usernames are limited to 16 characters
+    return [f"{prefix}{idx}"[:16] for idx in indices]
+
+
+def log_summary(name, count, summary):
+    LOGGER.info(
+        "%s: %d/%d playing, %d connecting, %d closed, %d failed | "
+        "%.0f packets/s | %.1f us CPU/packet | %s/bot",
+        name,
+        summary["playing"],
+        count,
+        summary["connecting"],
+        summary["closed"],
+        summary["failed"],
+        summary["packets_per_sec"],
+        summary["cpu_per_packet"] * 1e6,
+        "n/a"
+        if summary["memory_per_bot"] is None
+        else f"{summary['memory_per_bot'] / 1024:.1f} KiB",
+    )
+
+
+class Swarm:
+    """Many bots multiplexed over a single asyncio event loop.
+
+    Bots connect one after another at `ramp` connections per second,
+    and health of the whole swarm is logged every `interval` seconds.
+    """
+
+    def __init__(self, address, port, count, ramp=10.0, prefix="skel", interval=10.0):
+        self.address = address
+        self.port = port
+        self.count = count
+        self.ramp = ramp
+        self.prefix = prefix
+        self.interval = interval
+
+        self.bots = []
+        self.failed = 0
+
+        self._tasks = set()
+        self._memory = None
+        self._sample = None
+
+    async def run(self, indices=None):
+        """Run bots with given indices, by default all of the swarm."""
+        raise_file_limit()
+        exporter.watch_loop()
+        self._memory = memory_usage()
+        self._sample = self._counters()
+
+        reporter = asyncio.create_task(self._report_loop())
+        try:
+            if indices is None:
+                indices = range(self.count)
+            await self.spawn(usernames(self.prefix, indices))
+            await self.wait()
+        finally:
+            reporter.cancel()
+            self.report()
+
+    async def spawn(self, names):
+        """Start bots with given usernames."""
+        for idx, username in enumerate(names):
+            if idx and self.ramp > 0:
+                await asyncio.sleep(1.0 / self.ramp)
+
+            bot = Bot(
+                self.address,
+                self.port,
+                engine="asyncio",
+                world=False,
+                username=username,
+            )
+            self.bots.append(bot)
+
+            task = asyncio.create_task(self._run_bot(bot))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def wait(self):
+        """Wait until all spawned bots have finished."""
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
+
+    def shutdown(self):
+        for bot in self.bots:
+            bot.shutdown()
+
+    def health(self):
+        """Aggregated status and traffic counters of all bots."""
+        health = {
+            "bots": len(self.bots),
+            "connecting": 0,
+            "connected": 0,
+            "playing": 0,
+            "closed": 0,
+            "failed": self.failed,
+        }
+
+        stats = ConnectionStats()
+        for bot in self.bots:
+            client = bot.client
+            stats += client.stats
+            if client.is_connected:
+                health["connected"] += 1
+                if client.current_state is State.PLAY:
+                    health["playing"] += 1
+            elif client.current_state is None:
+                health["connecting"] += 1
+            else:
+                health["closed"] += 1
+
+        health["connecting"] -= self.failed
+        health.update(stats.as_dict())
+        return health
+
+    def summary(self):
+        """Health with rates and resource usage since previous summary."""
+        summary = self.health()
+        counters = self._counters()
+        elapsed, cpu, packets = (
+            now - before for now, before in zip(counters, self._sample)
+        )
+        self._sample = counters
+
+        memory = memory_usage()
+        if memory is not None and self._memory is not None and self.bots:
+            memory_per_bot = (memory - self._memory) / len(self.bots)
+        else:
+            memory_per_bot = None
+
+        summary.update(
+            packets_per_sec=packets / elapsed if elapsed else 0.0,
+            cpu_per_packet=cpu / packets if packets else 0.0,
+            cpu_seconds=cpu,
+            packets=packets,
+            memory_per_bot=memory_per_bot,
+        )
+        return summary
+
+    def report(self):
+        summary = self.summary()
+        log_summary("Swarm", self.count, summary)
+        return summary
+
+    def _counters(self):
+        packets = sum(
+            bot.client.stats.packets_rx + bot.client.stats.packets_tx
+            for bot in self.bots
+        )
+        return time.monotonic(), time.process_time(), packets
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.report()
+
+    async def _run_bot(self, bot):
+        try:
+            await bot.client.run_forever()
+        except OSError as exc:
+            LOGGER.warning("Bot '%s' failed to connect: %s", bot.client.username, exc)
+            self.failed += 1
+
+
+class WorkerSwarm(Swarm):
+    """Shard of a swarm running in a worker process.
+
+    Sends its summaries to the supervisor over a pipe instead of logging
+    them, and accepts more bots from the supervisor while running.
+    """
+
+    def __init__(self, pipe, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pipe = pipe
+        self._loop = None
+
+    async def run(self, indices=None):
+        self._loop = asyncio.get_running_loop()
+        listener = threading.Thread(target=self._listen, daemon=True)
+        listener.start()
+        await super().run(indices)
+
+    def report(self):
+        summary = self.summary()
+        try:
+            self.pipe.send(("summary", summary))
+        except OSError:
+            LOGGER.debug("Supervisor not listening")
+        return summary
+
+    def _listen(self):
+        while True:
+            try:
+                command, indices = self.pipe.recv()
+            except (EOFError, OSError):
+                return
+
+            if command == "spawn":
+                names = usernames(self.prefix, indices)
+                asyncio.run_coroutine_threadsafe(self.spawn(names), self._loop)
+
+
+def _worker(pipe, level, address, port, count, indices, ramp, prefix, interval):
+    setup_logging(level)
+    bots = WorkerSwarm(pipe, address, port, count, ramp, prefix, interval)
+    try:
+        asyncio.run(bots.run(indices))
+    except KeyboardInterrupt:
+        pass
+
+
+class Supervisor:
+    """Shards a swarm of bots across a pool of worker processes.
+
+    Each worker runs its shard on its own event loop and reports its
+    summary back over a pipe, which are aggregated and logged every
+    `interval` seconds. If a worker dies, its bots are rebalanced
+    across the remaining workers.
+    """
+
+    def __init__(
+        self,
+        address,
+        port,
+        count,
+        workers=None,
+        ramp=10.0,
+        prefix="skel",
+        interval=10.0,
+    ):
+        self.address = address
+        self.port = port
+        self.count = count
+        self.workers = workers or os.cpu_count() or 1
+        self.ramp = ramp
+        self.prefix = prefix
+        self.interval = interval
+
+        self.summaries = {}
+        self._processes = {}
+        self._pipes = {}
+        self._shards = {}
+
+    def run(self):
+        # Ramp up the whole swarm at the requested rate
+        ramp = self.ramp / self.workers
+        level = logging.getLogger().getEffectiveLevel()
+
+        for worker in range(self.workers):
+            indices = list(range(worker, self.count, self.workers))
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(
+                    child,
+                    level,
+                    self.address,
+                    self.port,
+                    self.count,
+                    indices,
+                    ramp,
+                    self.prefix,
+                    self.interval,
+                ),
+                name=f"skeltal-worker-{worker}",
+                daemon=True,
+            )
+            process.start()
+            child.close()
+
+            self._processes[worker] = process
+            self._pipes[worker] = parent
+            self._shards[worker] = indices
+
+        try:
+            self._monitor()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=5)
+        for pipe in self._pipes.values():
+            pipe.close()
+        self._processes.clear()
+        self._pipes.clear()
+
+    def summary(self):
+        """Aggregated summary of the latest summaries of all workers."""
+        total = {}
+        for summary in self.summaries.values():
+            for key, value in summary.items():
+                if value is not None:
+                    total[key] = total.get(key, 0) + value
+
+        packets = total.get("packets", 0)
+        bots = total.get("bots", 0)
+        memory = [
+            s["memory_per_bot"] * s["bots"]
+            for s in self.summaries.values()
+            if s["memory_per_bot"] is not None
+        ]
+
+        total["cpu_per_packet"] = (
+            total.get("cpu_seconds", 0.0) / packets if packets else 0.0
+        )
+        total["memory_per_bot"] = sum(memory) / bots if memory and bots else None
+        for key in ("playing", "connecting", "closed", "failed", "packets_per_sec"):
+            total.setdefault(key, 0)
+
+        return total
+
+    def _monitor(self):
+        deadline = time.monotonic() + self.interval
+        while self._processes:
+            waitables = list(self._pipes.values())
+            waitables += [p.sentinel for p in self._processes.values()]
+            timeout = max(0.0, deadline - time.monotonic())
+
+            for ready in wait(waitables, timeout=timeout):
+                worker = self._find_worker(ready)
+                if worker is None:
+                    continue
+                if ready is self._pipes.get(worker):
+                    self._receive(worker)
+                else:
+                    self._reap(worker)
+
+            if time.monotonic() >= deadline:
+                deadline += self.interval
+                log_summary(
+                    f"Swarm ({len(self._processes)} workers)",
+                    self.count,
+                    self.summary(),
+                )
+
+    def _find_worker(self, ready):
+        for worker, pipe in self._pipes.items():
+            if ready is pipe:
+                return worker
+        for worker, process in self._processes.items():
+            if ready == process.sentinel:
+                return worker
+        return None
+
+    def _receive(self, worker):
+        try:
+            kind, payload = self._pipes[worker].recv()
+        except (EOFError, OSError):
+            self._reap(worker)
+            return
+
+        if kind == "summary":
+            self.summaries[worker] = payload
+
+    def _reap(self, worker, lost=False):
+        """Join a worker, rebalancing its bots unless it finished.
+
+        A `lost` worker, which can't be reached, is stopped first, and its
+        bots are rebalanced even if it finished.
+        """
+        process = self._processes.pop(worker)
+        if lost and process.is_alive():
+            process.terminate()
+        process.join()
+        self._pipes.pop(worker).close()
+        orphans = self._shards.pop(worker)
+
+        if process.exitcode == 0 and not lost:
+            LOGGER.info("Worker %d finished", worker)
+            return
+
+        LOGGER.error("Worker %d died (exit code: %s)", worker, process.exitcode)
+        self.summaries.pop(worker, None)
+        self._rebalance(orphans)
+
+    def _rebalance(self, orphans):
+        survivors = sorted(self._processes)
+        if not survivors:
+            LOGGER.error("No workers left for %d bots", len(orphans))
+            return
+
+        LOGGER.warning(
+            "Rebalancing %d bots across %d workers", len(orphans), len(survivors)
+        )
+        step = len(survivors)
+        lost = []
+        for idx, worker in enumerate(survivors):
+            share = orphans[idx::step]
+            if share:
+                self._shards[worker].extend(share)
+                try:
+                    self._pipes[worker].send(("spawn", share))
+                except OSError as err:
+                    # Died since the last check
+                    LOGGER.error("Failed to reach worker %d: %s", worker, err)
+                    lost.append(worker)
+        for worker in lost:
+            # Unless reaped by rebalancing another lost worker's bots
+            if worker in self._processes:
+                self._reap(worker, lost=True)
@@ -0,0 +1,284 @@
+"""Path planning for the player character over loaded terrain.
+
+The character can stand at a block when it and the block above are
+passable and the block below is solid. Which blocks are standable is
+computed for a whole chunk section at once and cached: blocks are
+classified through byte translation tables of the section palette, and
+the solid layer below and the passable layer above are combined with big
+integer ANDs. Cached masks are dropped when the world reports changed
+blocks or columns.
+
+Paths are planned with A* over standable blocks, walking to the four
+horizontal neighbours, jumping one block up or dropping a few blocks
+down. A :class:`Search` expands a bounded number of nodes per call, so a
+long search can be spread over ticks without blocking the network loop.
+"""
+import heapq
+import time
+from skeltal.world.map import AIR, HEIGHT, SECTION_VOLUME, SECTIONS
+
+# Air variants of protocol 404, anything else not avoided is solid
+VOID_AIR = 9129
+CAVE_AIR = 9130
+PASSABLE = frozenset((AIR, VOID_AIR, CAVE_AIR))
+# Water and lava, neither stood on nor walked through
+AVOID = frozenset(range(34, 66))
+
+MAX_DROP = 3
+JUMP_COST = 2
+DROP_COST = 0.5
+
+_LAYER = 256
+_NOTHING = bytes(SECTION_VOLUME)
+_EVERYTHING = b"\x01" * SECTION_VOLUME
+_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def _and(*masks):
+    """Bytewise AND of 0/1 masks of equal length."""
+    total = int.from_bytes(masks[0], "little")
+    for mask in masks[1:]:
+        total &= int.from_bytes(mask, "little")
+    return total.to_bytes(len(masks[0]), "little")
+
+
+class Pathfinder:
+    """Plans paths over the blocks of a :class:`World`.
+
+    Block state IDs in `passable` can be walked through, those in
+    `avoid` are neither walked through nor stood on, and all others are
+    solid. Unloaded columns are impassable.
+    """
+
+    def __init__(self, world, passable=PASSABLE, avoid=AVOID, max_drop=MAX_DROP):
+        self.world = world
+        self.max_drop = max_drop
+        size = 1 << 16
+        self._solid = bytes(
+            state not in passable and state not in avoid for state in range(size)
+        )
+        self._passable = bytes(state in passable for state in range(size))
+        # Per section, solid and passable blocks and standable blocks
+        self._classes = {}
+        self._masks = {}
+        world.watch(self.invalidate)
+
+    def invalidate(self, chunk_x, chunk_z, y=None):
+        """Drop cached masks affected by a block change at height `y`,
+        or by a change of the whole column.
+        """
+        if y is None:
+            for section_y in range(SECTIONS):
+                self._classes.pop((chunk_x, section_y, chunk_z), None)
+                self._masks.pop((chunk_x, section_y, chunk_z), None)
+            return
+
+        # Standable blocks depend on the blocks below and above them
+        self._classes.pop((chunk_x, y >> 4, chunk_z), None)
+        for section_y in {(y - 1) >> 4, y >> 4, (y + 1) >> 4}:
+            self._masks.pop((chunk_x, section_y, chunk_z), None)
+
+    def masks(self, chunk_x, section_y, chunk_z):
+        """Standable and passable masks of a section, one byte per block."""
+        key = (chunk_x, section_y, chunk_z)
+        masks = self._masks.get(key)
+        if masks is None:
+            below = self._classify(chunk_x, section_y - 1, chunk_z)[0]
+            solid, passable = self._classify(chunk_x, section_y, chunk_z)
+            above = self._classify(chunk_x, section_y + 1, chunk_z)[1]
+            standable = _and(
+                passable,
+                (passable + above[:_LAYER])[_LAYER:],
+                below[-_LAYER:] + solid[:-_LAYER],
+            )
+            masks = self._masks[key] = (standable, passable)
+        return masks
+
+    def standable(self, x, y, z):
+        """Whether the character can stand at block coordinates."""
+        if not 0 <= y < HEIGHT:
+            return False
+        mask = self.masks(x >> 4, y >> 4, z >> 4)[0]
+        return mask[(y & 15) << 8 | (z & 15) << 4 | (x & 15)] == 1
+
+    def search(self, start, goal, max_nodes=100000):
+        """Start a search for a path between block coordinates."""
+        return Search(self, start, goal, max_nodes)
+
+    def find(self, start, goal, max_nodes=100000):
+        """Path from start to goal as a list of block coordinates, or
+        None if there is none within `max_nodes` expanded nodes.
+        """
+        search = Search(self, start, goal, max_nodes)
+        while not search.step(max_nodes):
+            pass
+        return search.path
+
+    def _classify(self, chunk_x, section_y, chunk_z):
+        """Solid and passable masks of the blocks in a section."""
+        if section_y < 0:
+            return _NOTHING, _NOTHING
+        column = self.world.columns.get((chunk_x, chunk_z))
+        if column is None:
+            return _NOTHING, _NOTHING
+        if section_y >= SECTIONS:
+            return _NOTHING, _EVERYTHING
+
+        key = (chunk_x, section_y, chunk_z)
+        classes = self._classes.get(key)
+        if classes is not None:
+            return classes
+
+        section = column.sections[section_y]
+        if section is None:
+            classes = (_NOTHING, _EVERYTHING)
+        elif section.palette is None:
+            blocks = section.blocks
+            classes = (
+                bytes(map(self._solid.__getitem__, blocks)),
+                bytes(map(self._passable.__getitem__, blocks)),
+            )
+        else:
+            palette, blocks = section.palette, section.blocks.tobytes()
+            classes = tuple(
+                blocks.translate(
+                    bytes(table[state] for state in palette).ljust(256, b"\0")
+                )
+                for table in (self._solid, self._passable)
+            )
+        self._classes[key] = classes
+        return classes
+
+
+class Search:
+    """A* search for a path, resumable across calls to :meth:`step`.
+
+    Nodes are standable block coordinates. The search gives up once
+    `max_nodes` nodes were expanded, or when the goal is not standable.
+    """
+
+    def __init__(self, pathfinder, start, goal, max_nodes=100000):
+        self.pathfinder = pathfinder
+        self.start = tuple(start)
+        self.goal = tuple(goal)
+        self.max_nodes = max_nodes
+        self.expanded = 0
+        self.path = None
+        self.done = not pathfinder.standable(*self.goal)
+
+        self._open = [(self._estimate(self.start), 0, self.start)]
+        self._cost = {self.start: 0}
+        self._parents = {self.start: None}
+        self._closed = set()
+
+    def __repr__(self):
+        state = "found" if self.path else "failed" if self.done else "running"
+        return f"Search({self.start} -> {self.goal}, {state})"
+
+    def step(self, nodes=1000, seconds=None):
+        """Expand up to `nodes` nodes, or for up to `seconds`.
+
+        Returns True once the search is done, with :attr:`path` set to
+        the path if one was found.
+        """
+        if self.done:
+            return True
+
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        goal, max_nodes = self.goal, self.max_nodes
+        heap, closed = self._open, self._closed
+        cost, parents = self._cost, self._parents
+        estimate, neighbours = self._estimate, self._neighbours
+
+        for count in range(nodes):
+            if not heap or self.expanded >= max_nodes:
+                self.done = True
+                return True
+            if deadline is not None and count & 63 == 63:
+                if time.perf_counter() > deadline:
+                    return False
+
+            _, spent, node = heapq.heappop(heap)
+            if node in closed:
+                continue
+            if node == goal:
+                self.path = self._trace(node)
+                self.done = True
+                return True
+            closed.add(node)
+            self.expanded += 1
+
+            for neighbour, step in neighbours(node):
+                total = spent + step
+                if total < cost.get(neighbour, total + 1):
+                    cost[neighbour] = total
+                    parents[neighbour] = node
+                    entry = (total + estimate(neighbour), total, neighbour)
+                    heapq.heappush(heap, entry)
+
+        return False
+
+    def _estimate(self, node):
+        # Every move goes one block horizontally, and costs extra going up
+        # or down, so this never overestimates
+        x, y, z = node
+        goal_x, goal_y, goal_z = self.goal
+        estimate = abs(goal_x - x) + abs(goal_z - z)
+        if goal_y > y:
+            return estimate + (JUMP_COST - 1) * (goal_y - y)
+        return estimate + DROP_COST * (y - goal_y)
+
+    def _neighbours(self, node):
+        x, y, z = node
+        masks = self.pathfinder.masks
+        found = []
+
+        # Headroom to jump from here
+        jump = False
+        if y + 2 >= HEIGHT:
+            jump = y + 1 < HEIGHT
+        elif y + 1 < HEIGHT:
+            passable = masks(x >> 4, (y + 2) >> 4, z >> 4)[1]
+            jump = passable[((y + 2) & 15) << 8 | (z & 15) << 4 | (x & 15)] == 1
+
+        for dx, dz in _DIRECTIONS:
+            nx, nz = x + dx, z + dz
+            column = (nz & 15) << 4 | (nx & 15)
+            cx, cz = nx >> 4, nz >> 4
+
+            standable = masks(cx, y >> 4, cz)[0]
+            if standable[(y & 15) << 8 | column]:
+                found.append(((nx, y, nz), 1))
+                continue
+
+            if jump and y + 1 < HEIGHT:
+                standable = masks(cx, (y + 1) >> 4, cz)[0]
+                if standable[((y + 1) & 15) << 8 | column]:
+                    found.append(((nx, y + 1, nz), JUMP_COST))
+                    continue
+
+            # Step off the edge if there is room, and fall until landing
+            for drop in range(self.pathfinder.max_drop + 1):
+                fall = y + 1 - drop
+                if fall < 1:
+                    break
+                if fall < HEIGHT:
+                    standable, passable = masks(cx, fall >> 4, cz)
+                    if not passable[(fall & 15) << 8 | column]:
+                        break
+                if drop and fall - 1 < HEIGHT:
+                    standable = masks(cx, (fall - 1) >> 4, cz)[0]
+                    if standable[((fall - 1) & 15) << 8 | column]:
+                        found.append(((nx, fall - 1, nz), 1 + DROP_COST * drop))
+                        break
+
+        return found
+
+    def _trace(self, node):
+        path = []
+        parents = self._parents
+        while node is not None:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+        return path
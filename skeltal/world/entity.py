@@ -0,0 +1,432 @@
+"""Entities tracked by the client, stored as arrays.
+
+Instead of an object per entity, every attribute is a contiguous array
+and each entity is a slot in all of them. Entity IDs from the server map
+to slots in a dict, and slots of destroyed entities are reused, so a
+burst of movement packets updates a few array items per packet.
+
+Entities are also bucketed by the chunk column they are in, a spatial
+hash updated as they move, so that proximity queries only look at
+entities in nearby chunks.
+"""
+import enum
+import math
+import struct
+from math import floor
+from array import array
+from operator import itemgetter
+from construct import StreamError
+from skeltal.protocol import clientbound, varint
+from skeltal.protocol.codecs import LazyMessage
+
+# Relative moves are in 1/4096 blocks, velocities in 1/8000 blocks per tick
+MOVE_SCALE = 1 / 4096
+VELOCITY_SCALE = 1 / 8000
+ANGLE_SCALE = 360 / 256
+
+# Entities are bucketed by 16x16 block columns, free slots have no bucket
+CELL_SIZE = 16
+NO_CELL = -(2**63)
+
+
+def _cell(x, z):
+    """Bucket key of the chunk column containing block coordinates."""
+    return (floor(x) >> 4) << 32 | (floor(z) >> 4) & 0xFFFFFFFF
+
+
+def _ring(cell_x, cell_z, radius):
+    """Bucket keys of cells at Chebyshev distance `radius` from a cell."""
+    if radius == 0:
+        return [cell_x << 32 | cell_z & 0xFFFFFFFF]
+
+    keys = []
+    for dx in range(-radius, radius + 1):
+        for dz in (-radius, radius):
+            keys.append((cell_x + dx) << 32 | (cell_z + dz) & 0xFFFFFFFF)
+    for dz in range(-radius + 1, radius):
+        for dx in (-radius, radius):
+            keys.append((cell_x + dx) << 32 | (cell_z + dz) & 0xFFFFFFFF)
+    return keys
+
+
+class _Layout(struct.Struct):
+    """Fields after the entity ID of a fixed size entity message."""
+
+    def __init__(self, layout, names):
+        super().__init__(layout)
+        self.fields = itemgetter("entity_id", *names)
+
+
+_RELATIVE_MOVE = _Layout(">hhh?", ("delta_x", "delta_y", "delta_z", "on_ground"))
+_LOOK_AND_RELATIVE_MOVE = _Layout(
+    ">hhhBB?", ("delta_x", "delta_y", "delta_z", "yaw", "pitch", "on_ground")
+)
+_LOOK = _Layout(">BB?", ("yaw", "pitch", "on_ground"))
+_TELEPORT = _Layout(">dddBB?", ("x", "y", "z", "yaw", "pitch", "on_ground"))
+_VELOCITY = _Layout(">hhh", ("velocity_x", "velocity_y", "velocity_z"))
+
+
+def _unpack(message, layout):
+    """Fields of entity message, from the raw payload if not decoded."""
+    if type(message) is LazyMessage and not message.is_decoded:
+        data = message.payload
+        try:
+            entity_id, offset = varint.decode(data)
+            return (entity_id, *layout.unpack_from(data, offset))
+        except (IndexError, ValueError, struct.error) as exc:
+            raise StreamError(f"Malformed {message._type.name}: {exc}") from exc
+
+    return layout.fields(message)
+
+
+class Kind(enum.IntEnum):
+    OBJECT = 0
+    MOB = 1
+    PLAYER = 2
+
+
+class Entities:
+    """Positions, velocities, rotations and types of tracked entities.
+
+    Attributes of the entity in slot `slot` are ``x[slot]``,
+    ``velocity_x[slot]``, ``yaw[slot]`` and so on. Use :meth:`slot` to
+    find the slot of an entity ID. Free slots have -1 as entity ID.
+    """
+
+    FIELDS = {
+        "ids": "i",
+        "kinds": "b",
+        "types": "i",
+        "x": "d",
+        "y": "d",
+        "z": "d",
+        "velocity_x": "f",
+        "velocity_y": "f",
+        "velocity_z": "f",
+        "yaw": "f",
+        "pitch": "f",
+        "on_ground": "b",
+        "cells": "q",
+    }
+
+    def __init__(self, capacity=64):
+        self.capacity = 0
+        self.slots = {}
+        self._free = array("i")
+        self._grid = {}
+
+        for name, typecode in self.FIELDS.items():
+            setattr(self, name, array(typecode))
+        self._grow(capacity)
+
+        self._handlers = {
+            clientbound.Play.SpawnObject: self.spawn_object,
+            clientbound.Play.SpawnMob: self.spawn_mob,
+            clientbound.Play.SpawnPlayer: self.spawn_player,
+            clientbound.Play.EntityRelativeMove: self.relative_move,
+            clientbound.Play.EntityLookAndRelativeMove: self.look_and_relative_move,
+            clientbound.Play.EntityLook: self.look,
+            clientbound.Play.EntityTeleport: self.teleport,
+            clientbound.Play.EntityVelocity: self.velocity,
+            clientbound.Play.DestroyEntities: self.destroy,
+        }
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.slots
+
+    @property
+    def message_types(self):
+        """Clientbound message types handled by :meth:`handle`."""
+        return set(self._handlers)
+
+    def slot(self, entity_id):
+        """Slot of entity in the arrays, None if not tracked."""
+        return self.slots.get(entity_id)
+
+    def position(self, entity_id):
+        slot = self.slots[entity_id]
+        return self.x[slot], self.y[slot], self.z[slot]
+
+    def add(self, entity_id, kind, entity_type, x, y, z, yaw=0.0, pitch=0.0):
+        """Start tracking entity, replacing any entity with the same ID."""
+        slot = self.slots.get(entity_id)
+        if slot is None:
+            if not self._free:
+                self._grow(self.capacity)
+            slot = self._free.pop()
+            self.slots[entity_id] = slot
+
+        self.ids[slot] = entity_id
+        self.kinds[slot] = kind
+        self.types[slot] = entity_type
+        self.x[slot] = x
+        self.y[slot] = y
+        self.z[slot] = z
+        self.velocity_x[slot] = self.velocity_y[slot] = self.velocity_z[slot] = 0.0
+        self.yaw[slot] = yaw
+        self.pitch[slot] = pitch
+        self.on_ground[slot] = 0
+        self._place(slot)
+        return slot
+
+    def remove(self, entity_id):
+        """Stop tracking entity and free its slot."""
+        slot = self.slots.pop(entity_id, None)
+        if slot is not None:
+            self._unplace(slot)
+            self.ids[slot] = -1
+            self._free.append(slot)
+
+    def clear(self):
+        """Stop tracking all entities."""
+        for entity_id in list(self.slots):
+            self.remove(entity_id)
+
+    def move(self, entity_id, dx, dy, dz):
+        """Move entity by a distance in blocks."""
+        slot = self.slots.get(entity_id)
+        if slot is not None:
+            self.x[slot] += dx
+            self.y[slot] += dy
+            self.z[slot] += dz
+            self._place(slot)
+
+    def within(self, position, radius, kind=None):
+        """IDs of entities within `radius` blocks of position, nearest first.
+
+        Only entities of `kind` are included, if given.
+        """
+        px, py, pz = position
+        grid, kinds = self._grid, self.kinds
+        x, y, z = self.x, self.y, self.z
+        limit = radius * radius
+
+        found = []
+        first_z = floor(pz - radius) >> 4
+        last_z = floor(pz + radius) >> 4
+        for cell_x in range(floor(px - radius) >> 4, (floor(px + radius) >> 4) + 1):
+            for cell_z in range(first_z, last_z + 1):
+                bucket = grid.get(cell_x << 32 | cell_z & 0xFFFFFFFF)
+                if not bucket:
+                    continue
+                for slot in bucket:
+                    if kind is not None and kinds[slot] != kind:
+                        continue
+                    dx, dy, dz = x[slot] - px, y[slot] - py, z[slot] - pz
+                    distance = dx * dx + dy * dy + dz * dz
+                    if distance <= limit:
+                        found.append((distance, slot))
+
+        found.sort()
+        return [self.ids[slot] for _, slot in found]
+
+    def nearest(self, position, kind=None):
+        """ID of entity nearest to position, of `kind` if given.
+
+        Searches rings of chunk columns outwards from the position, and
+        stops once no entity in further rings can be nearer. Returns
+        None if there is no such entity.
+        """
+        px, py, pz = position
+        grid, kinds = self._grid, self.kinds
+        x, y, z = self.x, self.y, self.z
+        cell_x, cell_z = floor(px) >> 4, floor(pz) >> 4
+
+        best, best_slot = math.inf, None
+        radius, exhaustive = 0, False
+        while not exhaustive:
+            if (2 * radius + 1) ** 2 > 4 * len(grid):
+                # Sparse grid, cheaper to check the remaining entities
+                candidates, exhaustive = self.slots.values(), True
+            else:
+                candidates = [
+                    slot
+                    for key in _ring(cell_x, cell_z, radius)
+                    for slot in grid.get(key, ())
+                ]
+
+            for slot in candidates:
+                if kind is not None and kinds[slot] != kind:
+                    continue
+                dx, dy, dz = x[slot] - px, y[slot] - py, z[slot] - pz
+                distance = dx * dx + dy * dy + dz * dz
+                if distance < best:
+                    best, best_slot = distance, slot
+
+            # Entities in further rings are at least this far horizontally
+            reach = radius * CELL_SIZE
+            if best <= reach * reach:
+                break
+            radius += 1
+
+        return None if best_slot is None else self.ids[best_slot]
+
+    def handle(self, message):
+        """Apply an entity message, return False if not an entity message."""
+        handler = self._handlers.get(message._type)
+        if handler is None:
+            return False
+        handler(message)
+        return True
+
+    # Item access is much faster than attributes of construct Containers.
+    # Spawns are rare, so they are decoded, but the frequent movement
+    # messages are read straight from the payload when not decoded yet.
+
+    def spawn_object(self, message):
+        slot = self.add(
+            message["entity_id"],
+            Kind.OBJECT,
+            message["type"],
+            message["x"],
+            message["y"],
+            message["z"],
+            message["yaw"] * ANGLE_SCALE,
+            message["pitch"] * ANGLE_SCALE,
+        )
+        self._set_velocity(slot, message)
+
+    def spawn_mob(self, message):
+        slot = self.add(
+            message["entity_id"],
+            Kind.MOB,
+            message["type"],
+            message["x"],
+            message["y"],
+            message["z"],
+            message["yaw"] * ANGLE_SCALE,
+            message["pitch"] * ANGLE_SCALE,
+        )
+        self._set_velocity(slot, message)
+
+    def spawn_player(self, message):
+        self.add(
+            message["entity_id"],
+            Kind.PLAYER,
+            0,
+            message["x"],
+            message["y"],
+            message["z"],
+            message["yaw"] * ANGLE_SCALE,
+            message["pitch"] * ANGLE_SCALE,
+        )
+
+    def relative_move(self, message):
+        entity_id, dx, dy, dz, on_ground = _unpack(message, _RELATIVE_MOVE)
+        slot = self.slots.get(entity_id)
+        if slot is not None:
+            x, z = self.x, self.z
+            x[slot] += dx * MOVE_SCALE
+            self.y[slot] += dy * MOVE_SCALE
+            z[slot] += dz * MOVE_SCALE
+            self.on_ground[slot] = on_ground
+            # Inlined _cell(), most moves stay within a chunk column
+            cell = (floor(x[slot]) >> 4) << 32 | (floor(z[slot]) >> 4) & 0xFFFFFFFF
+            if cell != self.cells[slot]:
+                self._place(slot, cell)
+
+    def relative_moves(self, messages):
+        """Apply a batch of EntityRelativeMove messages."""
+        slots, x, y, z = self.slots, self.x, self.y, self.z
+        on_ground, cells, place = self.on_ground, self.cells, self._place
+        for message in messages:
+            entity_id, dx, dy, dz, grounded = _unpack(message, _RELATIVE_MOVE)
+            slot = slots.get(entity_id)
+            if slot is not None:
+                x[slot] += dx * MOVE_SCALE
+                y[slot] += dy * MOVE_SCALE
+                z[slot] += dz * MOVE_SCALE
+                on_ground[slot] = grounded
+                cell = (floor(x[slot]) >> 4) << 32 | (floor(z[slot]) >> 4) & 0xFFFFFFFF
+                if cell != cells[slot]:
+                    place(slot, cell)
+
+    def look_and_relative_move(self, message):
+        entity_id, dx, dy, dz, yaw, pitch, on_ground = _unpack(
+            message, _LOOK_AND_RELATIVE_MOVE
+        )
+        slot = self.slots.get(entity_id)
+        if slot is not None:
+            x, z = self.x, self.z
+            x[slot] += dx * MOVE_SCALE
+            self.y[slot] += dy * MOVE_SCALE
+            z[slot] += dz * MOVE_SCALE
+            self.yaw[slot] = yaw * ANGLE_SCALE
+            self.pitch[slot] = pitch * ANGLE_SCALE
+            self.on_ground[slot] = on_ground
+            cell = (floor(x[slot]) >> 4) << 32 | (floor(z[slot]) >> 4) & 0xFFFFFFFF
+            if cell != self.cells[slot]:
+                self._place(slot, cell)
+
+    def look(self, message):
+        entity_id, yaw, pitch, on_ground = _unpack(message, _LOOK)
+        slot = self.slots.get(entity_id)
+        if slot is not None:
+            self.yaw[slot] = yaw * ANGLE_SCALE
+            self.pitch[slot] = pitch * ANGLE_SCALE
+            self.on_ground[slot] = on_ground
+
+    def teleport(self, message):
+        entity_id, x, y, z, yaw, pitch, on_ground = _unpack(message, _TELEPORT)
+        slot = self.slots.get(entity_id)
+        if slot is not None:
+            self.x[slot] = x
+            self.y[slot] = y
+            self.z[slot] = z
+            self.yaw[slot] = yaw * ANGLE_SCALE
+            self.pitch[slot] = pitch * ANGLE_SCALE
+            self.on_ground[slot] = on_ground
+            self._place(slot)
+
+    def velocity(self, message):
+        entity_id, velocity_x, velocity_y, velocity_z = _unpack(message, _VELOCITY)
+        slot = self.slots.get(entity_id)
+        if slot is not None:
+            self.velocity_x[slot] = velocity_x * VELOCITY_SCALE
+            self.velocity_y[slot] = velocity_y * VELOCITY_SCALE
+            self.velocity_z[slot] = velocity_z * VELOCITY_SCALE
+
+    def destroy(self, message):
+        for entity_id in message["entity_ids"]:
+            self.remove(entity_id)
+
+    def _set_velocity(self, slot, message):
+        # Spawned entities, from decoded messages
+        self.velocity_x[slot] = message["velocity_x"] * VELOCITY_SCALE
+        self.velocity_y[slot] = message["velocity_y"] * VELOCITY_SCALE
+        self.velocity_z[slot] = message["velocity_z"] * VELOCITY_SCALE
+
+    def _place(self, slot, cell=None):
+        """Move entity to the bucket of its current position."""
+        if cell is None:
+            cell = _cell(self.x[slot], self.z[slot])
+        if cell != self.cells[slot]:
+            self._unplace(slot)
+            bucket = self._grid.get(cell)
+            if bucket is None:
+                bucket = self._grid[cell] = set()
+            bucket.add(slot)
+            self.cells[slot] = cell
+
+    def _unplace(self, slot):
+        cell = self.cells[slot]
+        if cell != NO_CELL:
+            bucket = self._grid[cell]
+            bucket.discard(slot)
+            if not bucket:
+                del self._grid[cell]
+            self.cells[slot] = NO_CELL
+
+    def _grow(self, amount):
+        """Add `amount` free slots to all arrays."""
+        amount = max(amount, 1)
+        for name, typecode in self.FIELDS.items():
+            getattr(self, name).extend(array(typecode, [0]) * amount)
+        self.ids[self.capacity :] = array("i", [-1]) * amount
+        self.cells[self.capacity :] = array("q", [NO_CELL]) * amount
+        # Reuse lowest slots first to keep live entities packed
+        self._free.extend(range(self.capacity + amount - 1, self.capacity - 1, -1))
+        self.capacity += amount
@@ -0,0 +1,475 @@
+"""Terrain of the world as palette compressed chunk sections.
+
+Chunk sections of protocol 404 are sent as a palette and an array of
+indices into it, packed into 64bit longs with `bits` bits per block.
+Sections are kept in that form, as the palette and one byte per block,
+instead of as global block state IDs. Sections with too many different
+blocks for a palette keep global IDs, two bytes per block.
+
+Packed longs are unpacked without looping over blocks in Python: every
+8 consecutive blocks take exactly `bits` bytes of the bit stream, so
+each of the 8 positions is gathered from the whole section at once with
+strided slices, shifted with byte translation tables, and combined with
+big integer additions. Light is not stored.
+
+Targets, as measured by ``tests/bench_map.py``: decoding a palette
+section takes under 100 us and a global section under 200 us, and an
+overworld column of 5 sections holds about 24 KiB of memory.
+"""
+import sys
+from array import array
+from skeltal.protocol import varint
+
+SECTION_WIDTH = 16
+SECTION_VOLUME = SECTION_WIDTH**3
+SECTIONS = 16
+
+# Palettes are sent for at most 8 bits per block, and the server always
+# uses at least 4 bits. Otherwise the section has global block state IDs.
+MIN_BITS = 4
+MAX_PALETTE_BITS = 8
+GLOBAL_BITS = 14
+
+AIR = 0
+HEIGHT = SECTIONS * SECTION_WIDTH
+
+LIGHT_SIZE = SECTION_VOLUME // 2
+BIOMES_SIZE = 256 * 4
+
+_TABLES = {}
+
+
+def _table(shift, mask):
+    """Translation table shifting bytes right, or left if negative."""
+    key = (shift, mask)
+    table = _TABLES.get(key)
+    if table is None:
+        if shift >= 0:
+            table = bytes((value >> shift) & mask for value in range(256))
+        else:
+            table = bytes((value << -shift) & mask for value in range(256))
+        _TABLES[key] = table
+    return table
+
+
+def _add(lanes, size):
+    """Sum byte strings bytewise, assuming no byte overflows."""
+    if len(lanes) == 1:
+        return lanes[0]
+    total = sum(int.from_bytes(lane, "little") for lane in lanes)
+    return total.to_bytes(size, "little")
+
+
+def _swap_longs(data):
+    """Convert big-endian longs to a little-endian bit stream and back."""
+    values = array("Q")
+    values.frombytes(data)
+    values.byteswap()
+    return values.tobytes()
+
+
+def _typecode(bits):
+    return "B" if bits <= 8 else "H"
+
+
+def unpack(longs, bits, count=SECTION_VOLUME):
+    """Unpack `count` values of `bits` bits from packed big-endian longs.
+
+    Returns an array of unsigned bytes, or shorts for more than 8 bits.
+    `count` must be a multiple of 64, as for chunk sections.
+    """
+    if not 0 < bits <= 16:
+        raise ValueError(f"Unsupported bits per value: {bits}")
+
+    stream = _swap_longs(longs)
+    groups = count // 8
+    if len(stream) < groups * bits:
+        raise ValueError(f"Expected {groups * bits} bytes, got {len(stream)}")
+
+    width = 1 if bits <= 8 else 2
+    mask = (1 << bits) - 1
+    out = bytearray(count * width)
+
+    for position in range(8):
+        start = position * bits
+        for byte in range(width):
+            first, shift = divmod(start + 8 * byte, 8)
+            byte_mask = (mask >> (8 * byte)) & 0xFF
+            lanes = [stream[first::bits][:groups].translate(_table(shift, byte_mask))]
+            if 8 - shift < min(8, bits - 8 * byte):
+                # Value continues in the next byte of the stream
+                table = _table(shift - 8, byte_mask)
+                lanes.append(stream[first + 1 :: bits][:groups].translate(table))
+            out[position * width + byte :: 8 * width] = _add(lanes, groups)
+
+    values = array(_typecode(bits))
+    values.frombytes(out)
+    if width > 1 and sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def pack(values, bits):
+    """Pack unsigned values into big-endian longs, inverse of unpack()."""
+    if not 0 < bits <= 16:
+        raise ValueError(f"Unsupported bits per value: {bits}")
+
+    width = 1 if bits <= 8 else 2
+    values = array(_typecode(bits), values)
+    if width > 1 and sys.byteorder == "big":
+        values.byteswap()
+    data = values.tobytes()
+
+    count = len(values)
+    groups = count // 8
+    mask = (1 << bits) - 1
+    columns = [[] for _ in range(bits)]
+
+    for position in range(8):
+        start = position * bits
+        for byte in range(width):
+            first, shift = divmod(start + 8 * byte, 8)
+            byte_mask = (mask >> (8 * byte)) & 0xFF
+            lane = data[position * width + byte :: 8 * width]
+            if byte_mask != 0xFF:
+                lane = lane.translate(_table(0, byte_mask))
+            columns[first].append(lane.translate(_table(-shift, 0xFF)))
+            if shift and first + 1 < bits:
+                columns[first + 1].append(lane.translate(_table(8 - shift, 0xFF)))
+
+    stream = bytearray(groups * bits)
+    for column, lanes in enumerate(columns):
+        stream[column::bits] = _add(lanes, groups)
+
+    return _swap_longs(stream)
+
+
+class Section:
+    """16x16x16 blocks of a chunk column.
+
+    Blocks are indexed as ``(y * 16 + z) * 16 + x`` with coordinates
+    relative to the section. With a palette, `blocks` holds indices into
+    it, otherwise global block state IDs.
+    """
+
+    __slots__ = ("palette", "blocks")
+
+    def __init__(self, palette, blocks):
+        self.palette = palette
+        self.blocks = blocks
+
+    def __repr__(self):
+        kind = f"{len(self.palette)} states" if self.palette else "global"
+        return f"Section({kind})"
+
+    def __getitem__(self, index):
+        if self.palette is None:
+            return self.blocks[index]
+        return self.palette[self.blocks[index]]
+
+    def __setitem__(self, index, state):
+        palette = self.palette
+        if palette is None:
+            self.blocks[index] = state
+            return
+
+        try:
+            self.blocks[index] = palette.index(state)
+        except ValueError:
+            if len(palette) < 1 << MAX_PALETTE_BITS:
+                palette.append(state)
+                self.blocks[index] = len(palette) - 1
+            else:
+                # Too many states for a palette, switch to global IDs
+                self.blocks = array("H", self.states())
+                self.palette = None
+                self.blocks[index] = state
+
+    @classmethod
+    def from_states(cls, states):
+        """Create section from block state IDs of all its blocks."""
+        palette = sorted(set(states))
+        if len(palette) > 1 << MAX_PALETTE_BITS:
+            return cls(None, array("H", states))
+        lookup = {state: idx for idx, state in enumerate(palette)}
+        return cls(palette, array("B", [lookup[state] for state in states]))
+
+    @property
+    def bits(self):
+        """Bits per block when sent over the protocol."""
+        if self.palette is None:
+            return GLOBAL_BITS
+        return max(MIN_BITS, (len(self.palette) - 1).bit_length())
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the block data."""
+        size = len(self.blocks) * self.blocks.itemsize
+        if self.palette is not None:
+            size += 8 * len(self.palette)
+        return size
+
+    def states(self):
+        """Block state IDs of all blocks in the section."""
+        if self.palette is None:
+            return list(self.blocks)
+        palette = self.palette
+        return [palette[idx] for idx in self.blocks]
+
+
+def read_section(data, offset=0, sky_light=True):
+    """Read chunk section from data at offset.
+
+    Returns tuple of the section and offset after it.
+    """
+    bits = data[offset]
+    offset += 1
+
+    palette = None
+    if bits <= MAX_PALETTE_BITS:
+        length, offset = varint.decode(data, offset)
+        palette, offset = varint.decode_many(data, length, offset)
+
+    length, offset = varint.decode(data, offset)
+    end = offset + 8 * length
+    if end > len(data):
+        raise ValueError("Chunk section ends before its block data")
+
+    blocks = unpack(bytes(data[offset:end]), bits)
+
+    offset = end + LIGHT_SIZE
+    if sky_light:
+        offset += LIGHT_SIZE
+
+    return Section(palette, blocks), offset
+
+
+def write_section(section, sky_light=True):
+    """Write chunk section with full light, inverse of read_section()."""
+    bits = section.bits
+    if section.palette is None:
+        header = bytes((bits,))
+    else:
+        header = (
+            bytes((bits,))
+            + varint.encode(len(section.palette))
+            + varint.encode_many(section.palette)
+        )
+
+    longs = pack(section.blocks, bits)
+    light = b"\xff" * LIGHT_SIZE * (2 if sky_light else 1)
+    return header + varint.encode(len(longs) // 8) + longs + light
+
+
+class Column:
+    """Chunk column of 16 sections stacked from y=0 up.
+
+    Sections which are not sent by the server, i.e. all air, are None.
+    """
+
+    __slots__ = ("x", "z", "sections")
+
+    def __init__(self, x, z, sections=None):
+        self.x = x
+        self.z = z
+        self.sections = sections or [None] * SECTIONS
+
+    def __repr__(self):
+        return f"Column({self.x}, {self.z})"
+
+    @property
+    def bit_mask(self):
+        """Bit mask of non-empty sections."""
+        return sum(1 << idx for idx, section in enumerate(self.sections) if section)
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the block data of all sections."""
+        return sum(section.nbytes for section in self.sections if section)
+
+    def load(self, bit_mask, data, full_chunk=True, sky_light=True):
+        """Load sections from ChunkData data."""
+        offset = 0
+        for idx in range(SECTIONS):
+            if bit_mask & (1 << idx):
+                self.sections[idx], offset = read_section(data, offset, sky_light)
+            elif full_chunk:
+                self.sections[idx] = None
+
+        if full_chunk:
+            offset += BIOMES_SIZE
+        if offset != len(data):
+            raise ValueError(f"Read {offset} bytes of chunk data, got {len(data)}")
+
+    def dump(self, sky_light=True):
+        """ChunkData data of all sections, with biomes."""
+        sections = (
+            write_section(section, sky_light) for section in self.sections if section
+        )
+        return b"".join(sections) + bytes(BIOMES_SIZE)
+
+
+class World:
+    """Chunk columns loaded by the server, keyed by chunk coordinates.
+
+    Sky light is sent only in dimensions with a sky, which changes how
+    chunk sections are laid out, see :meth:`set_dimension`.
+    """
+
+    def __init__(self, sky_light=True):
+        self.sky_light = sky_light
+        self.dimension = None
+        self.columns = {}
+        self._watchers = []
+
+    def __len__(self):
+        return len(self.columns)
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the block data of all columns."""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def column(self, x, z):
+        """Chunk column at chunk coordinates, or None if not loaded."""
+        return self.columns.get((x, z))
+
+    def watch(self, callback):
+        """Call ``callback(chunk_x, chunk_z, y)`` when blocks change.
+
+        `y` is the block height of a changed block, or None when the
+        whole column was loaded or unloaded.
+        """
+        self._watchers.append(callback)
+
+    def _changed(self, chunk_x, chunk_z, y=None):
+        for callback in self._watchers:
+            callback(chunk_x, chunk_z, y)
+
+    def set_dimension(self, dimension):
+        """Switch to a dimension of JoinGame or Respawn, e.g. "Nether".
+
+        Unloads all columns if the dimension changed, and returns whether
+        it did. Only the overworld has sky light.
+        """
+        if dimension == self.dimension:
+            return False
+        self.dimension = dimension
+        self.sky_light = dimension == "Overworld"
+        self.clear()
+        return True
+
+    def clear(self):
+        """Unload all columns."""
+        columns, self.columns = self.columns, {}
+        if self._watchers:
+            for x, z in columns:
+                self._changed(x, z)
+
+    def load_chunk(self, message):
+        """Load or update column from a ChunkData message."""
+        key = (message.x, message.z)
+        column = self.columns.get(key)
+        if column is None:
+            if not message.full_chunk:
+                return None
+            column = Column(message.x, message.z)
+
+        column.load(message.bit_mask, message.data, message.full_chunk, self.sky_light)
+        self.columns[key] = column
+        if self._watchers:
+            self._changed(message.x, message.z)
+        return column
+
+    def unload_chunk(self, message):
+        """Forget column of an UnloadChunk message."""
+        if self.columns.pop((message.x, message.z), None) is not None:
+            if self._watchers:
+                self._changed(message.x, message.z)
+
+    def get_block(self, x, y, z):
+        """Block state ID at block coordinates, None if not loaded."""
+        column = self.columns.get((x >> 4, z >> 4))
+        if column is None:
+            return None
+        if not 0 <= y < HEIGHT:
+            return AIR
+        section = column.sections[y >> 4]
+        if section is None:
+            return AIR
+
+        # Inlined Section.__getitem__
+        block = section.blocks[(y & 15) << 8 | (z & 15) << 4 | (x & 15)]
+        palette = section.palette
+        return block if palette is None else palette[block]
+
+    def get_blocks(self, coords):
+        """Block state IDs at many block coordinates.
+
+        Takes a flat sequence of coordinates, e.g. an array of
+        ``x0, y0, z0, x1, y1, z1, ...``. Returns an array of state IDs,
+        with -1 where the chunk is not loaded.
+        """
+        columns = self.columns
+        result = array("i", bytes(4 * (len(coords) // 3)))
+
+        # Consecutive coordinates tend to fall in the same section
+        last_x = last_y = last_z = None
+        column = blocks = palette = None
+        values = iter(coords)
+        for idx, (x, y, z) in enumerate(zip(values, values, values)):
+            if x >> 4 != last_x or y >> 4 != last_y or z >> 4 != last_z:
+                last_x, last_y, last_z = x >> 4, y >> 4, z >> 4
+                column = columns.get((last_x, last_z))
+                section = None
+                if column is not None and 0 <= y < HEIGHT:
+                    section = column.sections[last_y]
+                if section is not None:
+                    blocks, palette = section.blocks, section.palette
+                else:
+                    blocks = palette = None
+
+            if blocks is not None:
+                block = blocks[(y & 15) << 8 | (z & 15) << 4 | (x & 15)]
+                result[idx] = block if palette is None else palette[block]
+            elif column is None:
+                result[idx] = -1
+
+        return result
+
+    def set_block(self, x, y, z, state):
+        """Change block at block coordinates, if its chunk is loaded."""
+        column = self.columns.get((x >> 4, z >> 4))
+        if column is None or not 0 <= y < HEIGHT:
+            return
+
+        section = column.sections[y >> 4]
+        if section is None:
+            if state == AIR:
+                return
+            section = Section([AIR], array("B", bytes(SECTION_VOLUME)))
+            column.sections[y >> 4] = section
+
+        section[(y & 15) << 8 | (z & 15) << 4 | (x & 15)] = state
+        if self._watchers:
+            self._changed(x >> 4, z >> 4, y)
+
+    def block_change(self, message):
+        """Apply a BlockChange message in place."""
+        # Item access is much faster than attributes of construct Containers
+        location = message["location"]
+        self.set_block(location["x"], location["y"], location["z"], message["block_id"])
+
+    def multi_block_change(self, message):
+        """Apply a MultiBlockChange message in place."""
+        base_x = message["chunk_x"] << 4
+        base_z = message["chunk_z"] << 4
+        set_block = self.set_block
+        for record in message["records"]:
+            horizontal = record["horizontal"]
+            set_block(
+                base_x | horizontal >> 4,
+                record["y"],
+                base_z | horizontal & 15,
+                record["block_id"],
+            )
@@ -48,6 +48,17 @@ def test(ctx):
     ctx.run("poetry run pytest -v tests/", echo=True)
 
 
+@task(install)
+def bench(ctx, only="", output="", compare="", tolerance=10.0):
+    """Run benchmarks, and compare their results with a previous run."""
+    args = only.replace(",", " ").split()
+    if output:
+        args += ["--output", output]
+    if compare:
+        args += ["--compare", compare, "--tolerance", str(tolerance)]
+    ctx.run(f"poetry run python tests/benchmarks.py {' '.join(args)}", echo=True)
+
+
 @task(install)
 def run(ctx):
     """Start skeltal."""
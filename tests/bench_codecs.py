@@ -0,0 +1,107 @@
+"""Benchmark of interpreted versus compiled packet codecs.
+
+Compares construct's interpreted structs with the codec registry for
+JoinGame and KeepAlive, and the construct message containers with the
+``serverbound.build`` fast path, which is also timed on a larger payload
+at several compression thresholds. Run with
+``python tests/bench_codecs.py``.
+"""
+import random
+import timeit
+from construct import Container
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.codecs import CLIENTBOUND, SERVERBOUND
+from skeltal.protocol.state import State
+
+JOIN_GAME = Container(
+    entity_id=42,
+    game_mode="Survival",
+    dimension="Overworld",
+    difficulty="Normal",
+    max_players=20,
+    level_type="default",
+    reduced_debug_info=False,
+)
+
+# Disabled, always compressed, and compressed above the payload or not
+THRESHOLDS = (-1, 0, 256, 1024)
+
+
+def _container_build(threshold, packet_id, data):
+    """Original construct based serverbound.build()."""
+    fields = Container(packet_id=packet_id, data=data)
+    if threshold >= 0:
+        size = serverbound.VarInt.size(packet_id) + len(data)
+        if size >= threshold:
+            data = serverbound.CompressedData.build(fields)
+            fields = Container(data_length=size, data=data)
+            return serverbound.AboveThresholdMessage.build(fields)
+        return serverbound.BelowThresholdMessage.build(fields)
+    return serverbound.UncompressedMessage.build(fields)
+
+
+def _cases():
+    join_game = clientbound.JoinGame.build(JOIN_GAME)
+    keepalive = Container(id=123456789)
+    keepalive_data = clientbound.KeepAlive.build(keepalive)
+
+    join_codec = CLIENTBOUND[(State.PLAY, clientbound.Play.JoinGame)]
+    keepalive_codec = CLIENTBOUND[(State.PLAY, clientbound.Play.KeepAlive)]
+    response_codec = SERVERBOUND[(State.PLAY, serverbound.Play.KeepAlive)]
+
+    yield "JoinGame.parse", (
+        lambda: clientbound.JoinGame.parse(join_game),
+        lambda: join_codec.parse(join_game),
+    )
+    yield "KeepAlive.parse", (
+        lambda: clientbound.KeepAlive.parse(keepalive_data),
+        lambda: keepalive_codec.parse(keepalive_data),
+    )
+    yield "KeepAlive.build", (
+        lambda: serverbound.KeepAlive.build(keepalive),
+        lambda: response_codec.build(keepalive),
+    )
+
+    for name, threshold, data in (
+        ("UncompressedMessage", -1, keepalive_data),
+        ("BelowThresholdMessage", 256, keepalive_data),
+        ("AboveThresholdMessage", 256, bytes(1024)),
+    ):
+        yield f"{name}.build", (
+            lambda t=threshold, d=data: _container_build(t, 0x0E, d),
+            lambda t=threshold, d=data: serverbound.build(t, 0x0E, d),
+        )
+
+
+def run(number=2000, repeat=5):
+    """Return per-call cost in microseconds, interpreted and compiled."""
+    results = {}
+    for name, (interpreted, compiled) in _cases():
+        assert interpreted() == compiled()
+        for kind, func in (("interpreted", interpreted), ("compiled", compiled)):
+            best = min(timeit.repeat(func, number=number, repeat=repeat))
+            results[f"codecs.{name}.{kind}"] = best / number * 1e6
+
+    # Somewhat compressible, like most packets large enough to compress
+    rng = random.Random(404)
+    payload = bytes(rng.randrange(16) for _ in range(512))
+    for threshold in THRESHOLDS:
+        best = min(
+            timeit.repeat(
+                lambda t=threshold: serverbound.build(t, 0x0E, payload),
+                number=number,
+                repeat=repeat,
+            )
+        )
+        results[f"codecs.serverbound.build.{threshold}"] = best / number * 1e6
+    return results
+
+
+def main():
+    results = run()
+    for name, value in results.items():
+        print(f"{name:<48} {value:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Throughput and latency comparison of the connection engines.
+
+A loopback server in a separate process logs the bot in and then
+measures keepalive round-trips, first one at a time (latency) and then
+as a single burst (throughput). Run with ``python tests/bench_connection.py``.
+"""
+import multiprocessing
+import socket
+import statistics
+import threading
+import time
+from construct import Container
+from skeltal.bot import Bot, ENGINES
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.framing import FrameBuffer
+
+# Metrics where higher is better, by suffix
+HIGHER = ("per_send",)
+
+THRESHOLD = 256
+
+
+def _read(conn, buffer, threshold):
+    while True:
+        frame = buffer.next_frame(threshold)
+        if frame is not None:
+            return frame
+        if not buffer.recv_into(conn):
+            raise ConnectionError("Client disconnected")
+
+
+def _send(conn, packet_id, struct, **fields):
+    conn.sendall(serverbound.build(THRESHOLD, packet_id, struct.build(fields)))
+
+
+def _keepalive(conn, idx):
+    _send(conn, clientbound.Play.KeepAlive, clientbound.KeepAlive, id=idx)
+
+
+def serve(listener, pipe, pings, burst):
+    conn, _ = listener.accept()
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    buffer = FrameBuffer()
+
+    _read(conn, buffer, -1)  # Handshake
+    _read(conn, buffer, -1)  # LoginStart
+    compression = clientbound.SetCompression.build(Container(threshold=THRESHOLD))
+    conn.sendall(serverbound.build(-1, clientbound.Login.SetCompression, compression))
+    _send(
+        conn,
+        clientbound.Login.LoginSuccess,
+        clientbound.LoginSuccess,
+        uuid="00000000-0000-0000-0000-000000000000",
+        username="testuser",
+    )
+
+    rtts = []
+    for idx in range(pings):
+        start = time.perf_counter()
+        _keepalive(conn, idx)
+        _read(conn, buffer, THRESHOLD)
+        rtts.append(time.perf_counter() - start)
+
+    data = b"".join(
+        serverbound.build(
+            THRESHOLD,
+            clientbound.Play.KeepAlive,
+            clientbound.KeepAlive.build(Container(id=idx)),
+        )
+        for idx in range(burst)
+    )
+
+    # Send from another thread so that responses are read concurrently
+    start = time.perf_counter()
+    sender = threading.Thread(target=conn.sendall, args=(data,))
+    sender.start()
+    for _ in range(burst):
+        _read(conn, buffer, THRESHOLD)
+    elapsed = time.perf_counter() - start
+    sender.join()
+
+    conn.close()
+    pipe.send((rtts, elapsed))
+
+
+def measure(engine, pings=500, burst=5000):
+    listener = socket.create_server(("127.0.0.1", 0))
+    reader, writer = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(
+        target=serve, args=(listener, writer, pings, burst), daemon=True
+    )
+    server.start()
+
+    bot = Bot("127.0.0.1", listener.getsockname()[1], engine=engine)
+    try:
+        bot.run_forever()
+    finally:
+        bot.shutdown()
+
+    rtts, elapsed = reader.recv()
+    server.join()
+    listener.close()
+
+    return {
+        f"connection.{engine}.rtt_median_us": statistics.median(rtts) * 1e6,
+        f"connection.{engine}.rtt_p99_us": sorted(rtts)[int(len(rtts) * 0.99)] * 1e6,
+        f"connection.{engine}.keepalives_per_sec": burst / elapsed,
+        f"connection.{engine}.packets_per_send": bot.client.stats.packets_per_send,
+    }
+
+
+def run():
+    results = {}
+    for engine in ENGINES:
+        results.update(measure(engine))
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Benchmark of tracking entities in arrays against objects per entity.
+
+Spawns entities and applies bursts of relative moves to them, through
+:class:`Entities` and through a dict of plain objects as a baseline.
+Measures memory per tracked entity and relative moves applied per
+second, from received payloads and from already decoded packets, and the
+latency of proximity queries at 1k and 10k entities against a linear
+scan. Run with ``python tests/bench_entity.py``.
+"""
+import random
+import timeit
+import tracemalloc
+from construct import Container
+from skeltal.protocol import clientbound
+from skeltal.protocol.codecs import CLIENTBOUND
+from skeltal.protocol.state import State
+from skeltal.world.entity import MOVE_SCALE, Entities, Kind
+
+# Metrics where higher is better, by suffix
+HIGHER = ("per_sec",)
+
+
+class Entity:
+    """Baseline entity as a plain object."""
+
+    def __init__(self, entity_id, kind, entity_type, x, y, z):
+        self.entity_id = entity_id
+        self.kind = kind
+        self.type = entity_type
+        self.x, self.y, self.z = x, y, z
+        self.velocity_x = self.velocity_y = self.velocity_z = 0.0
+        self.yaw = self.pitch = 0.0
+        self.on_ground = False
+
+
+def spawn_objects(amount):
+    return {idx: Entity(idx, Kind.MOB, 95, 0.0, 64.0, 0.0) for idx in range(amount)}
+
+
+def spawn_arrays(amount):
+    entities = Entities()
+    for idx in range(amount):
+        entities.add(idx, Kind.MOB, 95, 0.0, 64.0, 0.0)
+    return entities
+
+
+def memory_per_entity(spawn, amount):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities = spawn(amount)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del entities
+    return used / amount
+
+
+def moves(amount, entities, seed=404):
+    rng = random.Random(seed)
+    codec = CLIENTBOUND[(State.PLAY, clientbound.Play.EntityRelativeMove)]
+    payloads = [
+        codec.build(
+            Container(
+                entity_id=rng.randrange(entities),
+                delta_x=rng.randrange(-4096, 4096),
+                delta_y=0,
+                delta_z=rng.randrange(-4096, 4096),
+                on_ground=True,
+            )
+        )
+        for _ in range(amount)
+    ]
+    return codec, payloads
+
+
+def scan(entities, position, radius, kind=None):
+    """Reference linear scan for entities within radius."""
+    px, py, pz = position
+    found = []
+    for entity_id, slot in entities.slots.items():
+        if kind is not None and entities.kinds[slot] != kind:
+            continue
+        dx = entities.x[slot] - px
+        dy = entities.y[slot] - py
+        dz = entities.z[slot] - pz
+        distance = dx * dx + dy * dy + dz * dz
+        if distance <= radius * radius:
+            found.append((distance, entity_id))
+    found.sort()
+    return [entity_id for _, entity_id in found]
+
+
+def queries(amount, number=200, seed=404):
+    """Return query latency in microseconds with entities spread over
+    the chunks in view distance 8 around the origin, 1 in 20 a player.
+    """
+    rng = random.Random(seed)
+    entities = Entities()
+    for idx in range(amount):
+        kind = Kind.PLAYER if idx % 20 == 0 else Kind.MOB
+        x, z = rng.uniform(-136, 136), rng.uniform(-136, 136)
+        entities.add(idx, kind, 95, x, rng.uniform(40, 90), z)
+    positions = [
+        (rng.uniform(-128, 128), 64.0, rng.uniform(-128, 128)) for _ in range(number)
+    ]
+
+    results = {}
+    for name, func in (
+        ("within", lambda pos: entities.within(pos, 16)),
+        ("within_scan", lambda pos: scan(entities, pos, 16)),
+        ("nearest", lambda pos: entities.nearest(pos)),
+        ("nearest_player", lambda pos: entities.nearest(pos, Kind.PLAYER)),
+        ("nearest_scan", lambda pos: scan(entities, pos, 1000)[:1]),
+    ):
+        best = min(
+            timeit.repeat(lambda: [func(pos) for pos in positions], number=1, repeat=3)
+        )
+        results[f"entity.{amount}.{name}_us"] = best / number * 1e6
+    return results
+
+
+def run(entities=1000, amount=100000):
+    """Return bytes per entity, relative moves per second and query
+    latency.
+    """
+    results = {
+        "entity.objects.bytes_per_entity": memory_per_entity(spawn_objects, 10000),
+        "entity.arrays.bytes_per_entity": memory_per_entity(spawn_arrays, 10000),
+    }
+
+    codec, payloads = moves(amount, entities)
+    parsed = [codec.parse(payload) for payload in payloads]
+    objects = spawn_objects(entities)
+    arrays = spawn_arrays(entities)
+
+    def apply_objects(messages):
+        for message in messages:
+            entity = objects.get(message["entity_id"])
+            if entity is not None:
+                entity.x += message["delta_x"] * MOVE_SCALE
+                entity.y += message["delta_y"] * MOVE_SCALE
+                entity.z += message["delta_z"] * MOVE_SCALE
+                entity.on_ground = message["on_ground"]
+
+    def apply_arrays(messages):
+        for message in messages:
+            arrays.relative_move(message)
+
+    def received():
+        return (codec.message(payload) for payload in payloads)
+
+    for name, func in (
+        ("objects.decoded", lambda: apply_objects(parsed)),
+        ("arrays.decoded", lambda: apply_arrays(parsed)),
+        ("objects.received", lambda: apply_objects(codec.parse(p) for p in payloads)),
+        ("arrays.received", lambda: apply_arrays(received())),
+        ("arrays.received_batch", lambda: arrays.relative_moves(received())),
+    ):
+        best = min(timeit.repeat(func, number=1, repeat=3))
+        results[f"entity.{name}.moves_per_sec"] = amount / best
+
+    results.update(queries(1000))
+    results.update(queries(10000))
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark of publishing messages to subscribers.
+
+Publishes received EntityRelativeMove messages with one subscriber of that type,
+while increasing numbers of subscribers with predicates are registered
+on other types. Compares :class:`EventsRegistry` with a registry
+scanning a list of all subscribers. Run with
+``python tests/bench_events.py``.
+"""
+import timeit
+from construct import Container
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound
+from skeltal.protocol.codecs import CLIENTBOUND
+from skeltal.protocol.state import State
+
+# Metrics where higher is better, by suffix
+HIGHER = ("per_sec",)
+
+SUBSCRIBERS = (0, 100, 1000)
+
+
+class ScanningRegistry:
+    """Baseline checking the type of every subscriber."""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, event, callback, predicate=None):
+        self._subscribers.append((event, callback, predicate))
+
+    def publish(self, message):
+        message_type = message._type
+        for event, callback, predicate in self._subscribers:
+            if event is message_type and (predicate is None or predicate(message)):
+                callback(message)
+
+
+def registry(cls, others):
+    """Registry with a counter of moves and subscribers of other types."""
+    moves = []
+    instance = cls()
+    instance.subscribe(clientbound.Play.EntityRelativeMove, moves.append)
+    types = [
+        message_type
+        for message_type in clientbound.Play
+        if message_type is not clientbound.Play.EntityRelativeMove
+    ]
+    for idx in range(others):
+        instance.subscribe(
+            types[idx % len(types)], print, lambda msg: msg["entity_id"] == idx
+        )
+    return instance, moves
+
+
+def run(amount=100000):
+    """Return messages published per second."""
+    codec = CLIENTBOUND[(State.PLAY, clientbound.Play.EntityRelativeMove)]
+    fields = Container(entity_id=1, delta_x=0, delta_y=0, delta_z=0, on_ground=True)
+    message = codec.message(codec.build(fields))
+    results = {}
+    for name, cls in (("indexed", EventsRegistry), ("scan", ScanningRegistry)):
+        for others in SUBSCRIBERS:
+            instance, moves = registry(cls, others)
+            publish = instance.publish
+
+            def func():
+                for _ in range(amount):
+                    publish(message)
+
+            best = min(timeit.repeat(func, number=1, repeat=3))
+            assert len(moves) == 3 * amount
+            results[f"events.{name}.{others}.messages_per_sec"] = amount / best
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark of splitting a recorded burst of clientbound frames.
+
+Compares ``clientbound.parse_stream`` over a file-like stream, as used by
+the original receive path, with :class:`FrameBuffer` splitting the whole
+burst from one buffer. Run with ``python tests/bench_framing.py``.
+"""
+import io
+import random
+import timeit
+from construct import Container
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.framing import FrameBuffer
+
+
+def _random_bytes(rng, size):
+    return rng.getrandbits(8 * size).to_bytes(size, "little")
+
+
+def burst(threshold, amount=500, seed=404):
+    """Build a burst of frames resembling play state traffic."""
+    rng = random.Random(seed)
+    join_game = clientbound.JoinGame.build(
+        Container(
+            entity_id=1,
+            game_mode="Survival",
+            dimension="Overworld",
+            difficulty="Normal",
+            max_players=20,
+            level_type="default",
+            reduced_debug_info=False,
+        )
+    )
+
+    packets = []
+    for _ in range(amount):
+        kind = rng.random()
+        if kind < 0.7:
+            # Entity moves, looks and velocities
+            packet = (clientbound.Play.EntityRelativeMove, _random_bytes(rng, 10))
+        elif kind < 0.9:
+            # Sounds, particles and metadata
+            packet = (
+                clientbound.Play.Particle,
+                _random_bytes(rng, rng.randrange(20, 80)),
+            )
+        elif kind < 0.99:
+            packet = (clientbound.Play.KeepAlive, _random_bytes(rng, 8))
+        else:
+            # Chunk-sized payload, compresses well
+            packet = (clientbound.Play.ChunkData, bytes(rng.randrange(4000, 12000)))
+        packets.append(packet)
+
+    packets.append((clientbound.Play.JoinGame, join_game))
+    return b"".join(serverbound.build(threshold, *packet) for packet in packets)
+
+
+def run(repeat=5):
+    """Return per-frame split cost in microseconds for each receive path."""
+    results = {}
+    for name, threshold in (("uncompressed", -1), ("compressed", 256)):
+        data = burst(threshold)
+        amount = len(frames(data, threshold))
+
+        def stream():
+            source = io.BytesIO(data)
+            for _ in range(amount):
+                clientbound.parse_stream(threshold, source)
+
+        def buffer():
+            frames(data, threshold)
+
+        for path, func in (("parse_stream", stream), ("frame_buffer", buffer)):
+            best = min(timeit.repeat(func, number=1, repeat=repeat))
+            results[f"framing.{name}.{path}"] = best / amount * 1e6
+
+    return results
+
+
+def frames(data, threshold):
+    buffer = FrameBuffer()
+    buffer.feed(data)
+    result = []
+    while True:
+        frame = buffer.next_frame(threshold)
+        if frame is None:
+            return result
+        result.append(frame)
+
+
+def main():
+    results = run()
+    for name, value in results.items():
+        print(f"{name:<40} {value:8.2f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
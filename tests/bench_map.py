@@ -0,0 +1,182 @@
+"""Benchmark of decoding and storing chunk columns.
+
+Decodes a chunk column resembling overworld terrain, built with a fixed
+seed, as it would be received in ChunkData. Compares unpacking the
+packed block arrays with a per-block loop, and measures memory held per
+loaded column and the cost of block reads and changes. Run with
+``python tests/bench_map.py``.
+"""
+import random
+import timeit
+import tracemalloc
+from array import array
+from construct import Container
+from skeltal.world.map import (
+    SECTION_VOLUME,
+    Column,
+    Section,
+    World,
+    pack,
+    read_section,
+    unpack,
+    write_section,
+)
+
+AIR, STONE, DIRT, GRASS, BEDROCK, WATER = 0, 1, 10, 9, 33, 34
+ORES = [66, 67, 68, 69, 1591, 3379]
+
+
+def terrain(seed=404):
+    """Column with bedrock, stone and ores, dirt and grass up to y=68."""
+    rng = random.Random(seed)
+    column = Column(0, 0)
+    heights = [rng.randrange(62, 69) for _ in range(256)]
+
+    for idx in range(5):
+        states = []
+        for y in range(16 * idx, 16 * idx + 16):
+            for height in heights:
+                if y == 0:
+                    states.append(BEDROCK)
+                elif y < height - 4:
+                    ore = rng.random() < 0.02
+                    states.append(rng.choice(ORES) if ore else STONE)
+                elif y < height:
+                    states.append(DIRT)
+                elif y == height:
+                    states.append(GRASS)
+                elif y < 64:
+                    states.append(WATER)
+                else:
+                    states.append(AIR)
+        column.sections[idx] = Section.from_states(states)
+
+    return column
+
+
+def chunk(column):
+    return Container(
+        x=column.x,
+        z=column.z,
+        full_chunk=True,
+        bit_mask=column.bit_mask,
+        data=column.dump(),
+    )
+
+
+def unpack_loop(longs, bits):
+    """Reference per-block unpacking."""
+    values = array("Q")
+    values.frombytes(longs)
+    values.byteswap()
+    mask = (1 << bits) - 1
+    blocks = array("B" if bits <= 8 else "H", bytes(SECTION_VOLUME))
+    for idx in range(SECTION_VOLUME):
+        start = idx * bits
+        long, offset = divmod(start, 64)
+        value = values[long] >> offset
+        if offset + bits > 64:
+            value |= values[long + 1] << (64 - offset)
+        blocks[idx] = value & mask
+    return blocks
+
+
+def memory_per_column(message, amount=200):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    world = World()
+    for idx in range(amount):
+        message.x = idx
+        world.load_chunk(message)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / amount
+
+
+def blocks(message, amount=100000, seed=404):
+    """Return cost of reading and changing blocks in nanoseconds per block."""
+    world = World()
+    for x in range(-4, 4):
+        for z in range(-4, 4):
+            message.x, message.z = x, z
+            world.load_chunk(message)
+
+    rng = random.Random(seed)
+    coords = [
+        (rng.randrange(-64, 64), rng.randrange(0, 96), rng.randrange(-64, 64))
+        for _ in range(amount)
+    ]
+    # Boxes around random points, as scanned for collisions and paths
+    boxes = [
+        (x + dx, y + dy, z + dz)
+        for x, y, z in coords[: amount // 27]
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        for dz in (-1, 0, 1)
+    ]
+    flat = array("i", [value for coord in coords for value in coord])
+    flat_boxes = array("i", [value for coord in boxes for value in coord])
+    changes = [
+        Container(location=Container(x=x, y=y, z=z), block_id=STONE)
+        for x, y, z in coords
+    ]
+    get_block = world.get_block
+
+    def single(coords):
+        for x, y, z in coords:
+            get_block(x, y, z)
+
+    def apply():
+        for message in changes:
+            world.block_change(message)
+
+    results = {}
+    for name, func, size in (
+        ("get_block", lambda: single(coords), amount),
+        ("get_blocks", lambda: world.get_blocks(flat), amount),
+        ("get_block_boxes", lambda: single(boxes), len(boxes)),
+        ("get_blocks_boxes", lambda: world.get_blocks(flat_boxes), len(boxes)),
+        ("block_change", apply, amount),
+    ):
+        best = min(timeit.repeat(func, number=1, repeat=3))
+        results[f"map.world.{name}_ns"] = best / size * 1e9
+    return results
+
+
+def run(number=100):
+    """Return decode times in microseconds and memory per column in bytes."""
+    column = terrain()
+    message = chunk(column)
+    section = column.sections[2]
+    longs = pack(section.blocks, section.bits)
+
+    rng = random.Random(404)
+    noise = Section(None, array("H", [rng.randrange(8598) for _ in range(4096)]))
+    noise_data = write_section(noise)
+
+    benchmarks = (
+        ("column.decode", lambda: Column(0, 0).load(message.bit_mask, message.data)),
+        ("section.unpack", lambda: unpack(longs, section.bits)),
+        ("section.unpack_loop", lambda: unpack_loop(longs, section.bits)),
+        ("section.decode_global", lambda: read_section(noise_data)),
+    )
+
+    results = {}
+    for name, func in benchmarks:
+        best = min(timeit.repeat(func, number=number, repeat=3))
+        results[f"map.{name}_us"] = best / number * 1e6
+
+    results.update(blocks(message))
+    results["map.column.sections"] = bin(column.bit_mask).count("1")
+    results["map.column.block_bytes"] = column.nbytes
+    results["map.column.memory_bytes"] = memory_per_column(message)
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark of the overhead of measuring packets by type.
+
+Feeds the synthetic session of ``bench_replay`` through a connection
+tracking the world and entities, with packet metrics disabled and
+enabled, and with the flight recorder, and reports the cost of measuring
+per packet. Disabled, the connection receives packets exactly as without
+metrics. Run with ``python tests/bench_metrics.py``.
+"""
+import time
+from bench_replay import THRESHOLD, session
+from skeltal.bot import track
+from skeltal.events import EventsRegistry
+from skeltal.protocol.replay import ReplayConnection
+from skeltal.protocol.state import State
+from skeltal.world.entity import Entities
+from skeltal.world.map import World
+
+# Metrics where higher is better, by suffix
+HIGHER = ("per_sec",)
+
+
+def feed(frames, metrics, recorder=0):
+    registry = EventsRegistry()
+    track(registry, World(), Entities())
+    connection = ReplayConnection(registry, metrics=metrics, recorder=recorder)
+    connection.state(State.PLAY)
+    connection.compression = THRESHOLD
+
+    start = time.perf_counter()
+    for frame in frames:
+        connection.feed(frame)
+    return time.perf_counter() - start
+
+
+def run(repeat=7):
+    """Return packets per second and overhead of measuring them."""
+    frames = session()
+    results = {}
+    best = {}
+    # Alternate, so both see the same noise
+    for _ in range(repeat):
+        for name, metrics, recorder in (
+            ("disabled", False, 0),
+            ("enabled", True, 0),
+            ("recorder", False, 4096),
+        ):
+            elapsed = feed(frames, metrics, recorder)
+            best[name] = min(best.get(name, elapsed), elapsed)
+    for name, elapsed in best.items():
+        results[f"metrics.{name}.packets_per_sec"] = len(frames) / elapsed
+
+    overhead = best["enabled"] - best["disabled"]
+    results["metrics.overhead_ns_per_packet"] = overhead / len(frames) * 1e9
+    results["metrics.overhead_percent"] = overhead / best["disabled"] * 100
+    overhead = best["recorder"] - best["disabled"]
+    results["metrics.recorder_overhead_ns_per_packet"] = overhead / len(frames) * 1e9
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
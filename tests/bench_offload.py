@@ -0,0 +1,117 @@
+"""Benchmark of keepalive latency while large frames are being inflated.
+
+Two connections share one event loop. Each round, a large compressed
+chunk arrives on one of them and a keepalive on the other right after.
+Measures how long the keepalive waits until it's handled, with chunks
+inflated inline on the loop and offloaded to the thread pool. Run with
+``python tests/bench_offload.py``.
+"""
+import asyncio
+import random
+import statistics
+import time
+from collections import deque
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.aio import AsyncClientConnection
+from skeltal.protocol.state import State
+
+# Metrics where higher is better, by suffix
+HIGHER = ("per_sec",)
+
+THRESHOLD = 256
+
+
+class FakeTransport:
+    def is_closing(self):
+        return False
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+class BenchConnection(AsyncClientConnection):
+    """Connection fed from the benchmark instead of a socket."""
+
+    def __init__(self, **options):
+        super().__init__("localhost", 25565, EventsRegistry(), **options)
+        self.expected = deque()
+        self.latencies = []
+        self.chunk = None
+
+    def open(self):
+        self._loop = asyncio.get_running_loop()
+        self._closed = self._loop.create_future()
+        self.connection_made(FakeTransport())
+        self._compression = THRESHOLD
+        self.state(State.PLAY)
+
+    def feed(self, data):
+        buffer = self.get_buffer(len(data))
+        buffer[: len(data)] = data
+        self.buffer_updated(len(data))
+
+    def receive(self, packet_id, data):
+        if packet_id == clientbound.Play.KeepAlive:
+            self.latencies.append(time.perf_counter() - self.expected.popleft())
+        elif packet_id == clientbound.Play.ChunkData:
+            self.chunk.set_result(None)
+        super().receive(packet_id, data)
+
+
+def chunk(size=1 << 18, seed=404):
+    """Large chunk frame which compresses like real chunk data."""
+    rng = random.Random(seed)
+    payload = bytes(rng.choices(b"\x00\x00\x00\x11\x22\x33", k=size))
+    return serverbound.build(THRESHOLD, clientbound.Play.ChunkData, payload)
+
+
+async def measure(offload, rounds=500):
+    loop = asyncio.get_running_loop()
+    heavy = BenchConnection(offload=offload)
+    light = BenchConnection(offload=offload)
+    heavy.open()
+    light.open()
+    big = chunk()
+
+    def keepalive(idx):
+        data = idx.to_bytes(8, "big")
+        light.feed(serverbound.build(THRESHOLD, clientbound.Play.KeepAlive, data))
+
+    start = time.perf_counter()
+    for idx in range(rounds):
+        heavy.chunk = loop.create_future()
+        # Both packets arrive now, the chunk first
+        light.expected.append(time.perf_counter())
+        loop.call_soon(heavy.feed, big)
+        loop.call_soon(keepalive, idx)
+        await heavy.chunk
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(light.latencies)
+    return {
+        "latency_median_us": statistics.median(latencies) * 1e6,
+        "latency_p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+        "chunks_per_sec": rounds / elapsed,
+    }
+
+
+def run():
+    """Return keepalive latencies with chunks inflated inline and offloaded."""
+    results = {}
+    for name, offload in (("inline", -1), ("offload", 65536)):
+        for key, value in asyncio.run(measure(offload)).items():
+            results[f"offload.{name}.{key}"] = value
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Benchmark of planning paths over synthetic terrain.
+
+Builds 8x8 chunk columns of rolling hills with lakes and stone pillars,
+with a fixed seed, and plans paths between random surface blocks at
+increasing distances. Measures path length, nodes expanded and planning
+time with cold and warm walkability caches, and the cost of computing
+the masks of a section. Run with ``python tests/bench_path.py``.
+"""
+import math
+import random
+import time
+import timeit
+from skeltal.world.character import Pathfinder
+from skeltal.world.map import AIR, Column, Section, World
+
+STONE, DIRT, GRASS, WATER = 1, 10, 9, 34
+SEA_LEVEL = 62
+CHUNKS = 8
+DISTANCES = (8, 16, 32, 64, 100)
+
+# Metrics where higher is better, by suffix
+HIGHER = (".found",)
+
+
+def terrain(seed=404):
+    """World of rolling hills, return it and the surface heights."""
+    rng = random.Random(seed)
+    phases = [rng.uniform(0, 2 * math.pi) for _ in range(4)]
+    size = 16 * CHUNKS
+    heights = {}
+    for x in range(size):
+        for z in range(size):
+            height = 66 + 3 * math.sin(x / 9 + phases[0]) * math.cos(z / 11 + phases[1])
+            height += 2 * math.sin((x + z) / 17 + phases[2])
+            heights[x, z] = int(height)
+    pillars = {(rng.randrange(size), rng.randrange(size)) for _ in range(size * 4)}
+
+    world = World()
+    for chunk_x in range(CHUNKS):
+        for chunk_z in range(CHUNKS):
+            column = Column(chunk_x, chunk_z)
+            for section_y in range(5):
+                states = []
+                for y in range(16 * section_y, 16 * section_y + 16):
+                    for z in range(16 * chunk_z, 16 * chunk_z + 16):
+                        for x in range(16 * chunk_x, 16 * chunk_x + 16):
+                            height = heights[x, z]
+                            if y < height - 2:
+                                states.append(STONE)
+                            elif y < height:
+                                states.append(DIRT)
+                            elif y == height:
+                                states.append(GRASS)
+                            elif y <= SEA_LEVEL:
+                                states.append(WATER)
+                            elif (x, z) in pillars and y <= height + 3:
+                                states.append(STONE)
+                            else:
+                                states.append(AIR)
+                column.sections[section_y] = Section.from_states(states)
+            world.columns[chunk_x, chunk_z] = column
+    return world, heights
+
+
+def endpoints(pathfinder, heights, distance, amount, rng):
+    """Pairs of standable surface blocks about `distance` apart."""
+    size = 16 * CHUNKS
+    pairs = []
+    while len(pairs) < amount:
+        x, z = rng.randrange(size), rng.randrange(size)
+        angle = rng.uniform(0, 2 * math.pi)
+        gx = int(x + distance * math.cos(angle))
+        gz = int(z + distance * math.sin(angle))
+        if not (0 <= gx < size and 0 <= gz < size):
+            continue
+        start = (x, heights[x, z] + 1, z)
+        goal = (gx, heights[gx, gz] + 1, gz)
+        if pathfinder.standable(*start) and pathfinder.standable(*goal):
+            pairs.append((start, goal))
+    return pairs
+
+
+def plan(pathfinder, pairs):
+    """Return mean path length, nodes expanded and milliseconds."""
+    lengths, nodes, found = 0, 0, 0
+    started = time.perf_counter()
+    for start, goal in pairs:
+        search = pathfinder.search(start, goal)
+        while not search.step():
+            pass
+        nodes += search.expanded
+        if search.path:
+            found += 1
+            lengths += len(search.path)
+    elapsed = time.perf_counter() - started
+    return {
+        "path_length": lengths / max(found, 1),
+        "found": found / len(pairs),
+        "nodes": nodes / len(pairs),
+        "ms": elapsed / len(pairs) * 1e3,
+    }
+
+
+def run(amount=20, seed=404):
+    """Return planning results per path distance."""
+    world, heights = terrain(seed)
+    rng = random.Random(seed)
+    results = {}
+
+    pathfinder = Pathfinder(world)
+    pairs = {
+        distance: endpoints(pathfinder, heights, distance, amount, rng)
+        for distance in DISTANCES
+    }
+
+    def masks():
+        pathfinder.invalidate(0, 0)
+        for section_y in range(5):
+            pathfinder.masks(0, section_y, 0)
+
+    best = min(timeit.repeat(masks, number=20, repeat=3))
+    results["path.section_masks_us"] = best / 20 / 5 * 1e6
+
+    for distance in DISTANCES:
+        cold = Pathfinder(world)
+        for name, value in plan(cold, pairs[distance]).items():
+            results[f"path.{distance}.{name}"] = value
+        results[f"path.{distance}.warm_ms"] = plan(cold, pairs[distance])["ms"]
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark of selectable queue put/get throughput.
+
+A producer thread puts items while the consumer waits on the queue with
+select() and takes them out, one at a time from :class:`SelectQueue`
+and in batches from :class:`WakeupQueue`. Run with
+``python tests/bench_queue.py``.
+"""
+import select
+import threading
+import time
+from skeltal.protocol.queue import SelectQueue, WakeupQueue
+
+
+def _select_queue_consumer(queue, amount):
+    received = 0
+    while received < amount:
+        select.select([queue], [], [])
+        for _ in range(queue.qsize()):
+            queue.get()
+            queue.task_done()
+            received += 1
+
+
+def _wakeup_queue_consumer(queue, amount):
+    received = 0
+    while received < amount:
+        select.select([queue], [], [])
+        received += len(queue.drain())
+
+
+def measure(queue, consumer, amount):
+    def produce():
+        for idx in range(amount):
+            queue.put(idx)
+
+    producer = threading.Thread(target=produce)
+    start = time.perf_counter()
+    producer.start()
+    consumer(queue, amount)
+    elapsed = time.perf_counter() - start
+    producer.join()
+    queue.close()
+    return amount / elapsed
+
+
+def run(amount=100000):
+    """Return items per second through each queue."""
+    return {
+        "queue.select_queue.items_per_sec": measure(
+            SelectQueue(), _select_queue_consumer, amount
+        ),
+        "queue.wakeup_queue.items_per_sec": measure(
+            WakeupQueue(), _wakeup_queue_consumer, amount
+        ),
+    }
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
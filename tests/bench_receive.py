@@ -0,0 +1,94 @@
+"""Benchmark of the per-packet receive path in play state.
+
+Feeds a recorded burst of frames through a connection without a socket,
+once parsing every packet up front as before, once delivering lazy
+messages and once ignoring chunk data. Run with ``python tests/bench_receive.py``.
+"""
+import random
+import timeit
+from bench_framing import burst
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.codecs import CLIENTBOUND
+from skeltal.protocol.connection import BaseConnection
+from skeltal.protocol.state import State
+
+
+class BenchConnection(BaseConnection):
+    """Connection which discards outgoing packets."""
+
+    is_connected = True
+    is_running = True
+
+    def __init__(self, threshold, ignore=()):
+        super().__init__("localhost", 25565, EventsRegistry())
+        self._compression = threshold
+        self.ignore(State.PLAY, *ignore)
+        self.state(State.PLAY)
+
+    def feed(self, data):
+        self._buffer.feed(data)
+        self._receive_frames()
+
+    def _write(self, packet_id, data):
+        pass
+
+
+class EagerConnection(BenchConnection):
+    """Connection which parses every packet before handling it."""
+
+    def receive(self, packet_id, data):
+        codec = CLIENTBOUND[(self._state, packet_id)]
+        message = codec.parse(data)
+        message._type = codec.type
+        self._handler.send(message)
+
+
+def chunks(threshold, amount=50, seed=404):
+    """Build a burst of chunk sized frames which compress like real chunks."""
+    rng = random.Random(seed)
+    packets = []
+    for _ in range(amount):
+        payload = bytes(rng.choices(b"\x00\x00\x00\x11\x22\x33", k=16384))
+        packets.append(
+            serverbound.build(threshold, clientbound.Play.ChunkData, payload)
+        )
+    return b"".join(packets)
+
+
+def run(repeat=5):
+    """Return receive cost per packet in microseconds."""
+    results = {}
+    bursts = (
+        ("uncompressed", -1, burst(-1)),
+        ("compressed", 256, burst(256)),
+        ("chunks", 256, chunks(256)),
+    )
+    for name, threshold, data in bursts:
+        variants = (
+            ("eager", EagerConnection, ()),
+            ("lazy", BenchConnection, ()),
+            ("ignore_chunks", BenchConnection, (clientbound.Play.ChunkData,)),
+        )
+        for kind, cls, ignore in variants:
+            connection = cls(threshold, ignore)
+            connection.feed(data)  # Compile codecs
+            amount = connection.stats.packets_rx
+
+            best = min(
+                timeit.repeat(
+                    lambda c=connection: c.feed(data), number=1, repeat=repeat
+                )
+            )
+            results[f"receive.{name}.{kind}"] = best / amount * 1e6
+
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:8.2f} us/packet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark of replaying a capture as fast as possible.
+
+Writes a synthetic capture of a session in play state, with a fixed seed:
+loading 100 chunk columns of terrain, spawning 200 mobs and moving them
+around with keepalives in between. Replays it through the protocol
+handlers alone and while tracking the world and entities, and measures
+the cost of capturing frames. Run with ``python tests/bench_replay.py``.
+"""
+import os
+import random
+import tempfile
+import time
+from bench_map import chunk, terrain
+from construct import Container
+from skeltal.bot import track
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.capture import RX, CaptureReader, CaptureWriter
+from skeltal.protocol.replay import ReplayConnection, replay
+from skeltal.protocol.state import State
+from skeltal.world.entity import Entities
+from skeltal.world.map import World
+
+# Metrics where higher is better, by suffix
+HIGHER = ("per_sec",)
+
+THRESHOLD = 256
+Play = clientbound.Play
+
+
+def packet(message_type, **fields):
+    data = getattr(clientbound, message_type.name).build(Container(fields))
+    return serverbound.build(THRESHOLD, message_type, data)
+
+
+def session(columns=100, mobs=200, moves=20000, seed=404):
+    """Return frames of a session in play state."""
+    rng = random.Random(seed)
+    frames = []
+
+    message = chunk(terrain(seed))
+    message.block_entity_count, message.block_entities = 0, b""
+    for idx in range(columns):
+        message.x, message.z = idx % 10, idx // 10
+        data = clientbound.ChunkData.build(message)
+        frames.append(serverbound.build(THRESHOLD, Play.ChunkData, data))
+
+    for entity_id in range(mobs):
+        frames.append(
+            packet(
+                Play.SpawnMob,
+                entity_id=entity_id,
+                uuid=bytes(16),
+                type=95,
+                x=rng.uniform(0, 160),
+                y=70.0,
+                z=rng.uniform(0, 160),
+                yaw=0,
+                pitch=0,
+                head_pitch=0,
+                velocity_x=0,
+                velocity_y=0,
+                velocity_z=0,
+                metadata=b"\xff",
+            )
+        )
+    for idx in range(moves):
+        if idx % 1000 == 0:
+            frames.append(packet(Play.KeepAlive, id=idx))
+        frames.append(
+            packet(
+                Play.EntityRelativeMove,
+                entity_id=rng.randrange(mobs),
+                delta_x=rng.randrange(-4096, 4096),
+                delta_y=0,
+                delta_z=rng.randrange(-4096, 4096),
+                on_ground=True,
+            )
+        )
+    return frames
+
+
+def capture(path, frames):
+    """Write frames to a capture, return seconds per frame."""
+    start = time.perf_counter()
+    with CaptureWriter(path) as writer:
+        for frame in frames:
+            writer.write(RX, State.PLAY, THRESHOLD, frame)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def run(repeat=3):
+    """Return frames replayed per second and capture cost."""
+    frames = session()
+    size = sum(len(frame) for frame in frames)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.cap")
+        results["replay.capture_us_per_frame"] = capture(path, frames) * 1e6
+
+        for name, tracked in (("protocol", False), ("world", True)):
+            best = None
+            for _ in range(repeat):
+                registry = EventsRegistry()
+                if tracked:
+                    world, entities = World(), Entities()
+                    track(registry, world, entities)
+                connection = ReplayConnection(registry)
+                connection.state(State.PLAY)
+                with CaptureReader(path) as reader:
+                    start = time.perf_counter()
+                    fed = replay(reader, connection)
+                    elapsed = time.perf_counter() - start
+                assert fed == len(frames)
+                best = elapsed if best is None else min(best, elapsed)
+
+            results[f"replay.{name}.frames_per_sec"] = len(frames) / best
+            results[f"replay.{name}.mb_per_sec"] = size / best / 1e6
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
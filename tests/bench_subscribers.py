@@ -0,0 +1,78 @@
+"""Benchmark of publishing to a slow subscriber.
+
+The subscriber takes half a millisecond per message, like one writing
+to a database. Measures how long publishing keeps the connection busy
+per message when the subscriber is called inline and when it's queued
+for a thread pool with each overflow policy, and how many messages the
+queue dropped. Run with ``python tests/bench_subscribers.py``.
+"""
+import time
+from construct import Container
+from skeltal.events import EventsRegistry, Overflow, ThreadSubscriber
+from skeltal.protocol import clientbound
+from skeltal.protocol.codecs import CLIENTBOUND
+from skeltal.protocol.state import State
+
+
+def slow(message):
+    time.sleep(0.0005)
+
+
+def run(amount=2000, interval=0.0002):
+    """Return publish time in microseconds per message and drops."""
+    codec = CLIENTBOUND[(State.PLAY, clientbound.Play.EntityRelativeMove)]
+    messages = [
+        codec.message(
+            codec.build(
+                Container(
+                    entity_id=idx % 50, delta_x=1, delta_y=0, delta_z=0, on_ground=True
+                )
+            )
+        )
+        for idx in range(amount)
+    ]
+
+    results = {}
+    for name, subscriber in (
+        ("inline", slow),
+        ("block", ThreadSubscriber(slow, maxsize=256, overflow=Overflow.BLOCK)),
+        ("drop_oldest", ThreadSubscriber(slow, maxsize=256)),
+        (
+            "coalesce_latest",
+            ThreadSubscriber(
+                slow,
+                maxsize=256,
+                overflow=Overflow.COALESCE_LATEST,
+                key=lambda message: message["entity_id"],
+            ),
+        ),
+    ):
+        registry = EventsRegistry()
+        registry.subscribe(clientbound.Play.EntityRelativeMove, subscriber)
+
+        # Messages arrive spread out, as over a connection
+        busy = 0.0
+        for message in messages:
+            start = time.perf_counter()
+            registry.publish(message)
+            busy += time.perf_counter() - start
+            time.sleep(interval)
+
+        results[f"subscribers.{name}.publish_us"] = busy / amount * 1e6
+        if name != "inline":
+            results[f"subscribers.{name}.dropped"] = (
+                subscriber.stats.dropped + subscriber.stats.coalesced
+            )
+            results[f"subscribers.{name}.max_depth"] = subscriber.stats.max_depth
+            while subscriber.stats.depth:
+                time.sleep(0.01)
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark of a swarm of bots against the stand-in server.
+
+Runs :class:`skeltal.server.Server` in a separate process, so that only
+the bots use this process' CPU, and connects swarms of asyncio bots to
+it. Once all of them play, measures the packets they receive per second
+and the CPU time each packet costs them. Run with
+``python tests/bench_swarm.py``.
+"""
+import asyncio
+import multiprocessing
+import time
+from skeltal.protocol.state import State
+from skeltal.server import Server, Traffic
+from skeltal.swarm import Swarm
+
+# Metrics where higher is better, by suffix
+HIGHER = ("per_sec",)
+
+SWARMS = (10, 100)
+RATE = 200.0
+
+
+def serve(pipe, rate):
+    async def main():
+        server = Server("127.0.0.1", 0, Traffic(rate=rate))
+        await server.start()
+        pipe.send(server.port)
+        await asyncio.sleep(3600)
+
+    asyncio.run(main())
+
+
+async def measure(port, count, seconds):
+    swarm = Swarm("127.0.0.1", port, count, ramp=0)
+    runner = asyncio.create_task(swarm.run())
+    while sum(bot.client.current_state is State.PLAY for bot in swarm.bots) < count:
+        await asyncio.sleep(0.05)
+
+    swarm.summary()
+    await asyncio.sleep(seconds)
+    summary = swarm.summary()
+
+    swarm.shutdown()
+    await runner
+    return summary
+
+
+def run(seconds=3.0):
+    """Return packets per second and CPU time per packet of each swarm."""
+    reader, writer = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(target=serve, args=(writer, RATE), daemon=True)
+    server.start()
+    results = {}
+    try:
+        port = reader.recv()
+        for count in SWARMS:
+            summary = asyncio.run(measure(port, count, seconds))
+            results[f"swarm.{count}.packets_per_sec"] = summary["packets_per_sec"]
+            results[f"swarm.{count}.cpu_us_per_packet"] = (
+                summary["cpu_per_packet"] * 1e6
+            )
+            # Let the server notice the disconnects
+            time.sleep(0.1)
+    finally:
+        server.terminate()
+        server.join()
+    return results
+
+
+def main():
+    for name, value in run().items():
+        print(f"{name:<40} {value:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Micro-benchmark of VarInt decoding and encoding.
+
+Compares the per-value cost of the construct-based reference decoder
+(the original ``VarInt._parse`` implementation), the construct wrapper
+and the fast-path codec, and of encoding with the wrapper and the codec.
+Run with ``python tests/bench_types.py``.
+"""
+import io
+import random
+import timeit
+from itertools import count
+from construct import Construct, byte2int
+from construct.core import stream_read, singleton
+from skeltal.protocol import varint
+from skeltal.protocol.types import VarInt
+
+
+@singleton
+class ReferenceVarInt(Construct):
+    """Original byte-at-a-time VarInt parser."""
+
+    def _parse(self, stream, context, path):
+        result = 0
+
+        for idx in count():
+            read = byte2int(stream_read(stream, 1, path))
+            value = read & 0b01111111
+            result |= value << (7 * idx)
+
+            if not read & 0b10000000:
+                break
+            if idx >= 5:
+                raise ValueError("VarInt larger than expected")
+
+        if result & (1 << 31):
+            result -= 2**32
+
+        return result
+
+
+def _values(amount, seed=404):
+    rng = random.Random(seed)
+    return [
+        rng.choice((rng.randrange(128), rng.randrange(2**21))) for _ in range(amount)
+    ]
+
+
+def run(amount=10000, repeat=5):
+    """Return per-value cost in nanoseconds for each decoder and encoder."""
+    values = _values(amount)
+    data = varint.encode_many(values)
+
+    def reference():
+        stream = io.BytesIO(data)
+        for _ in range(amount):
+            ReferenceVarInt._parsereport(stream, None, "")
+
+    def wrapper():
+        stream = io.BytesIO(data)
+        for _ in range(amount):
+            VarInt._parsereport(stream, None, "")
+
+    def codec():
+        decode, offset = varint.decode, 0
+        for _ in range(amount):
+            _, offset = decode(data, offset)
+
+    def codec_many():
+        varint.decode_many(memoryview(data), amount)
+
+    def wrapper_build():
+        build = VarInt.build
+        for value in values:
+            build(value)
+
+    def encode():
+        encode = varint.encode
+        for value in values:
+            encode(value)
+
+    def encode_many():
+        varint.encode_many(values)
+
+    assert varint.decode_many(data, amount)[0] == values
+    assert b"".join(VarInt.build(value) for value in values) == data
+
+    results = {}
+    for name, func in (
+        ("reference", reference),
+        ("wrapper", wrapper),
+        ("decode", codec),
+        ("decode_many", codec_many),
+        ("wrapper_build", wrapper_build),
+        ("encode", encode),
+        ("encode_many", encode_many),
+    ):
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        results[f"varint.{name}"] = best / amount * 1e9
+
+    return results
+
+
+def main():
+    results = run()
+    for name, value in results.items():
+        encoder = name.endswith(("build", "encode", "encode_many"))
+        baseline = results["varint.wrapper_build" if encoder else "varint.reference"]
+        print(f"{name:<24} {value:8.1f} ns/value  {baseline / value:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Runs the benchmarks and reports their results as JSON.
+
+Each ``tests/bench_*.py`` module is run in a process of its own, by
+calling its ``run()``. The results are written along with the commit,
+interpreter and platform they were measured on, so that results of
+different commits can be compared::
+
+    python tests/benchmarks.py -o before.json
+    git checkout other
+    python tests/benchmarks.py -o after.json --compare before.json
+
+Benchmarks can be picked by name, e.g. ``types codecs connection``.
+Comparing exits with status 1 if a metric got worse by more than the
+tolerance, 2 if a benchmark failed.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+
+# Benchmark modules list metrics where higher is better by suffix in
+# HIGHER, lower is better for all others
+_WORKER = (
+    "import json, sys, {0}; results = {0}.run(); "
+    "higher = tuple(getattr({0}, 'HIGHER', ())); "
+    "json.dump({{'results': results, "
+    "'higher': [name for name in results if name.endswith(higher)]}}, sys.stdout)"
+)
+
+
+def available():
+    """Names of the benchmark modules, without their bench_ prefix."""
+    return sorted(path.stem[len("bench_") :] for path in HERE.glob("bench_*.py"))
+
+
+def _git(*args):
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def metadata():
+    """Where and on what the benchmarks ran."""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": None if status is None else bool(status),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def run_benchmark(name):
+    """Run a benchmark module in a new process.
+
+    Returns its results, and the names of those where higher is better.
+    """
+    module = f"bench_{name}"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, (str(ROOT), str(HERE), env.get("PYTHONPATH")))
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", _WORKER.format(module)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1:] or "failed")
+    output = json.loads(result.stdout)
+    return output["results"], output["higher"]
+
+
+def run(names):
+    """Return the report of running the named benchmarks."""
+    report = {
+        **metadata(),
+        "benchmarks": {},
+        "higher": {},
+        "errors": {},
+        "seconds": {},
+    }
+    for name in names:
+        print(f"Running {name}", file=sys.stderr, flush=True)
+        start = time.perf_counter()
+        try:
+            results, higher = run_benchmark(name)
+            report["benchmarks"][name] = results
+            report["higher"][name] = higher
+        except Exception as exc:  # pylint: disable=broad-except
+            report["errors"][name] = str(exc)
+            print(f"  failed: {exc}", file=sys.stderr)
+        report["seconds"][name] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def changes(baseline, report):
+    """Yield ``(metric, before, after, change)`` of metrics in both reports.
+
+    The change is relative, and positive when the metric got better, as
+    recorded in the report.
+    """
+    for name, results in report["benchmarks"].items():
+        before = baseline["benchmarks"].get(name, {})
+        higher = set(report.get("higher", {}).get(name, ()))
+        for metric, after in results.items():
+            if metric not in before:
+                continue
+            previous = before[metric]
+            if not previous:
+                change = 0.0 if after == previous else float("inf")
+            else:
+                change = (after - previous) / abs(previous)
+            if metric not in higher:
+                change = -change
+            yield metric, previous, after, change
+
+
+def compare(baseline, report, tolerance, out=sys.stderr):
+    """Print changes from the baseline, return the regressed metrics."""
+    print(
+        f"Comparing {report['commit'] or 'unknown'} "
+        f"with {baseline.get('commit') or 'unknown'}",
+        file=out,
+    )
+    regressions = []
+    for metric, before, after, change in changes(baseline, report):
+        flag = ""
+        if change < -tolerance:
+            flag = "  REGRESSION"
+            regressions.append(metric)
+        elif change > tolerance:
+            flag = "  improved"
+        print(
+            f"{metric:<48} {before:12.2f} {after:12.2f} {change:+8.1%}{flag}",
+            file=out,
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="NAME",
+        help=f"benchmarks to run, all by default: {', '.join(available())}",
+    )
+    parser.add_argument(
+        "-o", "--output", metavar="FILE", help="write results to FILE, not stdout"
+    )
+    parser.add_argument(
+        "-c", "--compare", metavar="FILE", help="compare with results in FILE"
+    )
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=10.0,
+        metavar="PERCENT",
+        help="change counted as a regression (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    names = args.names or available()
+    unknown = sorted(set(names) - set(available()))
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    # Read the baseline first, it might be the output file
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fd:
+            baseline = json.load(fd)
+
+    report = run(names)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fd:
+            json.dump(report, fd, indent=2)
+            fd.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if report["errors"]:
+        return 2
+    if baseline is not None and compare(baseline, report, args.tolerance / 100):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
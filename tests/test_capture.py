@@ -0,0 +1,105 @@
+import time
+from construct import Container
+from skeltal.bot import track
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.capture import RX, TX, CaptureReader, CaptureWriter
+from skeltal.protocol.replay import ReplayConnection, replay
+from skeltal.protocol.state import State
+from skeltal.world.entity import Entities
+from skeltal.world.map import Column, Section, World
+
+THRESHOLD = 64
+
+
+def session():
+    """Frames a server sends to log in and start playing."""
+    column = Column(3, -2)
+    column.sections[4] = Section.from_states([1, 2, 3, 4] * 1024)
+    data = column.dump()
+    chunk = Container(
+        x=3,
+        z=-2,
+        full_chunk=True,
+        bit_mask=column.bit_mask,
+        data=data,
+        block_entity_count=0,
+        block_entities=b"",
+    )
+    return [
+        serverbound.build(
+            -1, 0x03, clientbound.SetCompression.build({"threshold": 64})
+        ),
+        serverbound.build(
+            THRESHOLD,
+            0x02,
+            clientbound.LoginSuccess.build(Container(uuid="x", username="replay")),
+        ),
+        serverbound.build(THRESHOLD, 0x21, clientbound.KeepAlive.build({"id": 7})),
+        serverbound.build(THRESHOLD, 0x22, clientbound.ChunkData.build(chunk)),
+        serverbound.build(THRESHOLD, 0x21, clientbound.KeepAlive.build({"id": 8})),
+    ]
+
+
+def test_write_read(tmp_path):
+    path = tmp_path / "frames.cap"
+    with CaptureWriter(path) as writer:
+        writer.write(TX, None, -1, b"\x01\x00", timestamp=1.5)
+    # Appending doesn't repeat the file header
+    with CaptureWriter(path) as writer:
+        writer.write(RX, State.PLAY, 256, b"\x02\x00\x01", timestamp=2.5)
+    with open(path, "ab") as fd:
+        fd.write(b"\x00" * 10)
+
+    with CaptureReader(path) as reader:
+        records = [
+            (r.direction, r.state, r.threshold, r.timestamp, bytes(r.frame))
+            for r in reader
+        ]
+    assert records == [
+        (TX, None, -1, 1.5, b"\x01\x00"),
+        (RX, State.PLAY, 256, 2.5, b"\x02\x00\x01"),
+    ]
+
+
+def test_capture_and_replay(tmp_path):
+    path = tmp_path / "session.cap"
+    live = ReplayConnection(EventsRegistry(), capture=path)
+    live.state(State.LOGIN)
+    for frame in session():
+        assert live.feed(frame)
+    live.stop_capture()
+    assert live.current_state is State.PLAY
+
+    registry = EventsRegistry()
+    world, entities = World(), Entities()
+    track(registry, world, entities)
+    connection = ReplayConnection(registry)
+    with CaptureReader(path) as reader:
+        records = list(reader)
+        assert [record.direction for record in records] == [TX] + [RX] * 3 + [TX] + [
+            RX,
+            RX,
+            TX,
+        ]
+        assert records[1].threshold == -1 and records[2].threshold == THRESHOLD
+        assert replay(records, connection) == 5
+
+    assert connection.current_state is State.PLAY
+    assert connection.stats.keepalives == 2
+    assert connection.stats.packets_tx == live.stats.packets_tx == 3
+    assert world.get_block(3 * 16 + 1, 64, -2 * 16) == 2
+
+
+def test_replay_realtime(tmp_path):
+    path = tmp_path / "timed.cap"
+    frames = session()
+    with CaptureWriter(path) as writer:
+        writer.write(RX, State.LOGIN, -1, frames[0], timestamp=100.0)
+        writer.write(RX, State.LOGIN, THRESHOLD, frames[1], timestamp=100.1)
+        writer.write(RX, State.PLAY, THRESHOLD, frames[2], timestamp=100.2)
+
+    with CaptureReader(path) as reader:
+        start = time.perf_counter()
+        assert replay(reader, ReplayConnection(EventsRegistry()), True, 2.0) == 3
+        assert time.perf_counter() - start >= 0.1
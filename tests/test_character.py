@@ -0,0 +1,93 @@
+from skeltal.world.character import Pathfinder
+from skeltal.world.map import Column, World
+
+STONE, WATER = 1, 34
+FLOOR = 63
+
+
+def flat_world(size=2):
+    """Stone floor at y=63 over size x size columns from chunk 0, 0."""
+    world = World()
+    for chunk_x in range(size):
+        for chunk_z in range(size):
+            world.columns[(chunk_x, chunk_z)] = Column(chunk_x, chunk_z)
+    for x in range(16 * size):
+        for z in range(16 * size):
+            world.set_block(x, FLOOR, z, STONE)
+    return world
+
+
+def wall(world, x, height, z_range):
+    for z in z_range:
+        for y in range(FLOOR + 1, FLOOR + 1 + height):
+            world.set_block(x, y, z, STONE)
+
+
+def test_standable():
+    world = flat_world(1)
+    world.set_block(3, FLOOR + 2, 3, STONE)
+    world.set_block(4, FLOOR, 4, WATER)
+    pathfinder = Pathfinder(world)
+    assert pathfinder.standable(0, FLOOR + 1, 0)
+    assert not pathfinder.standable(0, FLOOR, 0)
+    assert not pathfinder.standable(0, FLOOR + 2, 0)
+    # No headroom, water below, and unloaded column
+    assert not pathfinder.standable(3, FLOOR + 1, 3)
+    assert not pathfinder.standable(4, FLOOR + 1, 4)
+    assert not pathfinder.standable(20, FLOOR + 1, 0)
+
+
+def test_straight_and_detour():
+    world = flat_world()
+    pathfinder = Pathfinder(world)
+    start, goal = (2, FLOOR + 1, 10), (20, FLOOR + 1, 10)
+    path = pathfinder.find(start, goal)
+    assert path[0] == start and path[-1] == goal
+    assert len(path) == 19
+
+    # A wall too high to jump, open at z=25, is invalidated and avoided
+    wall(world, 10, 2, range(0, 25))
+    assert not pathfinder.standable(10, FLOOR + 1, 10)
+    path = pathfinder.find(start, goal)
+    assert (10, FLOOR + 1, 25) in path
+    assert len(path) == 19 + 2 * 15
+
+
+def test_jump_and_drop():
+    world = flat_world()
+    pathfinder = Pathfinder(world)
+    wall(world, 10, 1, range(32))
+    path = pathfinder.find((5, FLOOR + 1, 5), (15, FLOOR + 1, 5))
+    assert (10, FLOOR + 2, 5) in path
+    assert len(path) == 11
+
+    # Drops of up to three blocks, but not four
+    for x in range(16):
+        for z in range(16):
+            world.set_block(x, FLOOR, z, 0)
+            world.set_block(x, FLOOR - 4, z, STONE)
+    assert pathfinder.find((16, FLOOR + 1, 5), (12, FLOOR - 3, 5)) is None
+    world.set_block(15, FLOOR - 3, 5, STONE)
+    path = pathfinder.find((16, FLOOR + 1, 5), (12, FLOOR - 3, 5))
+    assert path[:3] == [(16, FLOOR + 1, 5), (15, FLOOR - 2, 5), (14, FLOOR - 3, 5)]
+
+
+def test_resumable_search():
+    world = flat_world()
+    wall(world, 10, 2, range(0, 30))
+    pathfinder = Pathfinder(world)
+    start, goal = (2, FLOOR + 1, 2), (25, FLOOR + 1, 2)
+    expected = pathfinder.find(start, goal)
+
+    search = pathfinder.search(start, goal)
+    steps = 1
+    while not search.step(nodes=10):
+        steps += 1
+    assert steps > 10
+    assert search.path == expected
+
+    # Enclosed goal, and running out of nodes
+    assert pathfinder.find(start, (2, FLOOR + 5, 2)) is None
+    search = pathfinder.search(start, goal, max_nodes=20)
+    assert search.step() and search.path is None
+    assert search.expanded == 20
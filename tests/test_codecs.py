@@ -0,0 +1,81 @@
+import pytest
+from construct import Container
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.codecs import CLIENTBOUND, SERVERBOUND, Codec
+from skeltal.protocol.state import State
+
+JOIN_GAME = Container(
+    entity_id=42,
+    game_mode="Creative",
+    dimension="Nether",
+    difficulty="Hard",
+    max_players=20,
+    level_type="flat",
+    reduced_debug_info=True,
+)
+
+
+def test_registry_lookup():
+    codec = CLIENTBOUND[(State.PLAY, 0x25)]
+    assert codec.type is clientbound.Play.JoinGame
+    assert codec.struct is clientbound.JoinGame
+
+    codec = SERVERBOUND[(State.LOGIN, 0x00)]
+    assert codec.type is serverbound.Login.LoginStart
+
+
+def test_compiled_matches_interpreted():
+    codec = CLIENTBOUND[(State.PLAY, clientbound.Play.JoinGame)]
+    data = clientbound.JoinGame.build(JOIN_GAME)
+    assert codec.build(JOIN_GAME) == data
+    assert codec.parse(data) == clientbound.JoinGame.parse(data)
+    assert codec.compiled
+
+
+def test_fallback_to_interpreted():
+    codec = Codec(serverbound.Play.KeepAlive, serverbound.UncompressedMessage)
+    message = Container(packet_id=0x0E, data=b"\x00" * 8)
+    data = serverbound.UncompressedMessage.build(message)
+    assert codec.build(message) == data
+    assert not codec.compiled
+
+
+@pytest.mark.parametrize("threshold", [-1, 0, 16, 256])
+@pytest.mark.parametrize("packet_id", [0x00, 0x0E, 0x85])
+@pytest.mark.parametrize("size", [0, 8, 300])
+def test_build_matches_containers(threshold, packet_id, size):
+    data = (bytes(range(256)) * 2)[:size]
+    fields = Container(packet_id=packet_id, data=data)
+    if threshold < 0:
+        expected = serverbound.UncompressedMessage.build(fields)
+    elif len(serverbound.VarInt.build(packet_id)) + size >= threshold:
+        compressed = serverbound.CompressedData.build(fields)
+        expected = serverbound.AboveThresholdMessage.build(
+            Container(
+                data_length=len(serverbound.VarInt.build(packet_id)) + size,
+                data=compressed,
+            )
+        )
+    else:
+        expected = serverbound.BelowThresholdMessage.build(fields)
+
+    assert serverbound.build(threshold, packet_id, data) == expected
+
+
+def test_lazy_message_decodes_on_access():
+    codec = CLIENTBOUND[(State.PLAY, clientbound.Play.JoinGame)]
+    message = codec.message(memoryview(clientbound.JoinGame.build(JOIN_GAME)))
+    assert message._type is clientbound.Play.JoinGame
+    assert not message.is_decoded
+    assert message.entity_id == 42
+    assert message["level_type"] == "flat"
+    assert message.is_decoded
+
+
+def test_lazy_message_release():
+    codec = CLIENTBOUND[(State.PLAY, clientbound.Play.KeepAlive)]
+    buffer = bytearray(clientbound.KeepAlive.build(Container(id=7)))
+    message = codec.message(memoryview(buffer))
+    message.release()
+    buffer[:] = bytes(len(buffer))
+    assert message.id == 7
@@ -0,0 +1,126 @@
+import queue
+import pytest
+from construct import Container
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.codecs import LazyMessage
+from skeltal.protocol.connection import BaseConnection
+from skeltal.protocol.framing import FrameBuffer
+from skeltal.protocol.state import State
+
+PACKETS = [
+    (0x22, b"\x01" * 5000),
+    (0x21, b"\x00" * 8),
+    (0x22, b"\x02" * 5000),
+    (0x28, b"\x03" * 10),
+    (0x21, b"\x00" * 8),
+]
+
+
+class FakeConnection(BaseConnection):
+    """Connection without a transport, driven by the test."""
+
+    is_connected = True
+    is_running = True
+
+    def __init__(self, **options):
+        super().__init__("localhost", 25565, EventsRegistry(), **options)
+        self._compression = 256
+        self._state = State.PLAY
+        self.callbacks = queue.Queue()
+        self.received = []
+        self.sent = []
+
+    def receive(self, packet_id, data):
+        self.received.append((packet_id, bytes(data)))
+
+    def run_callbacks(self, until):
+        while not until():
+            self.callbacks.get(timeout=5)()
+
+    def _schedule_flush(self):
+        self._flush()
+
+    def _send_bytes(self, data):
+        self.sent.append(data)
+
+    def _call_soon_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+
+@pytest.mark.parametrize("offload", [-1, 1024])
+def test_receive_order(offload):
+    connection = FakeConnection(offload=offload)
+    data = b"".join(serverbound.build(256, *packet) for packet in PACKETS)
+    connection._buffer.feed(data[:7000])
+    assert connection._receive_frames()
+    connection._buffer.feed(data[7000:])
+    assert connection._receive_frames()
+    connection.run_callbacks(lambda: len(connection.received) == len(PACKETS))
+    assert connection.received == PACKETS
+
+
+@pytest.mark.parametrize("offload", [-1, 1024])
+@pytest.mark.parametrize("level", [-1, 1, 9])
+def test_send_order(offload, level):
+    connection = FakeConnection(offload=offload, compression_level=level)
+    for packet in PACKETS:
+        connection._write(*packet)
+    connection.run_callbacks(lambda: len(connection.sent) == len(PACKETS))
+
+    buffer = FrameBuffer()
+    buffer.feed(b"".join(connection.sent))
+    received = []
+    while True:
+        frame = buffer.next_frame(256)
+        if frame is None:
+            break
+        received.append((frame[0], bytes(frame[1])))
+    assert received == PACKETS
+    assert connection.stats.packets_tx == len(PACKETS)
+
+
+def test_ignore_unsubscribed():
+    connection = FakeConnection()
+    connection.ignore_unsubscribed()
+    data = b"".join(serverbound.build(256, *packet) for packet in PACKETS)
+
+    # KeepAlive is handled by the protocol, the rest has no subscribers
+    connection._buffer.feed(data)
+    assert connection._receive_frames()
+    assert connection.received == [PACKETS[1], PACKETS[4]]
+    assert connection.stats.packets_ignored == 3
+
+    connection.registry.subscribe(clientbound.Play.ChunkData, print)
+    connection._buffer.feed(data)
+    assert connection._receive_frames()
+    assert [packet_id for packet_id, _ in connection.received[2:]] == [
+        0x22,
+        0x21,
+        0x22,
+        0x21,
+    ]
+
+
+@pytest.mark.parametrize("metrics", [False, True])
+def test_release_retained(monkeypatch, metrics):
+    released = []
+    monkeypatch.setattr(LazyMessage, "release", lambda msg: released.append(msg._type))
+    connection = FakeConnection(metrics=metrics)
+    connection.state(State.PLAY)
+    retained = []
+    connection.registry.subscribe(clientbound.Play.ChatMessage, retained.append)
+    connection.registry.subscribe(clientbound.Play.TimeUpdate, lambda message: None)
+    if metrics:
+        receive = connection._receive_measured
+    else:
+        # FakeConnection overrides receive() to record frames
+        receive = BaseConnection.receive.__get__(connection)
+
+    chat = clientbound.ChatMessage.build(Container(json_data="{}", position=0))
+    for _ in range(2):
+        receive(clientbound.Play.ChatMessage, memoryview(bytearray(chat)))
+        receive(clientbound.Play.TimeUpdate, memoryview(bytearray(16)))
+    # Only messages a subscriber kept have their payload copied
+    assert released == [clientbound.Play.ChatMessage] * 2
+    assert len(retained) == 2
@@ -0,0 +1,176 @@
+import random
+import pytest
+from construct import Container
+from skeltal.protocol import clientbound
+from skeltal.protocol.codecs import CLIENTBOUND
+from skeltal.protocol.state import State
+from skeltal.world.entity import Entities, Kind
+
+UUID = bytes(16)
+
+
+def message(message_type, **fields):
+    """Message as received, built and parsed by the codec."""
+    codec = CLIENTBOUND[(State.PLAY, message_type)]
+    return codec.message(codec.build(Container(fields)))
+
+
+def spawn_mob(entity_id, x, y, z, mob_type=95):
+    return message(
+        clientbound.Play.SpawnMob,
+        entity_id=entity_id,
+        uuid=UUID,
+        type=mob_type,
+        x=x,
+        y=y,
+        z=z,
+        yaw=64,
+        pitch=0,
+        head_pitch=0,
+        velocity_x=800,
+        velocity_y=0,
+        velocity_z=-8000,
+        metadata=b"\xff",
+    )
+
+
+def test_spawn_and_move():
+    entities = Entities()
+    assert entities.handle(spawn_mob(7, 10.5, 64.0, -3.25))
+    assert entities.handle(
+        message(
+            clientbound.Play.SpawnPlayer,
+            entity_id=8,
+            uuid=UUID,
+            x=0.0,
+            y=70.0,
+            z=0.0,
+            yaw=0,
+            pitch=0,
+            metadata=b"\xff",
+        )
+    )
+
+    slot = entities.slot(7)
+    assert entities.kinds[slot] == Kind.MOB
+    assert entities.types[slot] == 95
+    assert entities.yaw[slot] == 90.0
+    assert entities.velocity_x[slot] == pytest.approx(0.1)
+    assert entities.velocity_z[slot] == pytest.approx(-1.0)
+    assert entities.kinds[entities.slot(8)] == Kind.PLAYER
+
+    entities.handle(
+        message(
+            clientbound.Play.EntityRelativeMove,
+            entity_id=7,
+            delta_x=4096,
+            delta_y=-2048,
+            delta_z=128,
+            on_ground=True,
+        )
+    )
+    assert entities.position(7) == (11.5, 63.5, -3.25 + 128 / 4096)
+    assert entities.on_ground[slot]
+
+    entities.handle(
+        message(
+            clientbound.Play.EntityTeleport,
+            entity_id=7,
+            x=1.0,
+            y=2.0,
+            z=3.0,
+            yaw=128,
+            pitch=32,
+            on_ground=False,
+        )
+    )
+    assert entities.position(7) == (1.0, 2.0, 3.0)
+    assert (entities.yaw[slot], entities.pitch[slot]) == (180.0, 45.0)
+
+    # Moves of unknown entities are ignored
+    entities.move(99, 1.0, 1.0, 1.0)
+    assert not entities.handle(message(clientbound.Play.KeepAlive, id=1))
+
+
+def test_destroy_reuses_slots():
+    entities = Entities(capacity=2)
+    for entity_id in range(5):
+        entities.handle(spawn_mob(entity_id, entity_id, 0.0, 0.0))
+    assert entities.capacity >= 5
+
+    slots = {entities.slot(1), entities.slot(3)}
+    entities.handle(message(clientbound.Play.DestroyEntities, entity_ids=[1, 3, 42]))
+    assert len(entities) == 3
+    assert 1 not in entities
+    assert {entities.ids[slot] for slot in slots} == {-1}
+
+    capacity = entities.capacity
+    entities.handle(spawn_mob(10, 0.0, 0.0, 0.0))
+    entities.handle(spawn_mob(11, 0.0, 0.0, 0.0))
+    assert {entities.slot(10), entities.slot(11)} == slots
+    assert entities.capacity == capacity
+    assert entities.position(4) == (4.0, 0.0, 0.0)
+
+
+def test_relative_moves_batch():
+    entities = Entities()
+    for entity_id in range(3):
+        entities.handle(spawn_mob(entity_id, 0.0, 0.0, 0.0))
+    moves = [
+        message(
+            clientbound.Play.EntityRelativeMove,
+            entity_id=entity_id % 4,
+            delta_x=4096,
+            delta_y=0,
+            delta_z=-4096,
+            on_ground=False,
+        )
+        for entity_id in range(8)
+    ]
+    entities.relative_moves(moves)
+    assert [entities.position(idx) for idx in range(3)] == [(2.0, 0.0, -2.0)] * 3
+
+
+def brute_force(entities, position, radius, kind=None):
+    found = []
+    for entity_id, slot in entities.slots.items():
+        if kind is not None and entities.kinds[slot] != kind:
+            continue
+        distance = sum(
+            (a - b) ** 2 for a, b in zip(entities.position(entity_id), position)
+        )
+        if distance <= radius * radius:
+            found.append((distance, entity_id))
+    return [entity_id for _, entity_id in sorted(found)]
+
+
+def test_spatial_queries():
+    rng = random.Random(404)
+    entities = Entities()
+    for entity_id in range(300):
+        entities.add(
+            entity_id,
+            Kind.PLAYER if entity_id % 10 == 0 else Kind.MOB,
+            95,
+            rng.uniform(-200, 200),
+            rng.uniform(0, 100),
+            rng.uniform(-200, 200),
+        )
+    for entity_id in range(0, 300, 3):
+        entities.move(entity_id, rng.uniform(-40, 40), 0.0, rng.uniform(-40, 40))
+    for entity_id in range(0, 300, 7):
+        entities.remove(entity_id)
+
+    for _ in range(50):
+        position = (rng.uniform(-250, 250), 64.0, rng.uniform(-250, 250))
+        for kind in (None, Kind.PLAYER):
+            assert entities.within(position, 24, kind) == brute_force(
+                entities, position, 24, kind
+            )
+            assert (
+                entities.nearest(position, kind)
+                == brute_force(entities, position, 1000, kind)[0]
+            )
+
+    assert entities.nearest((0.0, 0.0, 0.0), Kind.OBJECT) is None
+    assert Entities().nearest((0.0, 0.0, 0.0)) is None
@@ -0,0 +1,250 @@
+import asyncio
+import threading
+import time
+import pytest
+from construct import Container
+from test_capture import session
+from skeltal.events import (
+    ANY,
+    AsyncSubscriber,
+    EventsRegistry,
+    Overflow,
+    ThreadSubscriber,
+)
+from skeltal.protocol import clientbound
+from skeltal.protocol.codecs import LazyMessage
+from skeltal.protocol.replay import ReplayConnection
+from skeltal.protocol.state import State
+
+Play = clientbound.Play
+
+
+def message(message_type, **fields):
+    return Container(_type=message_type, **fields)
+
+
+def test_dispatch_by_type():
+    registry = EventsRegistry()
+    seen = []
+    registry.subscribe(Play.KeepAlive, lambda msg: seen.append(("keepalive", msg.id)))
+    registry.subscribe(
+        Play.KeepAlive,
+        lambda msg: seen.append(("odd", msg.id)),
+        predicate=lambda msg: msg.id % 2,
+    )
+    registry.subscribe(ANY, lambda msg: seen.append(("any", msg._type)))
+
+    registry.publish(message(Play.KeepAlive, id=1))
+    registry.publish(message(Play.KeepAlive, id=2))
+    registry.publish(message(Play.ChunkData))
+    assert seen == [
+        ("keepalive", 1),
+        ("odd", 1),
+        ("any", Play.KeepAlive),
+        ("keepalive", 2),
+        ("any", Play.KeepAlive),
+        ("any", Play.ChunkData),
+    ]
+
+
+def test_subscriber_errors_isolated():
+    registry = EventsRegistry()
+    seen = []
+
+    def fail(msg):
+        raise ValueError(msg.id)
+
+    registry.subscribe(Play.KeepAlive, fail)
+    registry.subscribe(Play.KeepAlive, lambda msg: seen.append(msg.id))
+    registry.subscribe(ANY, fail, predicate=lambda msg: 1 / 0)
+
+    # The connection goes on handling packets
+    connection = ReplayConnection(registry)
+    connection.state(State.LOGIN)
+    for frame in session():
+        assert connection.feed(frame)
+    assert seen == [7, 8] and connection.stats.keepalives == 2
+    # Both keepalives, and the play packets for the wildcard predicate
+    assert registry.errors == 2 + 3
+
+
+def test_subscribed_types():
+    registry = EventsRegistry()
+    changes = []
+    registry.watch(lambda: changes.append(registry.subscribed_types))
+
+    callback = registry.subscribe(Play.ChunkData, print)
+    registry.subscribe(Play.UnloadChunk, print)
+    assert registry.subscribed_types == {Play.ChunkData, Play.UnloadChunk}
+    assert registry.wants(Play.ChunkData)
+    assert not registry.wants(Play.KeepAlive)
+
+    registry.unsubscribe(Play.ChunkData, callback)
+    assert registry.subscribed_types == {Play.UnloadChunk}
+    assert len(changes) == 3
+
+    registry.subscribe(ANY, print)
+    assert registry.has_wildcard and registry.wants(Play.KeepAlive)
+    registry.unsubscribe(ANY, print)
+    assert not registry.has_wildcard
+
+
+def test_unsubscribe_while_publishing():
+    registry = EventsRegistry()
+    seen = []
+
+    def once(msg):
+        seen.append(msg.id)
+        registry.unsubscribe(Play.KeepAlive, once)
+
+    registry.subscribe(Play.KeepAlive, once)
+    registry.subscribe(Play.KeepAlive, lambda msg: seen.append(-msg.id))
+    registry.publish(message(Play.KeepAlive, id=1))
+    registry.publish(message(Play.KeepAlive, id=2))
+    assert seen == [1, -1, -2]
+
+
+class Gated:
+    """Callback blocking on the first message until opened."""
+
+    def __init__(self, count):
+        self.count = count
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.seen = []
+        self.done = threading.Event()
+
+    def __call__(self, msg):
+        self.started.set()
+        self.gate.wait(5)
+        self.seen.append(msg.id)
+        if len(self.seen) == self.count:
+            self.done.set()
+
+
+def keepalives(subscriber, ids):
+    for idx in ids:
+        subscriber(message(Play.KeepAlive, id=idx))
+
+
+@pytest.mark.parametrize(
+    "overflow, key, expected, dropped, coalesced",
+    [
+        (Overflow.DROP_OLDEST, None, [0, 7, 8, 9], 6, 0),
+        (Overflow.COALESCE_LATEST, lambda msg: msg.id % 2, [0, 9, 8], 0, 7),
+    ],
+)
+def test_thread_subscriber_overflow(overflow, key, expected, dropped, coalesced):
+    callback = Gated(len(expected))
+    subscriber = ThreadSubscriber(callback, maxsize=3, overflow=overflow, key=key)
+    registry = EventsRegistry()
+    registry.subscribe(Play.KeepAlive, subscriber)
+
+    # Publishing doesn't wait for the stuck callback
+    registry.publish(message(Play.KeepAlive, id=0))
+    assert callback.started.wait(5)
+    keepalives(registry.publish, range(1, 10))
+    assert subscriber.stats.depth == len(expected) - 1
+
+    callback.gate.set()
+    assert callback.done.wait(5)
+    assert callback.seen == expected
+    assert registry.queued() == [subscriber]
+    stats = subscriber.stats.as_dict()
+    assert (stats["dropped"], stats["coalesced"]) == (dropped, coalesced)
+    assert stats["max_depth"] == len(expected) - 1
+
+
+def test_thread_subscriber_block():
+    callback = Gated(5)
+    subscriber = ThreadSubscriber(callback, maxsize=2, overflow=Overflow.BLOCK)
+    keepalives(subscriber, [0])
+    assert callback.started.wait(5)
+    keepalives(subscriber, [1, 2])
+
+    publisher = threading.Thread(target=keepalives, args=(subscriber, [3, -1]))
+    publisher.start()
+    publisher.join(0.05)
+    assert publisher.is_alive()
+
+    callback.gate.set()
+    publisher.join(5)
+    assert callback.done.wait(5)
+    assert callback.seen == [0, 1, 2, 3, -1]
+    assert subscriber.stats.blocked >= 1
+    assert subscriber.stats.dropped == 0
+
+
+class GatedCodec:
+    """Keepalive codec holding the second decode until the first is done."""
+
+    type = Play.KeepAlive
+
+    def __init__(self):
+        self.decoded = threading.Event()
+        self.parses = 0
+
+    @property
+    def parse(self):
+        self.parses += 1
+        if self.parses > 1:
+            # Let the first decode finish storing its fields
+            self.decoded.wait(1)
+            time.sleep(0.05)
+        return self._parse
+
+    def _parse(self, data):
+        fields = clientbound.KeepAlive.parse(data)
+        # Long enough for the other thread to start decoding too
+        time.sleep(0.05)
+        self.decoded.set()
+        return fields
+
+
+def test_thread_subscribers_decode_same_message():
+    codec = GatedCodec()
+    barrier = threading.Barrier(2, timeout=5)
+    seen = []
+
+    def decode(message):
+        barrier.wait()
+        seen.append(message.id)
+        if len(seen) == 2:
+            done.set()
+
+    done = threading.Event()
+    registry = EventsRegistry()
+    for _ in range(2):
+        registry.subscribe(Play.KeepAlive, ThreadSubscriber(decode))
+    registry.publish(LazyMessage(codec, clientbound.KeepAlive.build({"id": 7})))
+    assert done.wait(5)
+    assert seen == [7, 7]
+
+
+def test_async_subscriber():
+    seen = []
+
+    async def callback(msg):
+        await asyncio.sleep(0)
+        seen.append(msg.id)
+        if msg.id == 1:
+            raise ValueError("boom")
+
+    async def main():
+        subscriber = AsyncSubscriber(callback, maxsize=8)
+        keepalives(subscriber, range(3))
+        # Also from another thread
+        thread = threading.Thread(target=keepalives, args=(subscriber, [3]))
+        thread.start()
+        thread.join()
+        while len(seen) < 4:
+            await asyncio.sleep(0.01)
+        return subscriber
+
+    subscriber = asyncio.run(main())
+    assert seen == [0, 1, 2, 3]
+    assert subscriber.stats.errors == 1
+    assert subscriber.stats.delivered == 4
+
+    with pytest.raises(ValueError):
+        AsyncSubscriber(callback, overflow=Overflow.BLOCK)
@@ -0,0 +1,73 @@
+import asyncio
+import urllib.error
+import urllib.request
+import pytest
+from skeltal.bot import Bot
+from skeltal.exporter import Exporter
+from skeltal.server import Server, Traffic
+
+
+def samples(text):
+    """Samples of a metrics page by name and labels."""
+    return dict(
+        line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#")
+    )
+
+
+def test_exporter():
+    async def main():
+        loop = asyncio.get_running_loop()
+        server = Server(
+            "127.0.0.1", 0, Traffic(rate=200, length=100, threshold=16), tick=0.01
+        )
+        server.keepalive = 0.05
+        await server.start()
+        bots = [
+            Bot("127.0.0.1", server.port, engine="asyncio", stats=60.0, username=name)
+            for name in ("a", "b")
+        ]
+        exporter = Exporter("127.0.0.1", 0)
+        exporter.start()
+        exporter.watch_loop(loop, 0.01)
+
+        tasks = [asyncio.create_task(bot.client.run_forever()) for bot in bots]
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if all(bot.client.stats.keepalives >= 2 for bot in bots):
+                break
+
+        url = f"http://127.0.0.1:{exporter.port}"
+        with await loop.run_in_executor(None, urllib.request.urlopen, url + "/metrics"):
+            pass
+        page = exporter.collect(bots)
+        received = sum(bot.client.stats.packets_rx for bot in bots)
+        with pytest.raises(urllib.error.HTTPError):
+            await loop.run_in_executor(None, urllib.request.urlopen, url + "/nope")
+
+        for bot in bots:
+            bot.client.stop()
+        await asyncio.gather(*tasks)
+        stopped = exporter.collect(bots)
+        exporter.stop()
+        server.close()
+        await server.wait_closed()
+        return page, received, stopped
+
+    page, received, stopped = asyncio.run(main())
+    metrics = samples(page)
+    assert metrics['skeltal_bots{state="play"}'] == "2"
+    assert int(metrics["skeltal_packets_rx_total"]) == received
+    assert int(metrics["skeltal_keepalives_total"]) >= 4
+    assert int(metrics["skeltal_keepalive_latency_seconds_count"]) >= 4
+    assert metrics['skeltal_keepalive_latency_seconds_bucket{le="+Inf"}'] == (
+        metrics["skeltal_keepalive_latency_seconds_count"]
+    )
+    compressed = int(metrics["skeltal_compressed_bytes_rx_total"])
+    inflated = int(metrics["skeltal_inflated_bytes_rx_total"])
+    assert compressed > 0
+    assert float(metrics["skeltal_compression_ratio"]) == round(
+        inflated / compressed, 3
+    )
+    assert int(metrics["skeltal_event_loop_lag_seconds_count"]) > 0
+    assert int(metrics['skeltal_type_packets_rx_total{type="KeepAlive"}']) >= 4
+    assert samples(stopped)['skeltal_bots{state="disconnected"}'] == "2"
@@ -0,0 +1,136 @@
+import zlib
+import pytest
+from construct import StreamError
+from skeltal.protocol import serverbound, varint
+from skeltal.protocol.framing import (
+    MAX_DATA_LENGTH,
+    DeferredFrame,
+    FrameBuffer,
+    inflate,
+)
+
+PACKETS = [
+    (0x21, b"\x00" * 8),
+    (0x25, b"hello world" * 40),
+    (0x85, b""),
+    (0x00, bytes(range(256)) * 4),
+]
+
+
+def frames(buffer, threshold):
+    result = []
+    while True:
+        frame = buffer.next_frame(threshold)
+        if frame is None:
+            return result
+        result.append((frame[0], bytes(frame[1])))
+
+
+@pytest.mark.parametrize("threshold", [-1, 0, 64, 4096])
+def test_split_burst(threshold):
+    data = b"".join(serverbound.build(threshold, *packet) for packet in PACKETS)
+    buffer = FrameBuffer()
+    buffer.feed(data)
+    assert frames(buffer, threshold) == PACKETS
+    assert len(buffer) == 0
+
+
+@pytest.mark.parametrize("threshold", [-1, 64])
+def test_split_partial(threshold):
+    data = b"".join(serverbound.build(threshold, *packet) for packet in PACKETS)
+    buffer = FrameBuffer(size=16)
+    result = []
+    for idx in range(0, len(data), 7):
+        buffer.feed(data[idx : idx + 7])
+        result.extend(frames(buffer, threshold))
+    assert result == PACKETS
+    assert len(buffer) == 0
+
+
+def test_split_length_after_consumed_frame():
+    # Stale bytes of a consumed frame must not extend a partial length
+    buffer = FrameBuffer()
+    buffer.feed(serverbound.build(-1, 0x21, b"\xFF" * 40))
+    assert frames(buffer, -1) == [(0x21, b"\xFF" * 40)]
+
+    large = serverbound.build(-1, 0x22, b"\x00" * 199)
+    buffer.feed(serverbound.build(-1, 0x21, b"") + large[:1])
+    assert frames(buffer, -1) == [(0x21, b"")]
+    assert buffer.get_buffer(1).nbytes < 1 << 20
+    buffer.feed(large[1:])
+    assert frames(buffer, -1) == [(0x22, b"\x00" * 199)]
+
+
+def test_grow_for_large_frame():
+    packet = (0x22, b"\xAB" * 100000)
+    buffer = FrameBuffer(size=1024)
+    buffer.feed(serverbound.build(-1, *packet))
+    assert frames(buffer, -1) == [packet]
+    assert buffer.capacity >= 100000
+
+
+def test_malformed_frame():
+    buffer = FrameBuffer()
+    buffer.feed(b"\x03\x05\x01\x02")
+    with pytest.raises(StreamError):
+        buffer.next_frame(0)
+
+
+@pytest.mark.parametrize("length", [2**31 - 1, 2**21, -1])
+def test_frame_length_out_of_range(length):
+    buffer = FrameBuffer()
+    buffer.feed(varint.encode(length))
+    with pytest.raises(StreamError):
+        buffer.next_frame(-1)
+    assert buffer.capacity == 8192
+
+
+def test_inflate_bounded():
+    bomb = zlib.compress(bytes(1 << 24))
+    with pytest.raises(StreamError):
+        inflate(bomb, 100)
+    with pytest.raises(StreamError):
+        inflate(bomb, MAX_DATA_LENGTH + 1)
+    data = zlib.compress(b"\x21" + bytes(99))
+    assert inflate(data, 100) == b"\x21" + bytes(99)
+    with pytest.raises(StreamError):
+        inflate(data, 101)
+
+
+@pytest.mark.parametrize("threshold", [-1, 0, 64])
+def test_ignore_frames(threshold):
+    data = b"".join(serverbound.build(threshold, *packet) for packet in PACKETS)
+    buffer = FrameBuffer()
+    buffer.feed(data)
+    ignore = {0x25, 0x00}
+    expected = [(i, None if i in ignore else bytes(d)) for i, d in PACKETS]
+    result = []
+    while True:
+        frame = buffer.next_frame(threshold, ignore)
+        if frame is None:
+            break
+        packet_id, payload = frame
+        result.append((packet_id, None if payload is None else bytes(payload)))
+    assert result == expected
+
+
+def test_ignore_avoids_inflate():
+    buffer = FrameBuffer()
+    buffer.feed(serverbound.build(0, 0x22, b"\x00" * 10000))
+    assert buffer.next_frame(0, {0x22}) == (0x22, None)
+    assert 0 < 10000 - buffer.inflate_avoided <= 5
+
+
+def test_defer_large_frames():
+    buffer = FrameBuffer()
+    buffer.feed(b"".join(serverbound.build(64, *packet) for packet in PACKETS))
+    result = []
+    while True:
+        frame = buffer.next_frame(64, defer=512)
+        if frame is None:
+            break
+        if isinstance(frame, DeferredFrame):
+            assert len(frame) > 512
+            frame = frame.inflate()
+        result.append((frame[0], bytes(frame[1])))
+    assert result == PACKETS
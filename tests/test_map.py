@@ -0,0 +1,206 @@
+import random
+from array import array
+import pytest
+from construct import Container
+from skeltal.bot import track
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound
+from skeltal.protocol.codecs import CLIENTBOUND
+from skeltal.protocol.state import State
+from skeltal.world.entity import Entities, Kind
+from skeltal.world.map import (
+    Column,
+    Section,
+    World,
+    pack,
+    read_section,
+    unpack,
+    write_section,
+)
+
+Play = clientbound.Play
+
+
+def reference_pack(values, bits):
+    stream = 0
+    for idx, value in enumerate(values):
+        stream |= value << (idx * bits)
+    size = len(values) * bits // 64
+    return b"".join(
+        ((stream >> (64 * idx)) & (2**64 - 1)).to_bytes(8, "big")
+        for idx in range(size)
+    )
+
+
+def random_states(rng, amount):
+    states = rng.sample(range(1, 8000), amount)
+    return [rng.choice(states) for _ in range(4096)]
+
+
+@pytest.mark.parametrize("bits", range(1, 17))
+def test_pack_unpack(bits):
+    rng = random.Random(bits)
+    values = [rng.randrange(1 << bits) for _ in range(4096)]
+    longs = reference_pack(values, bits)
+    assert pack(values, bits) == longs
+    assert list(unpack(longs, bits)) == values
+
+
+@pytest.mark.parametrize(
+    "amount, bits", [(1, 4), (16, 4), (17, 5), (200, 8), (300, 14)]
+)
+def test_section_roundtrip(amount, bits):
+    states = random_states(random.Random(amount), amount)
+    section = Section.from_states(states)
+    assert section.bits == bits
+
+    data = write_section(section, sky_light=False) + b"tail"
+    parsed, offset = read_section(data, sky_light=False)
+    assert data[offset:] == b"tail"
+    assert parsed.states() == states
+    assert parsed[4095] == states[4095]
+
+
+def chunk_data(column, x=0, z=0, sky_light=True):
+    data = column.dump(sky_light)
+    return clientbound.ChunkData.parse(
+        clientbound.ChunkData.build(
+            Container(
+                x=x,
+                z=z,
+                full_chunk=True,
+                bit_mask=column.bit_mask,
+                data=data,
+                block_entity_count=0,
+                block_entities=b"",
+            )
+        )
+    )
+
+
+def test_world_load_unload():
+    rng = random.Random(404)
+    column = Column(-2, 7)
+    column.sections[0] = Section.from_states(random_states(rng, 10))
+    column.sections[3] = Section.from_states(random_states(rng, 400))
+
+    world = World()
+    loaded = world.load_chunk(chunk_data(column, -2, 7))
+    assert loaded is world.column(-2, 7)
+    assert loaded.bit_mask == 0b1001
+    assert loaded.sections[0].states() == column.sections[0].states()
+    assert loaded.sections[3].states() == column.sections[3].states()
+    assert 4096 * 3 < world.nbytes < 4096 * 4
+
+    world.unload_chunk(Container(x=-2, z=7))
+    assert world.column(-2, 7) is None
+    assert len(world) == 0
+
+
+def test_dimensions():
+    def message(message_type, **fields):
+        codec = CLIENTBOUND[(State.PLAY, message_type.value)]
+        return codec.message(codec.struct.build(Container(fields)))
+
+    registry, world, entities = EventsRegistry(), World(), Entities()
+    track(registry, world, entities)
+    dimension = dict(difficulty="Easy", game_mode="Survival", level_type="default")
+    column = Column(0, 0)
+    column.sections[0] = Section.from_states([1] * 4096)
+
+    registry.publish(
+        message(
+            Play.JoinGame,
+            entity_id=1,
+            dimension="Nether",
+            max_players=20,
+            reduced_debug_info=False,
+            **dimension,
+        )
+    )
+    assert world.dimension == "Nether" and not world.sky_light
+    registry.publish(
+        Container(chunk_data(column, sky_light=False), _type=Play.ChunkData)
+    )
+    entities.add(5, Kind.MOB, 95, 0.0, 64.0, 0.0)
+    assert registry.errors == 0 and len(world) == 1
+
+    # Respawning in the same dimension keeps what's loaded
+    registry.publish(message(Play.Respawn, dimension="Nether", **dimension))
+    assert len(world) == len(entities) == 1
+    registry.publish(message(Play.Respawn, dimension="Overworld", **dimension))
+    assert world.sky_light and len(world) == len(entities) == 0
+    registry.publish(Container(chunk_data(column), _type=Play.ChunkData))
+    assert registry.errors == 0 and world.get_block(0, 0, 0) == 1
+
+
+def test_malformed_chunk_data():
+    column = Column(0, 0)
+    column.sections[0] = Section.from_states([1] * 4096)
+    data = column.dump()
+    with pytest.raises(ValueError):
+        Column(0, 0).load(0b1, data[:-100])
+    with pytest.raises(ValueError):
+        Column(0, 0).load(0b11, data)
+
+
+def small_world():
+    rng = random.Random(13)
+    column = Column(-1, 0)
+    column.sections[4] = Section.from_states(random_states(rng, 12))
+    world = World()
+    world.load_chunk(chunk_data(column, -1, 0))
+    return world, column.sections[4].states()
+
+
+def test_get_block():
+    world, states = small_world()
+    # Block (x=-3, y=70, z=5) is at x=13, y=6, z=5 within section 4
+    assert world.get_block(-3, 70, 5) == states[(6 * 16 + 5) * 16 + 13]
+    assert world.get_block(-3, 10, 5) == 0
+    assert world.get_block(-3, 300, 5) == 0
+    assert world.get_block(3, 70, 5) is None
+
+
+def test_get_blocks():
+    world, _ = small_world()
+    coords = [(-3, 70, 5), (-16, 64, 15), (-3, 10, 5), (3, 70, 5), (-1, -1, 0)]
+    flat = array("i", [value for coord in coords for value in coord])
+    expected = [world.get_block(*coord) for coord in coords]
+    assert list(world.get_blocks(flat)) == [
+        -1 if state is None else state for state in expected
+    ]
+
+
+def test_block_changes():
+    world, states = small_world()
+    section = world.column(-1, 0).sections[4]
+    palette = list(section.palette)
+
+    world.block_change(Container(location=Container(x=-3, y=70, z=5), block_id=77))
+    assert world.get_block(-3, 70, 5) == 77
+    assert section.palette == palette + [77]
+    assert world.column(-1, 0).sections[4] is section
+
+    world.multi_block_change(
+        Container(
+            chunk_x=-1,
+            chunk_z=0,
+            records=[
+                Container(horizontal=0xD5, y=70, block_id=palette[0]),
+                Container(horizontal=0x00, y=3, block_id=1),
+            ],
+        )
+    )
+    assert world.get_block(-3, 70, 5) == palette[0]
+    assert world.get_block(-16, 3, 0) == 1
+    assert world.get_block(-16, 4, 0) == 0
+
+
+def test_palette_overflow():
+    section = Section.from_states([0] * 4096)
+    for idx in range(300):
+        section[idx] = idx + 1
+    assert section.palette is None
+    assert section.states()[:300] == list(range(1, 301))
+    assert section[300] == 0
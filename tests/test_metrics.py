@@ -0,0 +1,66 @@
+from test_capture import session
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound
+from skeltal.protocol.metrics import Histogram, PacketMetrics
+from skeltal.protocol.replay import ReplayConnection
+from skeltal.protocol.state import State
+
+Play = clientbound.Play
+
+
+def test_histogram():
+    histogram = Histogram()
+    for value in (0, 1, 3, 100, 1000, 1000, 1000, 5000):
+        histogram.record(value)
+    assert histogram.count == 8 and histogram.total == 8104
+    assert histogram.max == 8191
+    assert histogram.percentile(0) == 0
+    assert histogram.percentile(50) == 127
+    assert histogram.percentile(75) == 1023
+    assert histogram.percentile(100) == 8191
+
+    total = Histogram()
+    total += histogram
+    total += histogram
+    assert total.count == 16 and total.buckets[10] == 6
+
+
+def test_connection_metrics(tmp_path):
+    frames = session()
+    registry = EventsRegistry()
+    registry.subscribe(Play.ChunkData, lambda message: message.x)
+    connection = ReplayConnection(registry, metrics=True)
+    connection.capture(tmp_path / "frames.cap")
+    connection.state(State.LOGIN)
+    for frame in frames:
+        assert connection.feed(frame)
+
+    metrics = connection.metrics
+    keepalive, chunk = metrics.types[Play.KeepAlive], metrics.types[Play.ChunkData]
+    assert keepalive.count == 2 and keepalive.wire_bytes == 2 * len(frames[2])
+    assert keepalive.data_bytes == 16
+    assert keepalive.parse.count == keepalive.handle.count == 2
+    # Compressed on the wire
+    assert chunk.wire_bytes == len(frames[3]) < chunk.data_bytes
+    assert chunk.parse.count == 1
+    assert chunk.handle.total >= chunk.parse.total > 0
+    assert set(metrics.as_dict()) == {
+        "SetCompression",
+        "LoginSuccess",
+        "KeepAlive",
+        "ChunkData",
+    }
+    assert metrics.summary().startswith("5 packets")
+
+    merged = PacketMetrics()
+    merged += metrics
+    merged += metrics
+    assert merged.types[Play.KeepAlive].count == 4
+
+    # Disabling keeps capturing, and receives packets unmeasured again
+    connection.disable_metrics()
+    assert connection.metrics is None and connection._buffer.capture is not None
+    assert connection.feed(frames[2])
+    connection.stop_capture()
+    assert connection._buffer.capture is None
+    assert connection.stats.keepalives == 3
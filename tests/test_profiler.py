@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from skeltal.bot import Bot
+from skeltal.profiler import subsystem
+from skeltal.server import Server, Traffic
+
+
+def test_subsystem():
+    assert subsystem("/site/skeltal/protocol/framing.py", "inflate") == "decompression"
+    assert subsystem("/site/skeltal/protocol/framing.py", "split") == "framing"
+    assert subsystem("/site/construct/core.py", "_parse") == "parsing"
+    assert subsystem("C:\\site\\skeltal\\world\\map.py", "load") == "events"
+    assert subsystem("~", "<built-in method select.select>") == "idle"
+    assert subsystem("/site/asyncio/base_events.py", "_run_once") == "other"
+
+
+@pytest.mark.parametrize("mode", ["sample", "cprofile"])
+def test_profile(tmp_path, mode):
+    traffic = Traffic(rate=2000, entities=20, sections=1, length=200)
+
+    async def main():
+        server = Server("127.0.0.1", 0, traffic, tick=0.01)
+        await server.start()
+        bot = Bot("127.0.0.1", server.port, engine="asyncio")
+        task = asyncio.create_task(bot.client.run_forever())
+        while bot.client.stats.packets_rx < traffic.entities:
+            await asyncio.sleep(0.01)
+
+        profiler = bot.profile(0.3, tmp_path / "profile", mode)
+        while profiler.running:
+            await asyncio.sleep(0.01)
+        bot.client.stop()
+        await task
+        server.close()
+        await server.wait_closed()
+        return profiler
+
+    profiler = asyncio.run(main())
+    report, output = profiler.join()
+    lines = open(report, encoding="utf-8").read().splitlines()
+    assert lines[0].startswith(f"# skeltal profile ({mode}) of 1 thread(s)")
+    assert "idle" in profiler.subsystems
+    if mode == "sample":
+        assert profiler.samples > 10 and output.endswith(".collapsed")
+        assert sum(profiler.subsystems.values()) == profiler.samples
+        stacks = open(output, encoding="utf-8").read().splitlines()
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in stacks) == profiler.samples
+        assert all(line.startswith("MainThread;") for line in stacks)
+    else:
+        assert "handlers" in profiler.subsystems and output.endswith(".prof")
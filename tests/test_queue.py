@@ -0,0 +1,40 @@
+import os
+import select
+import pytest
+from skeltal.protocol.queue import WakeupQueue
+
+
+@pytest.fixture(params=["eventfd", "socketpair"])
+def wakeup_queue(request, monkeypatch):
+    if request.param == "eventfd" and not hasattr(os, "eventfd"):
+        pytest.skip("eventfd not available")
+    if request.param == "socketpair":
+        monkeypatch.delattr(os, "eventfd", raising=False)
+
+    queue = WakeupQueue()
+    yield queue
+    queue.close()
+
+
+def readable(queue):
+    rlist, _, _ = select.select([queue], [], [], 0)
+    return bool(rlist)
+
+
+def test_drain_in_order(wakeup_queue):
+    for idx in range(100):
+        wakeup_queue.put(idx)
+    assert len(wakeup_queue) == 100
+    assert wakeup_queue.drain() == list(range(100))
+    assert wakeup_queue.drain() == []
+
+
+def test_wakeup_on_transition(wakeup_queue):
+    assert not readable(wakeup_queue)
+    wakeup_queue.put(1)
+    wakeup_queue.put(2)
+    assert readable(wakeup_queue)
+    assert wakeup_queue.drain() == [1, 2]
+    assert not readable(wakeup_queue)
+    wakeup_queue.put(3)
+    assert readable(wakeup_queue)
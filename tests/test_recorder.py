@@ -0,0 +1,48 @@
+from test_capture import session
+from skeltal.events import EventsRegistry
+from skeltal.protocol import clientbound
+from skeltal.protocol.capture import RX, TX
+from skeltal.protocol.recorder import IGNORED, FlightRecorder
+from skeltal.protocol.replay import ReplayConnection
+from skeltal.protocol.state import State
+
+
+def test_ring(tmp_path):
+    recorder = FlightRecorder(3, tmp_path / "flight.log")
+    for packet_id in range(5):
+        recorder.record(RX, State.PLAY, 0x21, packet_id, duration=1000)
+    assert len(recorder) == 3 and recorder.count == 5 and recorder.undumped
+    events = list(recorder.events())
+    assert [event[4] for event in events] == [2, 3, 4]
+    assert events[0][1:4] == (RX, State.PLAY, "KeepAlive")
+
+    recorder.record(TX, None, 0x7F, 0)
+    assert list(recorder.events())[-1][2:4] == (None, "0x7F")
+    recorder.dump("test")
+    assert not recorder.undumped
+
+
+def test_connection_recorder(tmp_path):
+    path = tmp_path / "flight.log"
+    connection = ReplayConnection(EventsRegistry(), recorder=16, recorder_path=path)
+    connection.ignore(State.PLAY, clientbound.Play.ChunkData)
+    connection.state(State.LOGIN)
+    for frame in session():
+        assert connection.feed(frame)
+
+    directions = [(event[1], event[3]) for event in connection.recorder.events()]
+    assert directions == [
+        (TX, "LoginStart"),
+        (RX, "SetCompression"),
+        (RX, "LoginSuccess"),
+        (RX, "KeepAlive"),
+        (TX, "KeepAlive"),
+        (IGNORED, "ChunkData"),
+        (RX, "KeepAlive"),
+        (TX, "KeepAlive"),
+    ]
+    # Parse errors dump the recorder
+    assert not connection.feed(b"\x03\x05\x01\x02")
+    lines = path.read_text().splitlines()
+    assert "StreamError" in lines[0] and "last 8 of 8 events" in lines[0]
+    assert len(lines) == 10 and "RX- PLAY" in lines[6]
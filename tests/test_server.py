@@ -0,0 +1,236 @@
+import asyncio
+import threading
+import time
+import pytest
+from construct import Container
+from skeltal.bot import Bot
+from skeltal.events import ThreadSubscriber
+from skeltal.protocol import clientbound, serverbound
+from skeltal.protocol.capture import RX, TX, CaptureReader
+from skeltal.protocol.state import State
+from skeltal.server import Server, Traffic, offline_uuid
+
+
+def test_traffic():
+    traffic = Traffic(rate=10, mix={"move": 1, "chunk": 0}, entities=5, length=100)
+    assert len(traffic.offsets) == 101 and traffic.offsets[-1] == len(traffic.stream)
+
+    data, cursor = traffic.take(90, 20)
+    assert cursor == 10
+    assert data == traffic.stream[traffic.offsets[90] :] + traffic.take(0, 10)[0]
+    assert traffic.take(0, 100) == (traffic.stream, 0)
+    data, cursor = traffic.take(90, 215)
+    assert cursor == 5
+    assert data == traffic.take(90, 10)[0] + traffic.stream * 2 + traffic.take(0, 5)[0]
+
+
+def test_offline_uuid():
+    assert offline_uuid("Notch") == "b50ad385-829d-3141-a216-7e7d7539ba7f"
+
+
+def test_server():
+    mix = {"move": 2, "chat": 1, "chunk": 1}
+    traffic = Traffic(rate=400, mix=mix, entities=20, sections=1, length=200)
+    chat = []
+
+    async def main():
+        server = Server("127.0.0.1", 0, traffic, tick=0.01, keepalive=0.05)
+        await server.start()
+        bots = [
+            Bot("127.0.0.1", server.port, engine="asyncio", username=f"bot{idx}")
+            for idx in range(3)
+        ]
+        bots[0].registry.subscribe(
+            clientbound.Play.ChatMessage, lambda message: chat.append(message)
+        )
+        tasks = [asyncio.create_task(bot.client.run_forever()) for bot in bots]
+
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if all(bot.client.stats.keepalives >= 2 for bot in bots):
+                break
+        health = server.health()
+
+        for bot in bots:
+            bot.client.stop()
+        await asyncio.gather(*tasks)
+        server.close()
+        await server.wait_closed()
+        return bots, health
+
+    bots, health = asyncio.run(main())
+    assert health["clients"] == health["playing"] == 3
+    assert health["keepalives"] >= 6 and health["rtt_median_ms"] is not None
+    for bot in bots:
+        assert bot.client.current_state is State.PLAY
+        assert bot.client.compression == traffic.threshold
+        assert len(bot.entities) == traffic.entities
+        assert bot.client.stats.packets_rx > traffic.entities + 3
+    assert chat and chat[0].json_data.startswith('{"text": ')
+
+
+async def start_bot(server, engine, **options):
+    """Start a bot on `engine` against `server`, return it and a coroutine
+    function stopping it once the server saw it disconnect.
+    """
+    loop = asyncio.get_running_loop()
+    bot = Bot("127.0.0.1", server.port, engine=engine, **options)
+    if engine == "asyncio":
+        task = asyncio.create_task(bot.client.run_forever())
+    else:
+        await loop.run_in_executor(None, bot.client.start)
+
+    async def stop():
+        bot.client.stop()
+        if engine == "asyncio":
+            await task
+        else:
+            await loop.run_in_executor(None, bot.client.shutdown)
+        for _ in range(100):
+            if not server.clients:
+                break
+            await asyncio.sleep(0.01)
+
+    return bot, stop
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.002)
+    return time.monotonic()
+
+
+@pytest.mark.parametrize("engine", ["asyncio", "thread"])
+def test_loopback(engine):
+    traffic = Traffic(rate=200, mix={"move": 1, "chunk": 1}, entities=5, length=100)
+
+    async def main():
+        server = Server("127.0.0.1", 0, traffic, tick=0.01, keepalive=0.02)
+        await server.start()
+        bot, stop = await start_bot(server, engine, username="loopback")
+
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if bot.client.stats.keepalives >= 3:
+                break
+        health = server.health()
+
+        await stop()
+        server.close()
+        await server.wait_closed()
+        return bot, health, server.health()
+
+    bot, health, closed = asyncio.run(main())
+    # Handshake and login, with compression enabled on the way
+    assert health["playing"] == 1 and bot.client.current_state is State.PLAY
+    assert bot.client.compression == traffic.threshold
+    assert len(bot.entities) == traffic.entities and bot.world.columns
+    # Keepalives were all answered, and everything sent got there
+    assert bot.client.stats.keepalives >= 3 and health["keepalives"] >= 3
+    assert closed["rtt_median_ms"] is not None
+    assert not bot.client.is_connected and not bot.client.is_running
+    assert closed["clients"] == 0
+    assert closed["packets_rx"] == bot.client.stats.packets_tx
+
+
+def test_thread_subscriber_dispatch():
+    traffic = Traffic(rate=400, mix={"chat": 1}, entities=1, length=50)
+    threads = []
+
+    async def main():
+        server = Server("127.0.0.1", 0, traffic, tick=0.01, keepalive=0.05)
+        await server.start()
+        bot = Bot("127.0.0.1", server.port, engine="asyncio")
+
+        def reply(_message):
+            if len(threads) < 20:
+                threads.append(threading.current_thread())
+                bot.client.dispatch(Container(_type=serverbound.Play.ChatMessage))
+
+        subscriber = ThreadSubscriber(reply)
+        bot.registry.subscribe(clientbound.Play.ChatMessage, subscriber)
+        task = asyncio.create_task(bot.client.run_forever())
+
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if len(threads) >= 20:
+                break
+        await asyncio.sleep(0.05)
+        bot.client.stop()
+        await task
+        for _ in range(100):
+            if not server.clients:
+                break
+            await asyncio.sleep(0.01)
+        server.close()
+        await server.wait_closed()
+        return bot, subscriber, server.health()
+
+    bot, subscriber, health = asyncio.run(main())
+    assert len(threads) == 20 and threading.current_thread() not in threads
+    assert subscriber.stats.errors == 0
+    # Every reply reached the server, written from the event loop
+    assert health["packets_rx"] == bot.client.stats.packets_tx
+    assert bot.client.stats.packets_tx >= 20 + 2
+
+
+@pytest.mark.parametrize("engine", ["asyncio", "thread"])
+@pytest.mark.parametrize("flush_window", [0, 100])
+def test_coalesce(engine, flush_window):
+    chat = Container(_type=serverbound.Play.ChatMessage)
+    dispatched = []
+
+    async def main():
+        server = Server("127.0.0.1", 0, Traffic(rate=10, length=20), keepalive=60)
+        await server.start()
+        bot, stop = await start_bot(server, engine, flush_window=flush_window)
+        await wait_for(lambda: server.playing)
+        (client,) = server.playing
+        received = client.stats.packets_rx
+        send_calls = bot.client.stats.send_calls
+
+        def burst():
+            # Several packets in a single iteration of the connection loop
+            dispatched.append(time.monotonic())
+            for _ in range(5):
+                bot.client.dispatch(chat)
+
+        bot.client._call_soon_threadsafe(burst)
+        flushed = await wait_for(lambda: client.stats.packets_rx >= received + 5)
+        packets = client.stats.packets_rx - received
+        send_calls = bot.client.stats.send_calls - send_calls
+
+        await stop()
+        server.close()
+        await server.wait_closed()
+        return packets, send_calls, flushed - dispatched[0]
+
+    packets, send_calls, delay = asyncio.run(main())
+    assert packets == 5 and send_calls == 1
+    if flush_window:
+        # Timers may fire up to a clock tick early
+        assert flush_window / 1000 - 0.005 <= delay < 1.0
+    else:
+        assert delay < 0.05
+
+
+def test_shutdown_closes_capture(tmp_path):
+    path = tmp_path / "frames.cap"
+
+    async def main():
+        server = Server("127.0.0.1", 0, Traffic(rate=100, length=20), keepalive=0.02)
+        await server.start()
+        bot, _stop = await start_bot(server, "thread", capture=path)
+        await wait_for(lambda: bot.client.stats.keepalives >= 1)
+        bot.shutdown()
+        await wait_for(lambda: not bot.client.is_connected)
+        server.close()
+        await server.wait_closed()
+        return bot
+
+    bot = asyncio.run(main())
+    assert bot.client._capture is None
+    with CaptureReader(path) as reader:
+        directions = {record.direction for record in reader}
+    assert directions == {RX, TX}
@@ -0,0 +1,97 @@
+import asyncio
+import socket
+import time
+from skeltal.server import Server, Traffic
+from skeltal.swarm import Supervisor, Swarm, usernames
+
+
+class Process:
+    def __init__(self, exitcode=None):
+        self.exitcode = exitcode
+
+    def is_alive(self):
+        return self.exitcode is None
+
+    def terminate(self):
+        self.exitcode = -15
+
+    def join(self, timeout=None):
+        pass
+
+
+class Pipe:
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.sent = []
+
+    def send(self, message):
+        if self.broken:
+            raise BrokenPipeError(32, "Broken pipe")
+        self.sent.append(message)
+
+    def close(self):
+        pass
+
+
+def test_rebalance_past_dead_worker():
+    supervisor = Supervisor("localhost", 25565, count=8, workers=4)
+    pipes = [Pipe(), Pipe(), Pipe(broken=True), Pipe()]
+    # Worker 2 died since the last check, without being reaped yet
+    supervisor._processes = {0: Process(1), 1: Process(), 2: Process(), 3: Process()}
+    supervisor._pipes = dict(enumerate(pipes))
+    supervisor._shards = {idx: [idx, idx + 4] for idx in range(4)}
+
+    supervisor._reap(0)
+    assert sorted(supervisor._processes) == [1, 3]
+    assert sorted(supervisor._shards[1] + supervisor._shards[3]) == list(range(8))
+    sent = [idx for pipe in pipes for _, share in pipe.sent for idx in share]
+    assert sorted(sent) == [0, 2, 4, 6]
+
+
+def test_swarm():
+    count, ramp = 4, 50.0
+
+    async def main():
+        server = Server("127.0.0.1", 0, Traffic(rate=100, entities=1, length=20))
+        await server.start()
+        swarm = Swarm("127.0.0.1", server.port, count, ramp=ramp, interval=60)
+        started = time.monotonic()
+        await swarm.spawn(usernames(swarm.prefix, range(count)))
+        elapsed = time.monotonic() - started
+
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if len(server.playing) == count:
+                break
+        health = swarm.health()
+        names = {client.username for client in server.playing}
+
+        swarm.shutdown()
+        await swarm.wait()
+        server.close()
+        await server.wait_closed()
+        return elapsed, health, names
+
+    elapsed, health, names = asyncio.run(main())
+    assert elapsed >= (count - 1) / ramp
+    assert names == {f"skel{idx}" for idx in range(count)}
+    assert health["bots"] == health["connected"] == health["playing"] == count
+    assert health["connecting"] == health["closed"] == health["failed"] == 0
+
+
+def test_swarm_failed_connect():
+    # Nothing listens on a port just released
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def main():
+        swarm = Swarm("127.0.0.1", port, 3, ramp=0, interval=60)
+        await swarm.spawn(usernames(swarm.prefix, range(3)))
+        await swarm.wait()
+        return swarm.health()
+
+    health = asyncio.run(main())
+    assert health["bots"] == health["failed"] == 3
+    # Failed bots never got a state, but aren't connecting anymore
+    assert health["connecting"] == health["connected"] == health["closed"] == 0
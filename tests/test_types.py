@@ -1,6 +1,7 @@
 import pytest
-from construct import Construct
-from skeltal.protocol.types import VarInt
+from construct import Construct, StreamError
+from skeltal.protocol import varint
+from skeltal.protocol.types import Position, VarInt
 
 VARINT = [
     (0, [0x00]),
@@ -28,3 +29,51 @@ def test_varint_parse(value, data):
 @pytest.mark.parametrize("value, data", VARINT)
 def test_varint_sizeof(value, data):
     assert VarInt.bytesize(value) == len(data)
+
+
+@pytest.mark.parametrize("value, data", VARINT)
+def test_varint_encode(value, data):
+    assert varint.encode(value) == bytes(data)
+
+
+@pytest.mark.parametrize("value, data", VARINT)
+def test_varint_decode_offset(value, data):
+    buffer = memoryview(b"\xAA\xBB" + bytes(data) + b"\xCC")
+    assert varint.decode(buffer, 2) == (value, 2 + len(data))
+
+
+@pytest.mark.parametrize("value, data", VARINT)
+def test_varint_size(value, data):
+    assert varint.size(value) == len(data)
+
+
+def test_varint_decode_many():
+    values = [value for value, _ in VARINT]
+    buffer = b"\x00" + varint.encode_many(values)
+    assert varint.decode_many(buffer, len(values), 1) == (values, len(buffer))
+
+
+def test_varint_decode_truncated():
+    with pytest.raises(IndexError):
+        varint.decode(b"\x80\x80")
+
+
+def test_varint_decode_too_large():
+    with pytest.raises(ValueError):
+        varint.decode(b"\xFF\xFF\xFF\xFF\xFF\x01")
+
+
+def test_varint_parse_invalid():
+    with pytest.raises(StreamError):
+        VarInt.parse(b"\x80\x80")
+    with pytest.raises(ValueError):
+        VarInt.parse(b"\xFF\xFF\xFF\xFF\xFF\x01")
+
+
+@pytest.mark.parametrize(
+    "x, y, z", [(0, 0, 0), (18357644, 831, -20882616), (-1, 255, -33554432)]
+)
+def test_position(x, y, z):
+    data = Position.build(dict(x=x, y=y, z=z))
+    assert len(data) == 8
+    assert Position.parse(data) == dict(x=x, y=y, z=z)